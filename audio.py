@@ -0,0 +1,464 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Synthesises morse code audio as PCM sample buffers.
+
+Nothing in here depends on pygame. Buffers are mono signed 16-bit numpy
+arrays, which the front end turns into whatever its mixer wants.
+"""
+
+
+import math
+import threading
+import wave
+
+from collections import OrderedDict
+from typing import Iterable, Iterator, NamedTuple
+
+import numpy as np
+
+# Tone defaults. A 600Hz sine at about a quarter of full scale
+default_frequency = 600
+default_sample_rate = 44100
+default_amplitude = 0.25
+
+# Time for the tone to rise and fall at the start and end of each element.
+# Stops the clicks that a hard keyed sine makes
+default_ramp_time = 0.005
+
+# Length of a dit at 1 word per minute, using the 50 dit long word "PARIS "
+paris_dit_length = 1.2
+
+
+def dit_length_to_wpm(dit_length: float) -> float:
+    """
+    Converts the length of a dit in seconds to words per minute
+    """
+    return paris_dit_length / dit_length
+
+
+def wpm_to_dit_length(wpm: float) -> float:
+    """
+    Converts words per minute to the length of a dit in seconds
+    """
+    return paris_dit_length / wpm
+
+
+def element_timings(morse_sequence: str, dit_length: float) -> list[tuple[float, float]]:
+    """
+    Gets the times that each dit or dah starts and stops, relative to the start
+    of the character. Elements are separated by one dit length of silence.
+
+    :param morse_sequence: String of '.' and '-'
+    :param dit_length: Length of a dit in seconds
+    :return: List of (start, stop) tuples in seconds
+    :raises ValueError: If morse_sequence contains something that isn't a dit
+        or a dah
+    """
+    timings = []
+    units = 0
+
+    for element in morse_sequence:
+        if element == ".":
+            element_units = 1
+        elif element == "-":
+            element_units = 3
+        else:
+            raise ValueError(f"Not a morse element: {element!r}")
+
+        timings.append((units * dit_length, (units + element_units) * dit_length))
+        units += element_units + 1
+
+    return timings
+
+
+def ramp(length: int) -> np.ndarray:
+    """
+    Raised cosine from 0 to 1 over length samples
+    """
+    if length <= 0:
+        return np.ones(0, dtype=np.float32)
+
+    return (0.5 - 0.5 * np.cos(np.linspace(0, np.pi, length, dtype=np.float32))).astype(np.float32)
+
+
+def sequence_elements(morse_sequence: str) -> np.ndarray:
+    """
+    Converts a morse sequence into element lengths in dits, tones positive
+    and gaps negative. There's no gap after the last element
+
+    :raises ValueError: If morse_sequence contains something that isn't a dit
+        or a dah
+    """
+    if set(morse_sequence) - set(".-"):
+        raise ValueError(f"Not a morse sequence: {morse_sequence!r}")
+
+    elements = np.full(max(2 * len(morse_sequence) - 1, 0), -1, dtype=np.int8)
+    elements[::2] = [1 if element == "." else 3 for element in morse_sequence]
+
+    return elements
+
+
+def render_elements(elements: np.ndarray,
+                    wpm: float,
+                    frequency: float = default_frequency,
+                    sample_rate: int = default_sample_rate,
+                    amplitude: float = default_amplitude,
+                    ramp_time: float = default_ramp_time,
+                    farnsworth_wpm: float | None = None) -> np.ndarray:
+    """
+    Renders tone and gap lengths into a PCM buffer, with a rise and fall on
+    every tone.
+
+    Boundaries are rounded to the nearest sample from the start of the
+    buffer, so the timing doesn't drift however long it is.
+
+    :param elements: Lengths in dits, positive for tone and negative for
+        silence, like codec.Codec.encode_elements gives
+    :param wpm: Speed in words per minute
+    :param frequency: Tone frequency in Hz
+    :param sample_rate: Samples per second
+    :param amplitude: Peak level, 1 being full scale
+    :param ramp_time: Rise and fall time in seconds
+    :param farnsworth_wpm: Slower overall speed. Gaps of 3 dits or more are
+        stretched so that words come at this speed, while characters stay at
+        wpm
+    :return: Mono int16 numpy array
+    """
+    envelope = render_envelope(elements, wpm, sample_rate, ramp_time, farnsworth_wpm)
+
+    samples = tone_bank.get(frequency, sample_rate, envelope.size) * envelope * (amplitude * 32767)
+
+    return samples.astype(np.int16)
+
+
+def render_envelope(elements: np.ndarray,
+                    wpm: float,
+                    sample_rate: int = default_sample_rate,
+                    ramp_time: float = default_ramp_time,
+                    farnsworth_wpm: float | None = None) -> np.ndarray:
+    """
+    Renders tone and gap lengths into the level of the tone at each sample,
+    1 during tones and 0 in gaps, with a rise and fall on every tone. See
+    render_elements
+
+    :return: float32 numpy array
+    """
+    elements = np.asarray(elements)
+    if elements.size == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    boundaries = np.rint(element_units(elements, wpm, farnsworth_wpm) * (wpm_to_dit_length(wpm) * sample_rate))
+    boundaries = boundaries.astype(np.int64)
+    lengths = np.diff(boundaries)
+    tone = elements > 0
+
+    envelope = np.repeat(tone.astype(np.float32), lengths)
+
+    starts = boundaries[:-1][tone]
+    stops = boundaries[1:][tone]
+
+    if starts.size:
+        ramp_length = min(int(round(ramp_time * sample_rate)), int((stops - starts).min()) // 2)
+        rise = ramp(ramp_length)
+
+        if ramp_length:
+            offsets = np.arange(ramp_length)
+            envelope[starts[:, np.newaxis] + offsets] = rise
+            envelope[stops[:, np.newaxis] - ramp_length + offsets] = rise[::-1]
+
+    return envelope
+
+
+def element_units(elements: np.ndarray, wpm: float, farnsworth_wpm: float | None = None) -> np.ndarray:
+    """
+    Gets the time of each boundary between elements, in dits from the start
+    of the first. Has one more item than elements, the end of the last
+
+    :param elements: Lengths in dits, positive for tone and negative for
+        silence
+    :param farnsworth_wpm: Slower overall speed, see render_elements
+    """
+    units = np.abs(elements).astype(np.float64)
+
+    if farnsworth_wpm and farnsworth_wpm < wpm:
+        units[(elements <= -3)] *= farnsworth_stretch(wpm, farnsworth_wpm)
+
+    return np.r_[0, np.cumsum(units)]
+
+
+def farnsworth_stretch(wpm: float, farnsworth_wpm: float) -> float:
+    """
+    Gets how much longer gaps between characters and words are with
+    Farnsworth timing, so that "PARIS " takes as long as it would at
+    farnsworth_wpm
+
+    "PARIS " is 50 dits, 19 of which are gaps between characters and words
+    """
+    extra = 50 * (wpm / farnsworth_wpm - 1)
+    return 1 + extra / 19
+
+
+def render_sequence(morse_sequence: str,
+                    wpm: float,
+                    frequency: float = default_frequency,
+                    sample_rate: int = default_sample_rate,
+                    amplitude: float = default_amplitude,
+                    ramp_time: float = default_ramp_time) -> np.ndarray:
+    """
+    Renders a morse sequence into a single PCM buffer, with the gaps between
+    the elements and a rise and fall on every element.
+
+    :param morse_sequence: String of '.' and '-'
+    :param wpm: Speed in words per minute
+    :param frequency: Tone frequency in Hz
+    :param sample_rate: Samples per second
+    :param amplitude: Peak level, 1 being full scale
+    :param ramp_time: Rise and fall time in seconds
+    :return: Mono int16 numpy array
+    """
+    return render_elements(sequence_elements(morse_sequence), wpm, frequency, sample_rate, amplitude, ramp_time)
+
+
+class StreamChunk(NamedTuple):
+    """
+    Piece of a stream of morse made by stream_words
+    """
+    # Mono int16 samples
+    samples: np.ndarray
+    # Sample index in the whole stream of the first sample
+    start: int
+    # Changes in the stream during the chunk, as (sample index from the start
+    # of the chunk, event). An event is True when a tone starts, False when
+    # it stops, and a word when the word has finished
+    events: list[tuple[int, bool | str]]
+
+
+def stream_words(words: Iterable[tuple[str, np.ndarray]],
+                 wpm: float,
+                 frequency: float = default_frequency,
+                 sample_rate: int = default_sample_rate,
+                 farnsworth_wpm: float | None = None,
+                 chunk_time: float = 0.1,
+                 amplitude: float = default_amplitude,
+                 ramp_time: float = default_ramp_time) -> Iterator[StreamChunk]:
+    """
+    Renders a stream of words into chunks of equal length, for playing one
+    after another without gaps. Only one word and one chunk are held at a
+    time, so a stream of any length uses the same memory.
+
+    Every boundary is rounded to the nearest sample from the start of the
+    whole stream, so the timing doesn't drift however long it runs
+
+    :param words: Each word, and its elements including the gap after it,
+        like codec.Codec.encode_elements gives for "WORD "
+    :param wpm: Speed in words per minute
+    :param frequency: Tone frequency in Hz
+    :param sample_rate: Samples per second
+    :param farnsworth_wpm: Slower overall speed, see render_elements
+    :param chunk_time: Length of each chunk in seconds. The last is shorter
+    :param amplitude: Peak level, 1 being full scale
+    :param ramp_time: Rise and fall time in seconds
+    """
+    chunk_length = max(1, int(round(chunk_time * sample_rate)))
+    dit_samples = wpm_to_dit_length(wpm) * sample_rate
+
+    # Rendered samples not yet given out, and their events with sample
+    # indexes from the start of the stream
+    pending: list[np.ndarray] = []
+    pending_length = 0
+    pending_events: list[tuple[int, bool | str]] = []
+
+    # Start of the chunk being filled, and of the next word, in samples from
+    # the start of the stream. The word start is kept in dits, so it isn't
+    # rounded until it's used
+    chunk_start = 0
+    word_start_units = 0.0
+
+    def take(length: int) -> StreamChunk:
+        nonlocal pending, pending_length, pending_events, chunk_start
+
+        joined = np.concatenate(pending) if len(pending) > 1 else pending[0]
+        samples, rest = joined[:length], joined[length:]
+
+        pending = [rest] if rest.size else []
+        pending_length = rest.size
+
+        end = chunk_start + length
+        events = [(index - chunk_start, event) for index, event in pending_events if index < end]
+        pending_events = [(index, event) for index, event in pending_events if index >= end]
+
+        chunk = StreamChunk(samples, chunk_start, events)
+        chunk_start = end
+
+        return chunk
+
+    for word, elements in words:
+        if len(elements) == 0:
+            continue
+
+        units = element_units(elements, wpm, farnsworth_wpm)
+        word_start = int(round(word_start_units * dit_samples))
+        boundaries = np.rint((word_start_units + units) * dit_samples).astype(np.int64)
+        word_start_units += units[-1]
+
+        samples = render_elements(elements, wpm, frequency, sample_rate, amplitude, ramp_time, farnsworth_wpm)
+
+        # render_elements rounds from the start of the word, which can be a
+        # sample out from rounding from the start of the stream. The end is
+        # always silence, so it's trimmed or padded to fit
+        length = int(boundaries[-1] - word_start)
+        if samples.size > length:
+            samples = samples[:length]
+        elif samples.size < length:
+            samples = np.concatenate((samples, np.zeros(length - samples.size, dtype=np.int16)))
+
+        tone = np.asarray(elements) > 0
+        for start, stop in zip(boundaries[:-1][tone].tolist(), boundaries[1:][tone].tolist()):
+            pending_events.append((start, True))
+            pending_events.append((stop, False))
+
+        last_tone_end = int(boundaries[1:][tone][-1]) if tone.any() else word_start
+        pending_events.append((last_tone_end, word))
+
+        pending.append(samples)
+        pending_length += samples.size
+
+        while pending_length >= chunk_length:
+            yield take(chunk_length)
+
+    if pending_length:
+        yield take(pending_length)
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = default_sample_rate):
+    """
+    Writes mono int16 samples to a WAV file
+    """
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+
+
+class ToneBank:
+    """
+    Holds short loops of sine wave that tones are built from. Each loop is a
+    whole number of periods long, so it can be repeated to any length without
+    a join.
+
+    There's one of these per process, tone_bank, shared by everything that
+    makes sound
+    """
+
+    # Longest loop to make. Frequencies that don't divide nicely into the
+    # sample rate would otherwise need a loop a second long
+    max_loop_length = 4096
+
+    def __init__(self):
+        self.loops: dict[tuple[float, int], np.ndarray] = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def loop_length(cls, frequency: float, sample_rate: int) -> int:
+        """
+        Gets the number of samples in the shortest loop of whole periods
+
+        For example 600Hz at 44100Hz repeats exactly every 147 samples, which
+        is 2 periods
+        """
+        if float(frequency).is_integer():
+            length = sample_rate // math.gcd(int(frequency), sample_rate)
+            if length <= cls.max_loop_length:
+                return length
+
+        # Round to the nearest whole number of periods that fits. The pitch
+        # error from this is well under a hertz
+        periods = max(1, int(cls.max_loop_length * frequency / sample_rate))
+        return int(round(periods * sample_rate / frequency))
+
+    def get_loop(self, frequency: float, sample_rate: int) -> np.ndarray:
+        """
+        Gets the loop for a tone, making it the first time it's asked for
+
+        :return: Read only float32 numpy array between -1 and 1
+        """
+        key = (frequency, sample_rate)
+        loop = self.loops.get(key)
+
+        if loop is None:
+            length = self.loop_length(frequency, sample_rate)
+            periods = max(1, int(round(length * frequency / sample_rate)))
+
+            loop = np.sin(np.arange(length) * (2 * np.pi * periods / length)).astype(np.float32)
+            loop.flags.writeable = False
+
+            with self.lock:
+                loop = self.loops.setdefault(key, loop)
+
+        return loop
+
+    def get(self, frequency: float, sample_rate: int, length: int) -> np.ndarray:
+        """
+        Gets length samples of a tone, starting at phase 0
+
+        :return: New float32 numpy array between -1 and 1
+        """
+        return np.resize(self.get_loop(frequency, sample_rate), length)
+
+
+tone_bank = ToneBank()
+
+
+class LRUCache:
+    """
+    Small least recently used cache. Used for rendered audio so that each
+    character is only ever synthesised once at a given speed and tone.
+
+    Safe to use from more than one thread
+    """
+
+    def __init__(self, max_size: int = 256):
+        """
+        :param max_size: Number of items to keep before evicting the least
+            recently used
+        """
+        self.max_size = max_size
+        self.items: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, factory):
+        """
+        Gets the item for key, creating it with factory() if it isn't cached
+
+        :param key: Hashable key
+        :param factory: Function taking no arguments that creates the item
+        """
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+
+        item = factory()
+
+        with self.lock:
+            self.items[key] = item
+            self.items.move_to_end(key)
+
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+        return item
+
+    def clear(self):
+        """
+        Removes everything from the cache
+        """
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
@@ -0,0 +1,13 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Benchmarks. Run each from the top of the repository, for example
+
+    python -m benchmarks.reaction_time
+
+suite runs all the main ones and compares them with a saved baseline
+
+    python -m benchmarks.suite run --compare baseline.json
+"""
@@ -0,0 +1,141 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Checks that decoder.CWDecoder finds the sender's speed when its first guess
+is wrong. Text is rendered with audio.py at speeds from a third to over
+twice the guessed 15 WPM, including text that's nearly all dahs, like MOM
+and OTTO, where there are no dits to learn the speed from. Each is decoded
+from the guess, and everything after the first word has to come out
+exactly.
+
+Also prints the character accuracy on random text, with and without noise,
+and how many times real time the decoder runs.
+
+Exits with an error if any text doesn't recover.
+
+Usage:
+    python -m benchmarks.decoding
+"""
+
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+import audio
+
+from benchmarks.keying import accuracy, random_text
+from codec import default_codec
+from decoder import CWDecoder
+
+guessed_wpm = 15
+
+# Texts that have to recover, with the speeds to send them at
+recovery_texts = {
+    "CQ CQ DE TEST K THE QUICK BROWN FOX": [5, 10, 25, 30, 40],
+    "PARIS PARIS PARIS": [5, 10, 25, 30, 40],
+    "MOM MOM MOM MOM MOM MOM": [5, 10, 25, 30, 35, 40],
+    "OTTO MOTTO TOM OMO TOTO": [5, 10, 25, 30, 35, 40],
+}
+
+sample_rate = audio.default_sample_rate
+
+
+def render(text: str, wpm: float, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Renders text with a little silence either side, and noise of a
+    standard deviation as a fraction of full scale
+    """
+    elements = default_codec.encode_elements(text + " ", errors="ignore")
+    samples = audio.render_elements(elements, wpm, sample_rate=sample_rate).astype(np.float32) / 32768
+
+    padding = np.zeros(sample_rate // 10, dtype=np.float32)
+    samples = np.concatenate((padding, samples, padding * 10))
+
+    return samples + rng.normal(0, noise, samples.size).astype(np.float32)
+
+
+def decode(samples: np.ndarray, chunk_length: int = sample_rate) -> str:
+    """
+    Decodes samples a chunk at a time, from the guessed speed
+    """
+    decoder = CWDecoder(sample_rate, wpm=guessed_wpm)
+
+    output = [decoder.feed(samples[start:start + chunk_length]) for start in range(0, samples.size, chunk_length)]
+    output.append(decoder.flush())
+
+    return "".join(output).strip()
+
+
+def check_recovery(rng: np.random.Generator) -> int:
+    """
+    Decodes each recovery text at each speed, and prints any where the text
+    after the first word is wrong
+
+    :return: Number that didn't recover
+    """
+    failures = 0
+
+    for text, speeds in recovery_texts.items():
+        for wpm in speeds:
+            decoded = decode(render(text, wpm, 0, rng))
+            recovered = decoded.split(" ", 1)[1:] == text.split(" ", 1)[1:]
+
+            if not recovered:
+                failures += 1
+                print(f"Didn't recover at {wpm} WPM: {decoded!r}, sent {text!r}")
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the CW decoder finds the sender's speed")
+    parser.add_argument("--characters", type=int, default=500, help="Random characters sent at each setting")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    text_rng = random.Random(args.seed)
+
+    failures = check_recovery(rng)
+    checks = sum(len(speeds) for speeds in recovery_texts.values())
+    print(f"{checks - failures}/{checks} texts recovered from a guess of {guessed_wpm} WPM")
+
+    speeds = [5, 10, 15, 20, 30, 40]
+    noises = [0.0, 0.05, 0.1]
+
+    print()
+    print(f"{'wpm':>5}" + "".join(f"{f'noise {noise:g}':>12}" for noise in noises))
+
+    audio_seconds = 0.0
+    elapsed = 0.0
+
+    for wpm in speeds:
+        row = f"{wpm:>5}"
+
+        for noise in noises:
+            text = random_text(text_rng, args.characters)
+            samples = render(text, wpm, noise, rng)
+
+            start = time.perf_counter()
+            decoded = decode(samples)
+            elapsed += time.perf_counter() - start
+            audio_seconds += samples.size / sample_rate
+
+            row += f"{accuracy(text, decoded):>12.1%}"
+
+        print(row)
+
+    print(f"Decoded {audio_seconds:.0f}s of audio at {audio_seconds / elapsed:.0f}x real time")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
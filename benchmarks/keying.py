@@ -0,0 +1,222 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Measures how well keyer.KeyingDecoder decodes hand sent morse. Synthetic
+keying is made from random text at a range of speeds, with every element
+and gap stretched or shrunk at random to copy a human's uneven timing, and
+fed to a decoder that starts off guessing 15 WPM.
+
+Prints the character accuracy at each speed and amount of jitter, and how
+many key events the decoder handles per second.
+
+With --latency it also runs the sending mode headless, posts key presses to
+it from another thread, and measures how long each takes to start the
+sidetone, which has to be well under a frame.
+
+Usage:
+    python -m benchmarks.keying --characters 2000 --latency
+"""
+
+
+import argparse
+import difflib
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+import audio
+
+from codec import default_codec, morse
+from keyer import KeyingDecoder
+
+
+def synthetic_keying(text: str,
+                     wpm: float,
+                     jitter: float,
+                     rng: random.Random,
+                     dah_ratio: float = 3.0) -> tuple[list[tuple[float, float]], float]:
+    """
+    Makes key down and up times for sending text by hand
+
+    :param jitter: Standard deviation of each element and gap's length, as
+        a fraction of it
+    :param dah_ratio: Length of the sender's dahs in dits
+    :return: (down time, up time) of each element, and the time the last gap
+        ends
+    """
+    dit = audio.wpm_to_dit_length(wpm)
+    presses = []
+    now = 0.0
+
+    def length(dits: float) -> float:
+        return max(0.1 * dit, dits * dit * rng.gauss(1, jitter))
+
+    for word in text.split():
+        for character in word:
+            for index, symbol in enumerate(morse[character]):
+                if index:
+                    now += length(1)
+
+                down = now
+                now += length(dah_ratio if symbol == "-" else 1)
+                presses.append((down, now))
+
+            now += length(3)
+
+        now += length(4)
+
+    return presses, now
+
+
+def decode_keying(presses: list[tuple[float, float]], end: float, decoder: KeyingDecoder) -> str:
+    """
+    Feeds key presses to a decoder the way the sending mode does, polling
+    whenever the decoder has something due before the next press
+    """
+    output = []
+
+    for down, up in presses:
+        deadline = decoder.next_deadline()
+        while deadline is not None and deadline < down:
+            output.append(decoder.poll(deadline))
+            deadline = decoder.next_deadline()
+
+        output.append(decoder.key_down(down))
+        decoder.key_up(up)
+
+    output.append(decoder.poll(end))
+    output.append(decoder.flush())
+
+    return "".join(output)
+
+
+def accuracy(sent: str, decoded: str) -> float:
+    """
+    Fraction of the sent characters that were decoded, after lining the two
+    up
+    """
+    matcher = difflib.SequenceMatcher(None, sent, decoded, autojunk=False)
+    matched = sum(block.size for block in matcher.get_matching_blocks())
+
+    return matched / len(sent) if sent else 1.0
+
+
+def random_text(rng: random.Random, characters: int) -> str:
+    """
+    Random words of 2 to 7 characters, from the whole table
+    """
+    alphabet = list(morse)
+    words = []
+    count = 0
+
+    while count < characters:
+        word = "".join(rng.choices(alphabet, k=rng.randint(2, 7)))
+        words.append(word)
+        count += len(word) + 1
+
+    return " ".join(words)
+
+
+def measure_latency(presses: list[tuple[float, float]]) -> np.ndarray:
+    """
+    Keys presses into the sending mode, running headless, with the straight
+    key
+
+    :return: Seconds from posting each key down to its sidetone starting
+    """
+    # Has to be set before pygame starts
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    import pygame
+    import sending
+
+    practice = sending.SendingPractice(None, 15, 15)
+
+    posted = []
+    started = []
+
+    sidetone_start = practice.sidetone.start
+
+    def start_tone():
+        sidetone_start()
+        started.append(time.perf_counter())
+
+    practice.sidetone.start = start_tone
+
+    def key(event_type: int, at: float):
+        time.sleep(max(0.0, at - time.perf_counter()))
+        now = time.perf_counter()
+        pygame.event.post(pygame.event.Event(event_type, key=pygame.K_SPACE))
+
+        if event_type == pygame.KEYDOWN:
+            posted.append(now)
+
+    def run():
+        time.sleep(0.5)
+        start = time.perf_counter()
+
+        for down, up in presses:
+            key(pygame.KEYDOWN, start + down)
+            key(pygame.KEYUP, start + up)
+
+        time.sleep(0.2)
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    threading.Thread(target=run, daemon=True).start()
+    practice.start()
+
+    return np.array(started) - np.array(posted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the accuracy of the hand keying decoder")
+    parser.add_argument("--characters", type=int, default=2000, help="Characters sent at each setting")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", action="store_true",
+                        help="Also measure the sending mode's key to sidetone latency")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    speeds = [10, 15, 20, 25, 30, 35]
+    jitters = [0.0, 0.1, 0.2, 0.3]
+
+    print(f"{'wpm':>5}" + "".join(f"{f'jitter {jitter:.0%}':>13}" for jitter in jitters))
+
+    events = 0
+    elapsed = 0.0
+
+    for wpm in speeds:
+        row = f"{wpm:>5}"
+
+        for jitter in jitters:
+            text = random_text(rng, args.characters)
+            presses, end = synthetic_keying(text, wpm, jitter, rng, dah_ratio=rng.uniform(2.6, 3.4))
+
+            start = time.perf_counter()
+            decoded = decode_keying(presses, end, KeyingDecoder(15, default_codec))
+            elapsed += time.perf_counter() - start
+            events += 2 * len(presses)
+
+            row += f"{accuracy(text, decoded.strip()):>13.1%}"
+
+        print(row)
+
+    print(f"{events / elapsed:,.0f} key events per second, {elapsed / events * 1e6:.2f}us each")
+
+    if args.latency:
+        presses, _ = synthetic_keying(random_text(rng, 60), 25, 0.1, rng)
+        latencies = measure_latency(presses) * 1000
+
+        print(f"Key to sidetone over {latencies.size} presses: median {np.median(latencies):.2f}ms, "
+              f"99th percentile {np.percentile(latencies, 99):.2f}ms, worst {latencies.max():.2f}ms, "
+              f"a frame is {1000 / 60:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Measures how long qrm.SignalMixer takes to mix each block, with more and
+more signals on the band, plus noise, static crashes and fading. Each block
+has to be ready before the one playing ends, so the headroom, the length of
+a block over the time to mix it, has to stay well above 1 to never run out.
+
+Prints the mean, 99th percentile and worst time per block at each number
+of signals, the headroom at the 99th percentile, and if that's within the
+CPU budget.
+
+Usage:
+    python -m benchmarks.qrm --blocks 500 --budget 0.1
+"""
+
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+import qrm
+
+from codec import morse
+from words import code_groups, encode_words
+
+
+def time_blocks(signals: int, blocks: int, block_length: int, seed: int) -> np.ndarray:
+    """
+    Mixes blocks with a number of signals
+
+    :return: Seconds each block took
+    """
+    rng = random.Random(seed)
+
+    wanted = qrm.Signal(encode_words(code_groups(random.Random(seed), list(morse))), 20, fading_depth=0.5)
+    mixer = qrm.SignalMixer([wanted] + qrm.random_signals(rng, signals - 1, wanted.frequency, 20, fading_depth=0.5),
+                            qrm.BandConditions(noise_level=0.2, crash_rate=2),
+                            seed=seed)
+
+    # Warms up the tone loops and numpy
+    for _ in range(10):
+        mixer.block(block_length)
+
+    times = np.zeros(blocks)
+    for index in range(blocks):
+        start = time.perf_counter()
+        mixer.block(block_length)
+        times[index] = time.perf_counter() - start
+
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the time the QRM mixer takes per block")
+    parser.add_argument("--blocks", type=int, default=500)
+    parser.add_argument("--block-time", type=float, default=0.1, help="Length of each block in seconds")
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--budget", type=float, default=0.1,
+                        help="Most of a block's length that mixing it may take, as a fraction")
+    parser.add_argument("--signals", type=int, nargs="+", default=[1, 5, 10, 20, 40])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    block_length = int(round(args.block_time * args.sample_rate))
+
+    print(f"{'signals':>8}{'mean':>10}{'99%':>10}{'worst':>10}{'headroom':>10}  within {args.budget:.0%} budget")
+
+    for signals in args.signals:
+        times = time_blocks(signals, args.blocks, block_length, args.seed) * 1000
+        p99 = np.percentile(times, 99)
+        headroom = args.block_time * 1000 / p99
+
+        print(f"{signals:>8}{times.mean():>8.2f}ms{p99:>8.2f}ms{times.max():>8.2f}ms{headroom:>9.0f}x"
+              f"  {'yes' if p99 <= args.budget * args.block_time * 1000 else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
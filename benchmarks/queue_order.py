@@ -0,0 +1,89 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Checks that repetition.FixedSlotQueue puts characters where the trainer's
+original list queue did, on the first pass through a freshly filled main
+queue. The list queue took the character off the front with pop(0), and put
+it back with insert(new_indices[k]) after k right answers in a row, and new
+characters were appended to the end.
+
+Each case fills a queue, answers the first character right or wrong, then
+adds one more character, and compares the order with the list queue's.
+
+Exits with an error if any order is different.
+
+Usage:
+    python -m benchmarks.queue_order
+"""
+
+
+import sys
+
+import repetition
+
+from engine import TrainerEngine
+
+
+def list_order(characters: str, new_indices: list[int], correct: bool, added: str) -> list[str]:
+    """
+    Order of the original list queue after answering the first character
+    """
+    queue = [(character, 0) for character in characters]
+
+    character, streak = queue.pop(0)
+    streak = streak + 1 if correct else 0
+
+    if streak < len(new_indices):
+        queue.insert(new_indices[streak], (character, streak))
+
+    queue.append((added, 0))
+
+    return [character for character, _ in queue]
+
+
+def heap_order(characters: str, new_indices: list[int], correct: bool, added: str) -> list[str]:
+    """
+    Order of a FixedSlotQueue after answering the first character
+    """
+    queue = repetition.FixedSlotQueue(new_indices)
+
+    for character in characters:
+        queue.add(character)
+
+    queue.answer(correct)
+    queue.add(added)
+
+    return [character for character, _ in queue.items_in_order()]
+
+
+def main():
+    characters = "ABCDEFGH"[:TrainerEngine.main_queue_length]
+    added = "Z"
+
+    # The game's settings, then every slot up to past the end of the queue
+    cases = [TrainerEngine.new_indices] + [[slot, slot] for slot in range(len(characters) + 2)]
+
+    checks = 0
+    failures = 0
+
+    for new_indices in cases:
+        for correct in (False, True):
+            expected = list_order(characters, new_indices, correct, added)
+            got = heap_order(characters, new_indices, correct, added)
+
+            checks += 1
+            if got != expected:
+                failures += 1
+                print(f"new_indices {new_indices}, answered {'right' if correct else 'wrong'}: "
+                      f"{' '.join(got)}, list queue gives {' '.join(expected)}")
+
+    print(f"{checks - failures}/{checks} orders the same as the list queue")
+
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
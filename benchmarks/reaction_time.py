@@ -0,0 +1,156 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Measures how accurately the game times reactions. Runs the game with SDL's
+dummy video and audio drivers, and presses keys from another thread at
+known times after each character ends. The reaction time the game
+measures is compared with the real one.
+
+The end of each sound is found without using the game's sound_end_time:
+a thread watches for the mixer to stop playing it, and adds the latency of
+the mixer's buffer, which is still to be heard. The error is split into the
+audio end, the game's sound_end_time against this, and the key press.
+
+The dummy driver has no sound card, so any latency of a real device after
+the mixer's buffer can't be seen here.
+
+Usage:
+    python -m benchmarks.reaction_time --presses 30
+"""
+
+
+import argparse
+import os
+import random
+import statistics
+import threading
+import time
+
+from typing import Callable
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import main
+
+
+class AudioEndWatcher:
+    """
+    Finds when each sound the box plays is heard to end, from the mixer
+    rather than from the game's own sound_end_time
+    """
+
+    # Seconds between checks of the mixer
+    poll_time = 0.0002
+
+    def __init__(self, box: main.Box, buffer_latency: float):
+        """
+        :param buffer_latency: Seconds of sound in the mixer's buffer, which
+            is still to be heard when the mixer finishes with a sound
+        """
+        self.buffer_latency = buffer_latency
+
+        # Time the last sound played was heard to end, and how many have ended
+        self.end_time: float | None = None
+        self.ended = 0
+
+        play_sound = box.play_sound
+
+        def watched_play_sound(sound: pygame.mixer.Sound):
+            play_sound(sound)
+            threading.Thread(target=self.watch, args=(sound,), daemon=True).start()
+
+        box.play_sound = watched_play_sound
+
+    def watch(self, sound: pygame.mixer.Sound):
+        """
+        Waits for the mixer to stop playing a sound
+        """
+        while not sound.get_num_channels():
+            time.sleep(self.poll_time)
+
+        while sound.get_num_channels():
+            time.sleep(self.poll_time)
+
+        self.end_time = time.perf_counter() + self.buffer_latency
+        self.ended += 1
+
+
+def wait_for(condition: Callable[[], bool]):
+    while not condition():
+        time.sleep(0.001)
+
+
+def press_keys(trainer: main.MorseTrainer,
+               watcher: AudioEndWatcher,
+               presses: int,
+               errors: dict[str, list[float]],
+               rng: random.Random):
+    """
+    Answers each character correctly after a random delay, and records how
+    far the measured reaction time is from the real one
+    """
+    for _ in range(presses):
+        wait_for(lambda: not trainer.is_playing() and not trainer.need_new_character)
+        wait_for(lambda: watcher.ended == trainer.characters_played)
+
+        time.sleep(rng.uniform(0.1, 0.6))
+
+        measured_count = len(trainer.reaction_times)
+
+        press_time = time.perf_counter()
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=0, unicode=trainer.correct_char.lower()))
+
+        wait_for(lambda: len(trainer.reaction_times) != measured_count)
+
+        measured = trainer.reaction_times.recent[-1].seconds
+        audio_error = watcher.end_time - trainer.box.sound_end_time
+        total_error = measured - (press_time - watcher.end_time)
+
+        errors["audio end"].append(audio_error)
+        errors["key press"].append(total_error - audio_error)
+        errors["total"].append(total_error)
+
+    pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+
+def main_function():
+    parser = argparse.ArgumentParser(description="Measure the error in measured reaction times")
+    parser.add_argument("--presses", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--buffer", type=int, default=512, help="Mixer buffer size, in samples")
+    args = parser.parse_args()
+
+    # Quicker characters, so the benchmark doesn't take long
+    main.Box.dit_length = 0.03
+
+    main.mixer_buffer = args.buffer
+
+    trainer = main.MorseTrainer(progress_path=None)
+    watcher = AudioEndWatcher(trainer.box, args.buffer / pygame.mixer.get_init()[0])
+    errors: dict[str, list[float]] = {"audio end": [], "key press": [], "total": []}
+
+    driver = threading.Thread(target=press_keys,
+                              args=(trainer, watcher, args.presses, errors, random.Random(args.seed)),
+                              daemon=True)
+    driver.start()
+    trainer.start()
+
+    print(f"presses: {len(errors['total'])}, mixer buffer {watcher.buffer_latency * 1000:.1f}ms")
+    print(f"{'':>10} {'mean':>8} {'p95':>8} {'max':>8}  signed mean")
+
+    for name, values in errors.items():
+        errors_ms = sorted(abs(error) * 1000 for error in values)
+        print(f"{name:>10} {statistics.mean(errors_ms):>6.3f}ms {errors_ms[int(0.95 * (len(errors_ms) - 1))]:>6.3f}ms "
+              f"{errors_ms[-1]:>6.3f}ms  {statistics.mean(values) * 1000:+.3f}ms")
+
+    print("The audio end is measured from the mixer. Any latency of a sound card after the mixer's buffer "
+          "isn't included")
+
+
+if __name__ == "__main__":
+    main_function()
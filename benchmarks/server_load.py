@@ -0,0 +1,218 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Load test for server.py. Starts a server, then connects more and more
+simulated seats to it at once. Each seat answers like a simulated learner
+from simulate.py, with its thinking and the box's feedback sped up by
+--time-scale, so a few hundred seats make far more work than a real lab.
+
+For each number of seats it prints the answers handled per second, how long
+the server took to mark each answer and to send each character to play,
+and the server's memory and CPU. Sending a character includes its sound
+the first time each seat plays it, about 100KB.
+Memory per seat is what the server grew by over an idle server, divided by
+the number of seats.
+
+Memory and CPU are read from /proc, so are only shown on Linux.
+
+Usage:
+    python -m benchmarks.server_load --seats 1 50 100 200 400 --seconds 10
+"""
+
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from collections import defaultdict
+
+import numpy as np
+
+import server
+import simulate
+
+from codec import morse_length
+
+
+def read_proc(pid: int) -> tuple[float, float] | None:
+    """
+    Gets a process's resident memory in MB and CPU seconds used, or None if
+    there's no /proc to read them from
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            rss = next(int(line.split()[1]) for line in status_file if line.startswith("VmRSS:"))
+
+        with open(f"/proc/{pid}/stat") as stat_file:
+            # Fields after the command, which is in brackets and can have
+            # spaces in it
+            fields = stat_file.read().rsplit(")", 1)[1].split()
+    except (OSError, StopIteration):
+        return None
+
+    ticks = os.sysconf("SC_CLK_TCK")
+    return rss / 1024, (int(fields[11]) + int(fields[12])) / ticks
+
+
+async def seat(name: str, socket_path: str, time_scale: float, stop_time: float, seed: int,
+               replies: dict[str, list[float]]):
+    """
+    One simulated seat. Records the seconds the server took to reply to each
+    message, by the type of reply
+    """
+    reader, writer = await asyncio.open_unix_connection(socket_path, limit=server.message_limit)
+    learner = simulate.LearnerModel(random.Random(seed))
+
+    async def request(message: dict, reply_type: str) -> dict:
+        start = time.perf_counter()
+        writer.write(server.encode(message))
+
+        while True:
+            line = await reader.readline()
+
+            # Sounds aren't played, so aren't worth decoding
+            if line.startswith(b'{"type":"sound"'):
+                continue
+
+            reply = json.loads(line)
+
+            if reply["type"] in (reply_type, "finished", "error"):
+                replies[reply["type"]].append(time.perf_counter() - start)
+                return reply
+
+    await request({"type": "hello", "learner": name, "wpm": 15, "frequency": 600, "sample_rate": 44100}, "learned")
+
+    while time.perf_counter() < stop_time:
+        play = await request({"type": "ready"}, "play")
+        if play["type"] != "play":
+            break
+
+        character = play["character"]
+        key, latency = learner.respond(character)
+        await asyncio.sleep((morse_length(character) * simulate.dit_length + latency) * time_scale)
+
+        answer = await request({"type": "key", "key": key, "seconds": latency}, "answer")
+        learner.shown(character)
+
+        if answer["correct"] and not answer["too_slow"]:
+            await asyncio.sleep(simulate.correct_feedback_time * time_scale)
+        else:
+            await asyncio.sleep(simulate.error_feedback_time * time_scale)
+
+    writer.close()
+    await writer.wait_closed()
+
+
+async def run_level(seats: int, socket_path: str, time_scale: float, seconds: float, level: int) -> dict:
+    """
+    Runs a number of seats at once for some seconds
+    """
+    replies: dict[str, list[float]] = defaultdict(list)
+    stop_time = time.perf_counter() + seconds
+
+    start = time.perf_counter()
+    await asyncio.gather(*(seat(f"load-{level}-{index}", socket_path, time_scale, stop_time, index, replies)
+                           for index in range(seats)))
+    elapsed = time.perf_counter() - start
+
+    answer_ms = np.array(replies["answer"]) * 1000
+    play_ms = np.array(replies["play"]) * 1000
+
+    return {"answers_per_second": answer_ms.size / elapsed,
+            "answer_p50_ms": float(np.median(answer_ms)),
+            "answer_p99_ms": float(np.percentile(answer_ms, 99)),
+            "play_p99_ms": float(np.percentile(play_ms, 99))}
+
+
+async def measure_memory(socket_path: str, seats: int, pid: int, level: int) -> float | None:
+    """
+    Connects some idle seats, and gets the server's memory with them
+    connected
+    """
+    connections = []
+
+    for index in range(seats):
+        reader, writer = await asyncio.open_unix_connection(socket_path, limit=server.message_limit)
+        writer.write(server.encode({"type": "hello", "learner": f"idle-{level}-{index}",
+                                    "wpm": 15, "frequency": 600, "sample_rate": 44100}))
+        writer.write(server.encode({"type": "ready"}))
+        connections.append((reader, writer))
+
+    # Wait for each to be sent its first character
+    for reader, _ in connections:
+        while not (await reader.readline()).startswith(b'{"type":"play"'):
+            pass
+
+    usage = read_proc(pid)
+
+    for _, writer in connections:
+        writer.close()
+
+    return usage[0] if usage else None
+
+
+async def load_test(args, socket_path: str, pid: int):
+    idle = read_proc(pid)
+
+    print(f"{'':>17} {'answer ms':>15} {'play ms':>8}")
+    print(f"{'seats':>6} {'answers/s':>10} {'p50':>7} {'p99':>7} {'p99':>8} {'MB':>7} {'KB/seat':>8} {'CPU':>5}")
+
+    for level, seats in enumerate(args.seats):
+        before = read_proc(pid)
+        result = await run_level(seats, socket_path, args.time_scale, args.seconds, level)
+        after = read_proc(pid)
+
+        memory = await measure_memory(socket_path, seats, pid, level)
+
+        if idle and before and after and memory:
+            cpu = (after[1] - before[1]) / args.seconds
+            usage = f"{memory:>7.1f} {(memory - idle[0]) * 1024 / seats:>8.1f} {cpu:>5.0%}"
+        else:
+            usage = f"{'n/a':>7} {'n/a':>8} {'n/a':>5}"
+
+        print(f"{seats:>6} {result['answers_per_second']:>10.0f} {result['answer_p50_ms']:>7.2f} "
+              f"{result['answer_p99_ms']:>7.2f} {result['play_p99_ms']:>8.2f} {usage}")
+
+        # Let the server notice the seats leaving
+        await asyncio.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the lab server with simulated seats")
+    parser.add_argument("--seats", type=int, nargs="+", default=[1, 50, 100, 200, 400])
+    parser.add_argument("--seconds", type=float, default=10, help="How long to run each number of seats for")
+    parser.add_argument("--time-scale", type=float, default=0.1,
+                        help="Seconds of waiting for each second a real learner would take")
+    parser.add_argument("--progress", action="store_true", help="Save progress, to a temporary database")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, "server.sock")
+
+        command = [sys.executable, "server.py", "--socket", socket_path]
+        command += ["--progress", os.path.join(directory, "lab.db")] if args.progress else ["--no-progress"]
+
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+
+        try:
+            while not os.path.exists(socket_path):
+                if process.poll() is not None:
+                    sys.exit("Server didn't start")
+                time.sleep(0.05)
+
+            asyncio.run(load_test(args, socket_path, process.pid))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Benchmarks of the game's hot paths, run headless with SDL's dummy video and
+audio drivers:
+
+- audio: how far element boundaries in rendered audio are from exact, and
+  how far the box's flashes are from their schedule, at several speeds
+- frame: the cost of draw_elements for a frame where the box changes, and
+  for a frame where everything is redrawn
+- scorecard: the cost of LettersLearned.update
+- queue: generate_character_queue and update_queue with the real alphabet
+  and with made up alphabets of thousands of characters
+- answer: the time from a key press to the next character starting, with
+  every feedback wait skipped, so it's only the game's own work
+
+Results are saved as JSON. compare checks one run against a baseline and
+fails if anything got worse by more than the tolerance.
+
+Usage:
+    python -m benchmarks.suite run --output baseline.json
+    python -m benchmarks.suite run --output new.json --compare baseline.json
+    python -m benchmarks.suite compare baseline.json new.json --tolerance 0.25
+"""
+
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+from typing import Callable
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy as np
+import pygame
+
+import audio
+import instrument
+import main
+
+from codec import default_codec, morse
+from engine import TrainerEngine
+from playback import PlaybackScheduler
+
+# Speeds the audio timing is measured at
+speeds = (15, 25, 40)
+
+# Alphabet sizes the queues are measured at
+alphabet_sizes = (len(morse), 1000, 10_000)
+
+
+def result(value: float, unit: str, better: str = "lower") -> dict:
+    """
+    One measurement
+
+    :param better: "lower" or "higher"
+    """
+    return {"value": float(value), "unit": unit, "better": better}
+
+
+def time_calls(function: Callable[[], object], repeats: int) -> np.ndarray:
+    """
+    Calls a function repeatedly
+
+    :return: Seconds each call took
+    """
+    times = np.zeros(repeats)
+
+    for index in range(repeats):
+        start = time.perf_counter()
+        function()
+        times[index] = time.perf_counter() - start
+
+    return times
+
+
+def make_trainer(time_scale: float = 1.0) -> main.MorseTrainer:
+    """
+    Makes a headless trainer that doesn't save progress. Drawing isn't held
+    to a frame rate, so frames can be timed back to back
+    """
+    trainer_class = type("BenchmarkTrainer", (main.MorseTrainer,), {"time_scale": time_scale})
+
+    trainer = trainer_class(progress_path=None, seed=0)
+    trainer.renderer.frame_rate = 0
+
+    return trainer
+
+
+def audio_benchmarks(trainer: main.MorseTrainer, text: str = "PARIS") -> dict:
+    """
+    Element boundaries in rendered audio, against the exact times, and the
+    box's flashes against their schedule
+    """
+    results = {}
+    sample_rate = pygame.mixer.get_init()[0]
+
+    for wpm in speeds:
+        elements = default_codec.encode_elements(text)
+        exact = audio.element_units(elements, wpm) * audio.wpm_to_dit_length(wpm)
+
+        envelope = audio.render_envelope(elements, wpm, sample_rate, ramp_time=0)
+        edges = np.flatnonzero(np.diff(np.r_[0, envelope > 0.5, 0].astype(np.int8))) / sample_rate
+        boundaries = exact[np.r_[True, np.diff(np.asarray(elements) > 0) != 0, True]]
+
+        results[f"audio_boundary_error_us@{wpm}wpm"] = result(np.abs(edges - boundaries[:edges.size]).max() * 1e6, "us")
+
+    # Flashes, played in real time on a scheduler of their own
+    scheduler = PlaybackScheduler(clock=time.perf_counter)
+    dit_length = trainer.box.dit_length
+
+    for wpm in speeds:
+        instrument.tracer = instrument.Tracer()
+        trainer.box.dit_length = audio.wpm_to_dit_length(wpm)
+
+        for character in text:
+            done = threading.Event()
+            scheduler.submit(trainer.box.morse_timeline(character), done.set)
+            done.wait()
+
+        errors = np.array([actual - scheduled for *_, scheduled, actual in instrument.tracer.elements])
+        results[f"flash_error_ms_p95@{wpm}wpm"] = result(np.percentile(np.abs(errors), 95) * 1000, "ms")
+
+    instrument.tracer = None
+    trainer.box.dit_length = dit_length
+    scheduler.stop()
+
+    return results
+
+
+def frame_benchmarks(trainer: main.MorseTrainer, frames: int = 500) -> dict:
+    """
+    draw_elements when only the box changes, and when everything is redrawn
+    """
+    box = trainer.box
+    colours = (box.inner_colour_morse, box.inner_colour_normal)
+
+    def box_frame():
+        box.set_inner_colour(colours[box.state.inner_colour == colours[0]])
+        trainer.draw_elements()
+
+    def full_frame():
+        trainer.renderer.redraw_all()
+        trainer.draw_elements()
+
+    box.set_font("A")
+
+    return {
+        "draw_box_frame_us": result(np.median(time_calls(box_frame, frames)) * 1e6, "us"),
+        "draw_full_frame_us": result(np.median(time_calls(full_frame, frames)) * 1e6, "us"),
+    }
+
+
+def scorecard_benchmarks(trainer: main.MorseTrainer, repeats: int = 20) -> dict:
+    """
+    LettersLearned.update, adding every character in turn
+    """
+    letters_learned = trainer.letters_learned
+    times = []
+
+    for _ in range(repeats):
+        letters_learned.learned_letters = []
+
+        for character in morse:
+            start = time.perf_counter()
+            letters_learned.update(character)
+            times.append(time.perf_counter() - start)
+
+    letters_learned.learned_letters = []
+    letters_learned.update()
+
+    return {"scorecard_update_us": result(np.median(times) * 1e6, "us")}
+
+
+def made_up_alphabet(size: int) -> dict[str, str]:
+    """
+    Characters with codes of every length, enough of them to make an
+    alphabet of a size. The characters are CJK ideographs, which count as
+    letters
+    """
+    alphabet = {}
+    length = 1
+
+    while len(alphabet) < size:
+        for number in range(2 ** length):
+            code = format(number, f"0{length}b").replace("0", ".").replace("1", "-")
+            alphabet[chr(0x4E00 + len(alphabet))] = code
+
+            if len(alphabet) == size:
+                break
+
+        length += 1
+
+    return alphabet
+
+
+def queue_benchmarks(answers: int = 20_000) -> dict:
+    """
+    generate_character_queue, and answering with update_queue, at each
+    alphabet size
+    """
+    results = {}
+
+    for size in alphabet_sizes:
+        alphabet = morse if size == len(morse) else made_up_alphabet(size)
+        engine = type("BenchmarkEngine", (TrainerEngine,), {"alphabet": alphabet})(rng=random.Random(0))
+
+        generate = time_calls(engine.generate_character_queue, 20)
+        results[f"generate_queue_us@{size}"] = result(np.median(generate) * 1e6, "us")
+
+        rng = random.Random(0)
+        start = time.perf_counter()
+
+        for _ in range(answers):
+            if engine.is_queue_empty():
+                engine.generate_character_queue()
+
+            engine.get_next_char()
+            engine.update_queue(rng.random() < 0.8)
+
+        elapsed = time.perf_counter() - start
+        results[f"update_queue_per_s@{size}"] = result(answers / elapsed, "answers/s", "higher")
+
+    return results
+
+
+def answer_benchmarks(answers: int = 100) -> dict:
+    """
+    Time from posting a key press to the next character starting, with every
+    wait in the game skipped. Answers are right, so the feedback is the
+    shortest
+    """
+    trainer = make_trainer(time_scale=0)
+    latencies = []
+
+    def waiting_for_answer() -> bool:
+        return trainer.characters_played and not trainer.is_playing() and not trainer.need_new_character
+
+    def answer_all():
+        for _ in range(answers):
+            while not waiting_for_answer():
+                time.sleep(0)
+
+            played = trainer.characters_played
+            start = time.perf_counter()
+            pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=0, unicode=trainer.correct_char.lower(),
+                                                 reaction_seconds=0.1))
+
+            while trainer.characters_played == played:
+                time.sleep(0)
+
+            latencies.append(time.perf_counter() - start)
+
+        main.post_event(pygame.QUIT)
+
+    threading.Thread(target=answer_all, daemon=True).start()
+    trainer.start()
+
+    latencies_ms = np.array(latencies) * 1000
+
+    return {
+        "answer_to_next_ms_p50": result(np.median(latencies_ms), "ms"),
+        "answer_to_next_ms_p95": result(np.percentile(latencies_ms, 95), "ms"),
+    }
+
+
+def run(quick: bool = False) -> dict:
+    """
+    Runs every benchmark
+
+    :param quick: Fewer repeats, for a rough check
+    :return: Results with the versions and machine they were run on
+    """
+    scale = 0.2 if quick else 1.0
+    results = {}
+
+    trainer = make_trainer()
+    results.update(audio_benchmarks(trainer))
+    results.update(frame_benchmarks(trainer, int(500 * scale)))
+    results.update(scorecard_benchmarks(trainer, max(1, int(20 * scale))))
+    trainer.quit_game()
+
+    results.update(queue_benchmarks(int(20_000 * scale)))
+
+    # Last, as the game quits pygame when it's done
+    results.update(answer_benchmarks(max(10, int(100 * scale))))
+
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "numpy": np.__version__,
+        "machine": platform.platform(),
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> tuple[list[str], list[str]]:
+    """
+    Prints each result next to the baseline
+
+    :param tolerance: Fraction a result can get worse by before it counts as
+        a regression
+    :return: Names of the results that regressed, and of those in the
+        baseline that are missing from the current results
+    """
+    regressions = []
+    missing = []
+
+    print(f"{'benchmark':<32}{'baseline':>14}{'current':>14}{'change':>9}")
+
+    for name, base in baseline["results"].items():
+        now = current["results"].get(name)
+        if now is None:
+            # A benchmark that was removed or broke can't be let through
+            missing.append(name)
+            print(f"{name:<32}{base['value']:>14.3f}{'missing':>14}{'':>9}  MISSING")
+            continue
+
+        change = (now["value"] - base["value"]) / base["value"] if base["value"] else 0.0
+        worse = change if base["better"] == "lower" else -change
+
+        regressed = worse > tolerance
+        if regressed:
+            regressions.append(name)
+
+        print(f"{name:<32}{base['value']:>14.3f}{now['value']:>14.3f}{change:>+9.0%}"
+              f"{'  REGRESSED' if regressed else ''}")
+
+    return regressions, missing
+
+
+def main_function():
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths, and compare with a baseline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument("--output", help="File to save the results to")
+    run_parser.add_argument("--compare", metavar="BASELINE", help="Compare the results with a saved baseline")
+    run_parser.add_argument("--tolerance", type=float, default=0.25)
+    run_parser.add_argument("--quick", action="store_true", help="Fewer repeats, for a rough check")
+
+    compare_parser = commands.add_parser("compare", help="Compare saved results with a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--tolerance", type=float, default=0.25)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        current = run(args.quick)
+
+        if args.output:
+            with open(args.output, "w") as output_file:
+                json.dump(current, output_file, indent=1)
+
+        baseline_path = args.compare
+    else:
+        with open(args.current) as current_file:
+            current = json.load(current_file)
+
+        baseline_path = args.baseline
+
+    if not baseline_path:
+        for name, measured in current["results"].items():
+            print(f"{name:<32}{measured['value']:>14.3f} {measured['unit']}")
+        return
+
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+
+    regressions, missing = compare(baseline, current, args.tolerance)
+
+    if regressions:
+        print(f"{len(regressions)} regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+
+    if missing:
+        print(f"{len(missing)} in the baseline but not in the results: {', '.join(missing)}")
+
+    if regressions or missing:
+        sys.exit(1)
+
+    print(f"Nothing regressed by more than {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main_function()
@@ -0,0 +1,281 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+A seat for server.py. Looks and plays the same as main.py, but the queues
+and progress are kept by the server, which says what to play and if each
+answer was right. The morse comes from the server too, already rendered, so
+the seat never renders any.
+
+Answers are timed here, from the end of the morse to the key press, so the
+connection doesn't add to them.
+
+Usage:
+    python client.py --learner alice
+    python client.py --learner bob --port 5050
+"""
+
+
+import argparse
+import base64
+import json
+import socket
+import threading
+
+import numpy as np
+import pygame
+from pygame import locals
+
+import audio
+import fonts
+import main
+import server
+
+from playback import Job, PlaybackScheduler, Timeline
+
+# Posted by the thread reading from the server, with the message in message
+server_message_event = pygame.event.custom_type()
+
+
+class SeatClient:
+    """
+    Window with the box and the letters learned, played from the server's
+    messages
+    """
+
+    window_width = main.MorseTrainer.window_width
+    window_height = main.MorseTrainer.window_height
+    frame_rate = main.MorseTrainer.frame_rate
+
+    clock = main.Box.clock
+
+    def __init__(self, learner: str, socket_path: str | None = server.default_socket_path, port: int | None = None):
+        """
+        :param learner: Name the server saves progress under
+        :param socket_path: Server's Unix socket, if port isn't given
+        :param port: Server's TCP port on localhost
+        """
+        if port is not None:
+            self.connection = socket.create_connection(("127.0.0.1", port))
+        else:
+            self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.connection.connect(socket_path)
+
+        pygame.display.init()
+        pygame.mixer.init(buffer=main.mixer_buffer)
+        pygame.font.init()
+
+        self.screen = pygame.display.set_mode(size=(self.window_width, self.window_height))
+        pygame.display.set_caption(f"Morse trainer - {learner}")
+
+        self.box = main.Box()
+        self.box.rect.center = self.screen.get_rect().center
+
+        self.letters_learned = main.LettersLearned(self.window_width)
+        self.status_text = main.TextLine(fonts.load_font(main.font_name, 30),
+                                         self.screen.get_rect().centerx,
+                                         self.window_height - main.MorseTrainer.paused_text_distance_from_bottom)
+
+        self.renderer = main.Renderer(self.screen, self.frame_rate)
+        for sprite in (self.box, self.letters_learned, self.status_text):
+            self.renderer.add(sprite)
+
+        self.scheduler = PlaybackScheduler()
+        self.box_job: Job | None = None
+
+        # What the seat is doing: "starting", "playing" the morse,
+        # "answering", "waiting" for the server to mark the answer, showing
+        # "feedback", "paused" or "finished"
+        self.state = "starting"
+        self.character = ""
+
+        # Time, by self.clock, that pygame.event.wait() last returned
+        self.events_time = 0.0
+
+        self.send({"type": "hello",
+                   "learner": learner,
+                   "wpm": audio.dit_length_to_wpm(self.box.dit_length),
+                   "frequency": self.box.tone_frequency,
+                   "sample_rate": pygame.mixer.get_init()[0]})
+
+        threading.Thread(target=self.read_messages, name="server", daemon=True).start()
+
+    def send(self, message: dict):
+        self.connection.sendall(server.encode(message))
+
+    def read_messages(self):
+        """
+        Thread that reads the server's messages and posts them to the main
+        loop. Posts a "closed" message when the connection closes
+        """
+        with self.connection.makefile("rb") as lines:
+            for line in lines:
+                self.post_message(json.loads(line))
+
+        self.post_message({"type": "closed"})
+
+    def post_message(self, message: dict):
+        if pygame.display.get_init():
+            try:
+                pygame.event.post(pygame.event.Event(server_message_event, message=message))
+            except pygame.error:
+                pass
+
+    def play_on_box(self, timeline: Timeline):
+        """
+        Starts a timeline on the box. box_finished_event is posted when it
+        ends or is cancelled
+        """
+        self.box_job = self.scheduler.submit(timeline, on_finished=lambda: main.post_event(main.box_finished_event))
+
+    def handle_message(self, message: dict) -> bool:
+        """
+        :return: False if the window should close
+        """
+        kind = message["type"]
+
+        if kind == "learned":
+            self.letters_learned.learned_letters = list(message["characters"])
+            self.letters_learned.update()
+
+            if self.state != "paused":
+                self.state = "feedback"
+                self.send({"type": "ready"})
+
+        elif kind == "sound":
+            # Put where Box.get_sound looks, so it's never rendered here
+            samples = np.frombuffer(base64.b64decode(message["samples"]), dtype="<i2")
+            key = (message["character"], message["wpm"], message["frequency"], message["sample_rate"])
+            main.Box.sounds.get(key, lambda: main.make_sound(samples.astype(np.int16)))
+
+        elif kind == "play":
+            self.character = message["character"]
+            self.state = "playing"
+            self.play_on_box(self.box.morse_timeline(self.character))
+
+        elif kind == "answer":
+            if message["learned"]:
+                self.scheduler.submit(self.letters_learned.learned_timeline(message["learned"]))
+
+            if self.state == "paused":
+                return True
+
+            if message["correct"] and not message["too_slow"]:
+                timeline = self.box.correct_timeline()
+            else:
+                timeline = self.box.error_timeline(message["character"], message["too_slow"])
+
+            self.state = "feedback"
+            self.play_on_box(timeline)
+
+        elif kind == "finished":
+            self.state = "finished"
+            self.status_text.set_text("All learned")
+
+        elif kind == "error":
+            print(f"Server: {message['message']}")
+
+        elif kind == "closed":
+            print("Server closed the connection")
+            return False
+
+        return True
+
+    def box_finished(self):
+        """
+        Moves on when the box finishes playing
+        """
+        if self.state == "playing":
+            self.state = "answering"
+
+        elif self.state == "feedback":
+            self.send({"type": "ready"})
+
+    def pause(self):
+        """
+        Stops playing, and tells the server, which counts the character as
+        wrong if it was being asked
+        """
+        self.send({"type": "pause"})
+        self.state = "paused"
+
+        self.box.paused.set()
+        if self.box_job:
+            self.scheduler.cancel(self.box_job)
+
+        self.box.reset_box()
+        self.status_text.set_text("Paused")
+
+    def unpause(self):
+        self.box.paused.clear()
+        self.status_text.set_text("")
+
+        self.state = "feedback"
+        self.send({"type": "ready"})
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        """
+        :return: False if the window should close
+        """
+        if event.type == pygame.WINDOWEXPOSED:
+            self.renderer.redraw_all()
+
+        elif event.type == locals.QUIT:
+            return False
+
+        elif event.type == server_message_event:
+            return self.handle_message(event.message)
+
+        elif event.type == main.box_finished_event:
+            if self.state != "paused":
+                self.box_finished()
+
+        elif event.type == locals.KEYDOWN:
+            if event.key == locals.K_ESCAPE:
+                if self.state == "paused":
+                    self.unpause()
+                elif self.state != "finished":
+                    self.pause()
+
+            elif self.state == "answering" and event.unicode.isalnum():
+                self.send({"type": "key",
+                           "key": event.unicode,
+                           "seconds": self.events_time - self.box.sound_end_time})
+                self.state = "waiting"
+
+        return True
+
+    def start(self):
+        """
+        Runs until the window is closed or the server goes away
+        """
+        running = True
+        while running:
+            self.renderer.draw()
+
+            events = [pygame.event.wait()]
+            self.events_time = self.clock()
+            events.extend(pygame.event.get())
+
+            for event in events:
+                running = self.handle_event(event) and running
+
+        self.scheduler.stop()
+        self.connection.close()
+        pygame.quit()
+
+
+def main_function():
+    parser = argparse.ArgumentParser(description="Train at a seat of a server.py server")
+    parser.add_argument("--learner", required=True, help="Your name, which your progress is saved under")
+    parser.add_argument("--socket", default=server.default_socket_path, help="Server's Unix socket")
+    parser.add_argument("--port", type=int, help="Server's TCP port on localhost, instead of the socket")
+    args = parser.parse_args()
+
+    client = SeatClient(args.learner, args.socket, args.port)
+    client.start()
+
+
+if __name__ == "__main__":
+    main_function()
@@ -0,0 +1,413 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Morse code tables, and a Codec that converts text to and from morse.
+
+The Codec builds its lookup tables once. Encoding is done with str.translate
+and decoding of element arrays with numpy, so whole practice corpora can be
+converted without a Python loop per dit or dah. Decoding goes through a
+binary trie stored as a flat list in heap order: the root is index 1, and
+the node after a dit or dah from node n is 2n or 2n + 1.
+
+Doesn't depend on pygame
+"""
+
+
+import numpy as np
+
+# Characters the trainer teaches
+morse = {
+    "A": ".-",
+    "B": "-...",
+    "C": "-.-.",
+    "D": "-..",
+    "E": ".",
+    "F": "..-.",
+    "G": "--.",
+    "H": "....",
+    "I": "..",
+    "J": ".---",
+    "K": "-.-",
+    "L": ".-..",
+    "M": "--",
+    "N": "-.",
+    "O": "---",
+    "P": ".--.",
+    "Q": "--.-",
+    "R": ".-.",
+    "S": "...",
+    "T": "-",
+    "U": "..-",
+    "V": "...-",
+    "W": ".--",
+    "X": "-..-",
+    "Y": "-.--",
+    "Z": "--..",
+    "0": "-----",
+    "1": ".----",
+    "2": "..---",
+    "3": "...--",
+    "4": "....-",
+    "5": ".....",
+    "6": "-....",
+    "7": "--...",
+    "8": "---..",
+    "9": "----.",
+}
+
+
+# Punctuation, from ITU-R M.1677
+punctuation = {
+    ".": ".-.-.-",
+    ",": "--..--",
+    "?": "..--..",
+    "'": ".----.",
+    "!": "-.-.--",
+    "/": "-..-.",
+    "(": "-.--.",
+    ")": "-.--.-",
+    "&": ".-...",
+    ":": "---...",
+    ";": "-.-.-.",
+    "=": "-...-",
+    "+": ".-.-.",
+    "-": "-....-",
+    "_": "..--.-",
+    "\"": ".-..-.",
+    "$": "...-..-",
+    "@": ".--.-.",
+}
+
+# Prosigns, written in text between angle brackets. Some share their morse
+# with punctuation, in which case decoding gives the punctuation
+prosigns = {
+    "<AR>": ".-.-.",
+    "<AS>": ".-...",
+    "<BT>": "-...-",
+    "<CT>": "-.-.-",
+    "<HH>": "........",
+    "<KN>": "-.--.",
+    "<SK>": "...-.-",
+    "<SN>": "...-.",
+    "<SOS>": "...---...",
+}
+
+# Tables for other alphabets. Not used unless given to a Codec
+cyrillic = {
+    "А": ".-",
+    "Б": "-...",
+    "В": ".--",
+    "Г": "--.",
+    "Д": "-..",
+    "Е": ".",
+    "Ж": "...-",
+    "З": "--..",
+    "И": "..",
+    "Й": ".---",
+    "К": "-.-",
+    "Л": ".-..",
+    "М": "--",
+    "Н": "-.",
+    "О": "---",
+    "П": ".--.",
+    "Р": ".-.",
+    "С": "...",
+    "Т": "-",
+    "У": "..-",
+    "Ф": "..-.",
+    "Х": "....",
+    "Ц": "-.-.",
+    "Ч": "---.",
+    "Ш": "----",
+    "Щ": "--.-",
+    "Ъ": "--.--",
+    "Ы": "-.--",
+    "Ь": "-..-",
+    "Э": "..-..",
+    "Ю": "..--",
+    "Я": ".-.-",
+}
+
+greek = {
+    "Α": ".-",
+    "Β": "-...",
+    "Γ": "--.",
+    "Δ": "-..",
+    "Ε": ".",
+    "Ζ": "--..",
+    "Η": "....",
+    "Θ": "-.-.",
+    "Ι": "..",
+    "Κ": "-.-",
+    "Λ": ".-..",
+    "Μ": "--",
+    "Ν": "-.",
+    "Ξ": "-..-",
+    "Ο": "---",
+    "Π": ".--.",
+    "Ρ": ".-.",
+    "Σ": "...",
+    "Τ": "-",
+    "Υ": "-.--",
+    "Φ": "..-.",
+    "Χ": "----",
+    "Ψ": "--.-",
+    "Ω": ".--",
+}
+
+# Units of time for each symbol in the string made by Codec.encode_symbols.
+# Positive is tone, negative is silence. A word gap is the character gap
+# after the last character plus 4 more, making 7
+symbol_units = np.zeros(256, dtype=np.int8)
+symbol_units[ord(".")] = 1
+symbol_units[ord("-")] = 3
+symbol_units[ord("e")] = -1
+symbol_units[ord("c")] = -3
+symbol_units[ord("w")] = -4
+
+# Shown when decoding morse that isn't in the table
+unknown_character = "?"
+
+# Word separator in encoded text
+word_separator = "/"
+
+# First of the unicode private use characters that prosigns are swapped for
+# while encoding, so they can go through str.translate
+private_use_start = 0xE000
+
+
+def code_length(code: str) -> int:
+    """
+    Gets the number of dit lengths it takes to key a code, like ".-"
+    """
+    return code.count(".") + 3 * code.count("-") + len(code) - 1
+
+
+class Codec:
+    """
+    Converts text to and from morse using one or more tables. When tables
+    disagree, the first table to have a character or a code wins
+
+    Encoded text has the codes of each character separated by a space, and
+    words separated by " / ", for example ".... .. / - .... . .-. ."
+    """
+
+    def __init__(self, *tables: dict[str, str]):
+        """
+        :param tables: Dictionaries of character to code. Keys longer than
+            one character, like "<AR>", are prosigns
+        """
+        if not tables:
+            tables = (morse, punctuation, prosigns)
+
+        # Character to code, and code to character
+        self.codes: dict[str, str] = {}
+        self.characters: dict[str, str] = {}
+
+        for table in tables:
+            for character, code in table.items():
+                if set(code) - set(".-") or not code:
+                    raise ValueError(f"Not a morse code: {code!r}")
+
+                self.codes.setdefault(character, code)
+                self.characters.setdefault(code, character)
+
+        # Number of dit lengths to key each character
+        self.lengths: dict[str, int] = {character: code_length(code) for character, code in self.codes.items()}
+
+        # Decode trie, as a flat list in heap order
+        self.longest_code = max(len(code) for code in self.codes.values())
+        self.trie = [""] * (2 ** (self.longest_code + 1))
+
+        for code, character in self.characters.items():
+            self.trie[self.trie_index(code)] = character
+
+        self.trie_array = np.array([c if c else unknown_character for c in self.trie], dtype=object)
+
+        # Prosigns are swapped for single private use characters
+        self.multi_character_keys: dict[str, str] = {}
+        for character in self.codes:
+            if len(character) > 1:
+                self.multi_character_keys[character] = chr(private_use_start + len(self.multi_character_keys))
+
+        # str.translate tables, to codes and to element symbols
+        self.code_translation: dict[int, str] = {ord(" "): word_separator + " "}
+        self.symbol_translation: dict[int, str] = {ord(" "): "w"}
+
+        for character, code in self.codes.items():
+            key = self.multi_character_keys.get(character, character)
+
+            for variant in {key, key.lower()}:
+                if len(variant) != 1:
+                    continue
+
+                self.code_translation.setdefault(ord(variant), code + " ")
+                self.symbol_translation.setdefault(ord(variant), "e".join(code) + "c")
+
+        self.decode_lookup = dict(self.characters)
+        self.decode_lookup[word_separator] = " "
+        self.decode_lookup[""] = ""
+
+    @staticmethod
+    def trie_index(code: str) -> int:
+        """
+        Gets the index of a code's node in the decode trie
+        """
+        return int("1" + code.replace(".", "0").replace("-", "1"), 2)
+
+    @staticmethod
+    def trie_step(node: int, dah: bool) -> int:
+        """
+        Moves down the decode trie by one element. Start at node 1
+        """
+        return 2 * node + dah
+
+    def trie_character(self, node: int) -> str:
+        """
+        Gets the character at a trie node, or an empty string if there isn't
+        one there
+        """
+        if node < len(self.trie):
+            return self.trie[node]
+
+        return ""
+
+    def prepare(self, text: str, errors: str) -> str:
+        """
+        Swaps prosigns for their private use characters, and deals with
+        characters that have no code
+
+        :param errors: "strict" to raise ValueError on characters with no
+            code, or "ignore" to leave them out
+        """
+        for key, replacement in self.multi_character_keys.items():
+            if key in text:
+                text = text.replace(key, replacement)
+
+        unknown = {ord(c) for c in set(text)} - self.code_translation.keys()
+
+        if unknown:
+            if errors == "strict":
+                raise ValueError(f"No morse code for {''.join(sorted(map(chr, unknown)))!r}")
+
+            text = text.translate(dict.fromkeys(unknown))
+
+        return text
+
+    def encode(self, text: str, errors: str = "strict") -> str:
+        """
+        Encodes text as morse, for example "HI" is ".... .."
+
+        :param text: Text in upper or lower case. Prosigns are written like
+            "<SK>"
+        :param errors: "strict" to raise ValueError on characters with no
+            code, or "ignore" to leave them out
+        """
+        return self.prepare(text, errors).translate(self.code_translation).rstrip()
+
+    def decode(self, codes: str) -> str:
+        """
+        Decodes morse written like the output of encode(). Codes that aren't
+        in the table come out as "?"
+        """
+        get = self.decode_lookup.get
+        return "".join([get(code, unknown_character) for code in codes.split(" ")])
+
+    def encode_symbols(self, text: str, errors: str = "strict") -> str:
+        """
+        Encodes text as a string of element symbols. "." and "-" are dits and
+        dahs, "e" the gap after an element, "c" the gap after a character and
+        "w" the extra gap between words
+        """
+        return self.prepare(text, errors).translate(self.symbol_translation)
+
+    def encode_elements(self, text: str, errors: str = "strict") -> np.ndarray:
+        """
+        Encodes text as the length of each tone and silence, in dit lengths.
+        Tones are positive and silences negative, for example "A" is
+        [1, -1, 3, -3]
+
+        :return: int8 numpy array
+        """
+        symbols = self.encode_symbols(text, errors).encode("ascii")
+        return symbol_units[np.frombuffer(symbols, dtype=np.uint8)]
+
+    def decode_elements(self, elements) -> str:
+        """
+        Decodes tone and silence lengths, in the form given by
+        encode_elements(). Lengths don't have to be exact: tones of 2 or more
+        are dahs, silences of 2 or more end a character and silences of 5 or
+        more end a word
+
+        :param elements: Sequence of numbers, positive for tone and negative
+            for silence
+        """
+        elements = np.asarray(elements, dtype=np.float64)
+        if elements.size == 0:
+            return ""
+
+        # Join silences that follow each other
+        silence = elements < 0
+        run_starts = np.flatnonzero(np.r_[True, ~(silence[1:] & silence[:-1])])
+        elements = np.add.reduceat(elements, run_starts)
+
+        tone = elements > 0
+        if not tone.any():
+            return ""
+
+        character_ends = np.cumsum(elements <= -2)
+        word_ends = np.cumsum(elements <= -5)
+
+        tone_characters = character_ends[tone]
+        tone_words = word_ends[tone]
+        dahs = (elements[tone] >= 2).astype(np.int64)
+
+        group_starts = np.flatnonzero(np.r_[True, tone_characters[1:] != tone_characters[:-1]])
+        group_lengths = np.diff(np.r_[group_starts, len(dahs)])
+
+        # Index in the trie is a 1 followed by the elements as bits
+        lengths = np.repeat(group_lengths, group_lengths)
+        positions = np.arange(len(dahs)) - np.repeat(group_starts, group_lengths)
+        shifts = np.minimum(lengths - 1 - positions, 62)
+
+        indices = np.add.reduceat(dahs << shifts, group_starts)
+        valid = group_lengths <= self.longest_code
+        indices = np.where(valid, indices + (1 << np.minimum(group_lengths, 62)), 0)
+
+        characters = self.trie_array[indices]
+
+        # Space before any character that starts a new word
+        new_word = np.r_[False, tone_words[group_starts][1:] != tone_words[group_starts][:-1]]
+        characters = np.where(new_word, " " + characters, characters)
+
+        return "".join(characters.tolist())
+
+
+# Codec for the trainer's characters, punctuation and prosigns
+default_codec = Codec(morse, punctuation, prosigns)
+
+
+def encode(text: str, errors: str = "strict") -> str:
+    """
+    Encodes text as morse with the default codec. See Codec.encode
+    """
+    return default_codec.encode(text, errors)
+
+
+def decode(codes: str) -> str:
+    """
+    Decodes morse with the default codec. See Codec.decode
+    """
+    return default_codec.decode(codes)
+
+
+def morse_length(character) -> int:
+    """
+    Gets the amount of time that it takes to key a character in morse
+
+    :return: number of 'dit' lengths it takes to key a character in morse
+    :raises KeyError: If character doesn't have morse code
+    """
+    return default_codec.lengths[character]
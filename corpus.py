@@ -0,0 +1,372 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Index of a word list, for picking words made only of the characters the
+player has learned.
+
+Each word is stored with a bitmask of the characters in it, one bit per
+character of the morse table. Words are sorted by mask then by length, so
+the words with the same mask are together, shortest first. A word can be
+sent once every bit of its mask is in the mask of learned characters, which
+is one AND over the distinct masks rather than a look at every word.
+
+The index is saved as one file of raw arrays, which is memory mapped when
+loaded, so even a very large word list opens instantly and only the parts
+used are read from disk.
+
+Usage:
+    python corpus.py build words.txt words.index
+    python corpus.py sample words.index ETANIMS --count 20
+"""
+
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from codec import morse, morse_length
+
+# Characters that words can be made of. Character i is bit i of a mask
+alphabet = list(morse)
+bits = {character: 1 << i for i, character in enumerate(alphabet)}
+
+# Gap between characters, in dits
+character_gap = 3
+
+
+def character_mask(characters: Iterable[str]) -> int:
+    """
+    Gets the mask of a set of characters. Ones not in the alphabet are
+    ignored
+    """
+    mask = 0
+    for character in characters:
+        mask |= bits.get(character.upper(), 0)
+
+    return mask
+
+
+def word_length(word: str) -> int:
+    """
+    Gets the number of dits it takes to send a word, not counting the gap
+    after it
+    """
+    return sum(morse_length(character) for character in word) + character_gap * (len(word) - 1)
+
+
+class CorpusIndex:
+    """
+    Word list indexed by character mask and length. Build one with build(),
+    save() it, and load() it later
+    """
+
+    magic = b"MCLCORP1"
+
+    # Arrays saved in the file
+    array_names = ("masks", "group_starts", "keys", "text_offsets", "text")
+
+    # Arrays in the file start at multiples of this
+    alignment = 64
+
+    def __init__(self, arrays: dict[str, np.ndarray]):
+        """
+        Use build() or load() rather than this
+
+        :param arrays: masks is each distinct mask, in order. group_starts
+            has the index of the first word with each mask, then the number
+            of words. keys is each word's mask index shifted left 16 bits
+            plus its length, which sorts the same as the words. Each word is
+            text[text_offsets[i]:text_offsets[i + 1]]
+        """
+        self.masks: np.ndarray = arrays["masks"]
+        self.group_starts: np.ndarray = arrays["group_starts"]
+        self.keys: np.ndarray = arrays["keys"]
+        self.text_offsets: np.ndarray = arrays["text_offsets"]
+        self.text: np.ndarray = arrays["text"]
+
+        # Last query, as (learned mask, max length), and its groups, the
+        # number of words in each that are short enough, and the running
+        # total of those. The learned set only changes now and then, so one
+        # is enough
+        self.candidates_key: tuple[int, int | None] | None = None
+        self.candidates_value: tuple[np.ndarray, np.ndarray, np.ndarray] | None = None
+        self.cumulative_counts: np.ndarray | None = None
+
+        # Last weighted query, and the cumulative weight of each group
+        self.weights_key: tuple | None = None
+        self.cumulative_weights: np.ndarray | None = None
+
+    @classmethod
+    def build(cls, words: Iterable[str]) -> "CorpusIndex":
+        """
+        Indexes words. They're put in upper case, and ones with characters
+        that aren't in the alphabet, or that are repeated, are dropped
+        """
+        unique = dict.fromkeys(word.strip().upper() for word in words)
+        kept = [word for word in unique if word and all(character in bits for character in word)]
+
+        masks = np.array([character_mask(word) for word in kept], dtype=np.uint64)
+        lengths = np.array([word_length(word) for word in kept], dtype=np.uint64)
+
+        if lengths.size and lengths.max() >= 1 << 16:
+            raise ValueError("Word too long to index")
+
+        order = np.lexsort((lengths, masks))
+        masks, lengths = masks[order], lengths[order]
+
+        distinct, group_of_word, counts = np.unique(masks, return_inverse=True, return_counts=True)
+
+        encoded = [kept[i].encode("ascii") for i in order.tolist()]
+
+        return cls({
+            "masks": distinct.astype(np.uint64),
+            "group_starts": np.r_[0, np.cumsum(counts)].astype(np.uint32),
+            "keys": (group_of_word.astype(np.uint64) << np.uint64(16)) | lengths,
+            "text_offsets": np.r_[0, np.cumsum([len(word) for word in encoded])].astype(np.uint32),
+            "text": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        })
+
+    def save(self, path: str):
+        """
+        Writes the index to a file that load() can memory map
+        """
+        header = {}
+        offset = 0
+
+        for name in self.array_names:
+            array = np.ascontiguousarray(getattr(self, name))
+            header[name] = [array.dtype.str, offset, int(array.size)]
+            offset += -(-array.nbytes // self.alignment) * self.alignment
+
+        header_bytes = json.dumps(header).encode("ascii")
+        data_start = -(-(len(self.magic) + 4 + len(header_bytes)) // self.alignment) * self.alignment
+
+        with open(path, "wb") as index_file:
+            index_file.write(self.magic)
+            index_file.write(np.uint32(len(header_bytes)).tobytes())
+            index_file.write(header_bytes)
+
+            for name in self.array_names:
+                index_file.seek(data_start + header[name][1])
+                index_file.write(np.ascontiguousarray(getattr(self, name)).tobytes())
+
+            # Makes the file the full length, even if the last array is empty
+            index_file.truncate(data_start + offset)
+
+    @classmethod
+    def load(cls, path: str) -> "CorpusIndex":
+        """
+        Memory maps an index saved by save()
+
+        :raises ValueError: if the file isn't an index
+        """
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+
+        if bytes(data[:len(cls.magic)]) != cls.magic:
+            raise ValueError(f"{path} isn't a corpus index")
+
+        header_length = int(data[len(cls.magic):len(cls.magic) + 4].view(np.uint32)[0])
+        header_start = len(cls.magic) + 4
+        header = json.loads(bytes(data[header_start:header_start + header_length]))
+
+        data_start = -(-(header_start + header_length) // cls.alignment) * cls.alignment
+
+        arrays = {}
+        for name in cls.array_names:
+            dtype, offset, count = header[name]
+            dtype = np.dtype(dtype)
+
+            start = data_start + offset
+            arrays[name] = data[start:start + count * dtype.itemsize].view(dtype)
+
+        return cls(arrays)
+
+    def __len__(self) -> int:
+        return int(self.keys.size)
+
+    def word(self, index: int) -> str:
+        """
+        Gets a word by its index
+        """
+        start, stop = self.text_offsets[index], self.text_offsets[index + 1]
+        return bytes(self.text[start:stop]).decode("ascii")
+
+    def candidates(self, learned: str | Iterable[str], max_length: int | None = None):
+        """
+        Finds the groups of words made only of learned characters
+
+        :param learned: Characters that words may contain
+        :param max_length: Longest word to give, in dits, or None for any
+        :return: Index of each group with at least one word, the index of
+            its first word, and how many of its words are short enough
+        """
+        learned_mask = character_mask(learned)
+        key = (learned_mask, max_length)
+
+        if key == self.candidates_key:
+            return self.candidates_value
+
+        groups = np.flatnonzero((self.masks & np.uint64(~learned_mask & (2 ** 64 - 1))) == 0)
+        starts = self.group_starts[groups].astype(np.int64)
+
+        if max_length is None:
+            ends = self.group_starts[groups + 1].astype(np.int64)
+        else:
+            limits = (groups.astype(np.uint64) << np.uint64(16)) | np.uint64(min(max_length, 2 ** 16 - 1))
+            ends = np.searchsorted(self.keys, limits, side="right").astype(np.int64)
+
+        counts = ends - starts
+        has_words = counts > 0
+
+        self.candidates_key = key
+        self.candidates_value = (groups[has_words], starts[has_words], counts[has_words])
+        self.cumulative_counts = np.cumsum(counts[has_words])
+
+        return self.candidates_value
+
+    def count(self, learned: str | Iterable[str], max_length: int | None = None) -> int:
+        """
+        Gets the number of words made only of learned characters
+        """
+        return int(self.candidates(learned, max_length)[2].sum())
+
+    def group_weights(self, groups: np.ndarray, character_weights: dict[str, float]) -> np.ndarray:
+        """
+        Gets the weight of a word in each group, the sum of the weights of
+        the distinct characters in it
+        """
+        shifts = np.arange(len(alphabet), dtype=np.uint64)
+        mask_bits = ((self.masks[groups][:, np.newaxis] >> shifts) & np.uint64(1)).astype(np.float32)
+
+        weights = np.array([character_weights.get(character, 0.0) for character in alphabet], dtype=np.float32)
+
+        return mask_bits @ weights
+
+    def sample(self,
+               rng: random.Random,
+               learned: str | Iterable[str],
+               count: int = 1,
+               character_weights: dict[str, float] | None = None,
+               max_length: int | None = None,
+               base_weight: float = 1.0) -> list[str]:
+        """
+        Picks random words made only of learned characters
+
+        :param rng: Random number generator
+        :param learned: Characters that words may contain
+        :param count: Number of words
+        :param character_weights: Extra weight for words containing each
+            character, for example from weak_character_weights. None picks
+            every word equally
+        :param max_length: Longest word to give, in dits, or None for any
+        :param base_weight: Weight every word has before the extra weights
+        :return: The words. Empty if no words can be made
+        """
+        groups, starts, counts = self.candidates(learned, max_length)
+        if groups.size == 0:
+            return []
+
+        if character_weights:
+            weights_key = (self.candidates_key, base_weight, tuple(sorted(character_weights.items())))
+
+            if weights_key != self.weights_key:
+                per_word = base_weight + self.group_weights(groups, character_weights)
+                self.cumulative_weights = np.cumsum(counts * per_word.astype(np.float64))
+                self.weights_key = weights_key
+
+            cumulative = self.cumulative_weights
+        else:
+            cumulative = self.cumulative_counts
+
+        targets = np.array([rng.random() for _ in range(count)]) * cumulative[-1]
+        picked = np.minimum(np.searchsorted(cumulative, targets, side="right"), groups.size - 1)
+
+        return [self.word(int(starts[position]) + rng.randrange(int(counts[position]))) for position in picked.tolist()]
+
+    def words(self,
+              rng: random.Random,
+              learned: str | Iterable[str],
+              character_weights: dict[str, float] | None = None,
+              max_length: int | None = None) -> Iterator[str]:
+        """
+        Endless random words made only of learned characters, picked a batch
+        at a time. Stops straight away if no words can be made
+        """
+        while True:
+            batch = self.sample(rng, learned, 64, character_weights, max_length)
+            if not batch:
+                return
+
+            yield from batch
+
+
+def weak_character_weights(statistics, characters: Iterable[str]) -> dict[str, float]:
+    """
+    Weights for CorpusIndex.sample that favour words with the characters
+    the player gets wrong most
+
+    :param statistics: stats.CharacterStatistics
+    :param characters: Characters to weight
+    :return: Each character's error rate, and 1 for ones never asked
+    """
+    weights = {}
+
+    for character in characters:
+        if character not in statistics.index:
+            continue
+
+        accuracy = statistics.accuracy(character)
+        weights[character] = 1.0 if np.isnan(accuracy) else 1 - accuracy
+
+    return weights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index a word list, or pick words from an index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Index a word list with one word per line")
+    build.add_argument("words")
+    build.add_argument("index")
+
+    sample = commands.add_parser("sample", help="Pick words made only of some characters")
+    sample.add_argument("index")
+    sample.add_argument("learned", help="Characters the words may contain")
+    sample.add_argument("--count", type=int, default=10)
+    sample.add_argument("--max-length", type=int, default=None, help="Longest word, in dits")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+
+        with open(args.words, encoding="utf-8", errors="replace") as words_file:
+            index = CorpusIndex.build(words_file)
+
+        index.save(args.index)
+        print(f"Indexed {len(index)} words with {index.masks.size} masks in {time.perf_counter() - start:.1f}s",
+              file=sys.stderr)
+
+    else:
+        start = time.perf_counter()
+        index = CorpusIndex.load(args.index)
+        loaded = time.perf_counter()
+
+        words = index.sample(random.Random(), args.learned, args.count, max_length=args.max_length)
+        sampled = time.perf_counter()
+
+        print(" ".join(words))
+        print(f"{index.count(args.learned, args.max_length)} words to pick from. Loaded in "
+              f"{(loaded - start) * 1000:.2f}ms, picked in {(sampled - loaded) * 1000:.2f}ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,433 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Decodes morse from audio, a chunk at a time, so it can be used on a live
+microphone buffer or on recordings of any length with bounded memory.
+
+Each chunk is cut into short blocks, and the level of the tone in every
+block is found at once by correlating the blocks with the tone frequency,
+which is a vectorised Goertzel filter. Blocks above a threshold that
+follows the signal level are tone, the rest silence. The lengths of the
+tone and silence runs are sorted into dits, dahs and gaps with a dit length
+estimate that adapts to the sender's speed, then decoded with the codec
+trie.
+
+Usage:
+    python decoder.py recording.wav
+"""
+
+
+import argparse
+import sys
+import time
+import wave
+
+from collections import deque
+from typing import Iterator
+
+import numpy as np
+
+import audio
+
+from codec import Codec, default_codec
+
+
+class CWDecoder:
+    """
+    Streaming morse decoder. Feed it samples with feed(), and it gives back
+    any characters finished so far
+    """
+
+    # Length of each block that is sorted into tone or silence
+    block_time = 0.005
+
+    # How quickly the dit length estimate follows each new element
+    adapt_rate = 0.2
+
+    # Number of recent runs of tone and silence that bound the dit length.
+    # Nearly every character has dits or gaps between its elements, so the
+    # shortest tenth of them are a dit long whatever the estimate says
+    run_window = 32
+    short_run_percentile = 10
+
+    # Runs shorter than this, in blocks, are taken as noise and don't count
+    # towards the bound
+    shortest_run = 2
+
+    # Runs held back at the start, before anything is decoded, so the first
+    # characters are sorted with a dit length bounded by them. A silence
+    # longer than warm_up_silence seconds decodes them sooner
+    warm_up_runs = 8
+    warm_up_silence = 2.0
+
+    # Furthest the dit length estimate can be from the short runs, as a
+    # factor either way. Within this, dits, dahs and gaps are all sorted
+    # right, and adapting does the rest. Tight, as the rise and fall of each
+    # tone make tones measure short and gaps long
+    dit_bound = 1.15
+
+    # Signal level below which nothing is ever tone, as a fraction of full
+    # scale. Stops silence being decoded as noise
+    minimum_level = 0.01
+
+    # How much of the way from the noise floor to the signal peak the
+    # threshold sits
+    threshold_fraction = 0.5
+
+    # How quickly the peak and noise levels fall, per second
+    level_decay = 0.5
+
+    def __init__(self,
+                 sample_rate: int,
+                 frequency: float | None = audio.default_frequency,
+                 wpm: float = 15,
+                 codec: Codec = default_codec):
+        """
+        :param sample_rate: Samples per second of the audio
+        :param frequency: Tone frequency in Hz. None to find it from the
+            first chunk with a tone in it
+        :param wpm: First guess at the speed
+        :param codec: Codec used to turn elements into characters
+        """
+        self.sample_rate = sample_rate
+        self.frequency = frequency
+        self.codec = codec
+
+        self.block_length = max(1, int(round(self.block_time * sample_rate)))
+        self.dit_blocks = audio.wpm_to_dit_length(wpm) / self.block_time
+
+        # Samples left over from the last chunk that don't fill a block
+        self.leftover = np.zeros(0, dtype=np.float32)
+
+        # Correlation with the tone, made when the frequency is known
+        self.reference: np.ndarray | None = None
+
+        self.peak_level = 0.0
+        self.noise_level = 0.0
+
+        # Run that hasn't ended yet: if it's tone, and how many blocks long
+        self.run_is_tone = False
+        self.run_length = 0
+
+        # Lengths of the most recent runs, in blocks
+        self.recent_runs: deque[int] = deque(maxlen=self.run_window)
+
+        # Runs held back at the start, as (is tone, length), or None once
+        # they've been decoded
+        self.warm_up: list[tuple[bool, int]] | None = []
+
+        # Position in the decode trie of the character being received
+        self.node = 1
+        self.in_word = False
+
+    @property
+    def wpm(self) -> float:
+        """
+        Current estimate of the sending speed
+        """
+        return audio.dit_length_to_wpm(self.dit_blocks * self.block_time)
+
+    def find_frequency(self, samples: np.ndarray) -> float | None:
+        """
+        Finds the loudest frequency in some samples, or None if they're all
+        quiet
+        """
+        if np.abs(samples).max(initial=0) < self.minimum_level:
+            return None
+
+        spectrum = np.abs(np.fft.rfft(samples * np.hanning(samples.size)))
+        spectrum[0] = 0
+
+        return float(np.argmax(spectrum) * self.sample_rate / samples.size)
+
+    def block_levels(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Gets the tone amplitude in each whole block of samples, as a fraction
+        of full scale
+        """
+        blocks = samples[:samples.size - samples.size % self.block_length].reshape(-1, self.block_length)
+        return np.abs(blocks @ self.reference) * (2 / self.block_length)
+
+    def feed(self, samples: np.ndarray) -> str:
+        """
+        Decodes a chunk of audio
+
+        :param samples: Mono samples, int16 or floats between -1 and 1
+        :return: Characters finished in this chunk, with spaces between words
+        """
+        samples = np.asarray(samples)
+        if samples.dtype == np.int16:
+            samples = samples.astype(np.float32) / 32768
+
+        samples = np.concatenate((self.leftover, samples.astype(np.float32, copy=False)))
+
+        if self.reference is None:
+            if self.frequency is None:
+                self.frequency = self.find_frequency(samples)
+                if self.frequency is None:
+                    self.leftover = samples[-self.block_length:]
+                    return ""
+
+            phase = np.arange(self.block_length) * (2 * np.pi * self.frequency / self.sample_rate)
+            self.reference = np.exp(-1j * phase).astype(np.complex64)
+
+        whole = samples.size - samples.size % self.block_length
+        self.leftover = samples[whole:]
+
+        levels = self.block_levels(samples[:whole])
+        if levels.size == 0:
+            return ""
+
+        tone = levels > self.threshold(levels)
+
+        return self.decode_runs(tone)
+
+    def threshold(self, levels: np.ndarray) -> float:
+        """
+        Updates the peak and noise levels from a chunk's block levels, and
+        gets the threshold between tone and silence
+        """
+        decay = self.level_decay ** (levels.size * self.block_time)
+
+        self.peak_level = max(self.peak_level * decay, float(levels.max()))
+        noise = float(np.percentile(levels, 10))
+        self.noise_level = noise if noise < self.noise_level else self.noise_level * decay + noise * (1 - decay)
+
+        threshold = self.noise_level + (self.peak_level - self.noise_level) * self.threshold_fraction
+
+        return max(threshold, self.minimum_level)
+
+    def decode_runs(self, tone: np.ndarray) -> str:
+        """
+        Splits blocks into runs of tone and silence, and decodes the runs that
+        have ended
+        """
+        # Indexes where the state changes
+        changes = np.flatnonzero(tone[1:] != tone[:-1]) + 1
+        starts = np.r_[0, changes]
+        lengths = np.diff(np.r_[starts, tone.size])
+        states = tone[starts]
+
+        output = []
+
+        for is_tone, length in zip(states.tolist(), lengths.tolist()):
+            if is_tone == self.run_is_tone:
+                self.run_length += length
+                continue
+
+            if self.run_length:
+                output.append(self.end_run())
+
+            self.run_is_tone = is_tone
+            self.run_length = length
+
+        if (self.warm_up and not self.run_is_tone
+                and self.run_length * self.block_time >= self.warm_up_silence):
+            output.append(self.end_warm_up())
+
+        # A long enough silence ends the character and word, even if it
+        # carries on into the next chunk
+        if not self.run_is_tone and self.run_length >= 5 * self.dit_blocks and (self.node != 1 or self.in_word):
+            output.append(self.end_character(True))
+
+        return "".join(output)
+
+    def end_run(self) -> str:
+        """
+        Sorts the run that has just finished, or holds it back if still
+        warming up
+
+        :return: Any character that it finishes
+        """
+        if self.warm_up is None:
+            if self.run_length >= self.shortest_run:
+                self.recent_runs.append(self.run_length)
+
+            return self.sort_run(self.run_is_tone, self.run_length)
+
+        # Silence before the first tone isn't a gap in the morse
+        if not self.run_is_tone and not self.warm_up:
+            return ""
+
+        self.warm_up.append((self.run_is_tone, self.run_length))
+        if len(self.warm_up) < self.warm_up_runs:
+            return ""
+
+        return self.end_warm_up()
+
+    def end_warm_up(self) -> str:
+        """
+        Bounds the dit length by the runs held back at the start, then sorts
+        them
+
+        :return: Any characters that they finish
+        """
+        runs, self.warm_up = self.warm_up, None
+
+        self.recent_runs.extend(length for _, length in runs if length >= self.shortest_run)
+        self.bound_dit()
+
+        return "".join(self.sort_run(is_tone, length) for is_tone, length in runs)
+
+    def sort_run(self, is_tone: bool, length: int) -> str:
+        """
+        Sorts a finished run into an element or gap. The run should already
+        be in recent_runs
+
+        :param is_tone: If the run is tone, rather than silence
+        :param length: Length in blocks
+        :return: Any character that it finishes
+        """
+        if is_tone:
+            dah = length >= 2 * self.dit_blocks
+
+            # Dahs are worth 3 dits when adapting the speed
+            element_dits = length / 3 if dah else length
+            self.dit_blocks += (element_dits - self.dit_blocks) * self.adapt_rate
+            self.bound_dit()
+
+            if self.node < 2 ** (self.codec.longest_code + 1):
+                self.node = self.codec.trie_step(self.node, dah)
+            return ""
+
+        if length < 2 * self.dit_blocks:
+            # A gap inside a character is a dit long. Text with few dits,
+            # like MOM, still has plenty of these
+            self.dit_blocks += (length - self.dit_blocks) * self.adapt_rate
+            self.bound_dit()
+            return ""
+
+        self.bound_dit()
+        return self.end_character(length >= 5 * self.dit_blocks)
+
+    def bound_dit(self):
+        """
+        Keeps the dit length estimate near the short runs. Adapting alone
+        can't recover from a guess that's far off, as every element is then
+        sorted into the wrong kind and pulls the estimate the wrong way
+        """
+        if len(self.recent_runs) < 4:
+            return
+
+        short_run = sorted(self.recent_runs)[len(self.recent_runs) * self.short_run_percentile // 100]
+        self.dit_blocks = min(max(self.dit_blocks, short_run / self.dit_bound), short_run * self.dit_bound)
+
+    def end_character(self, end_of_word: bool) -> str:
+        """
+        Finishes the character in the trie
+
+        :param end_of_word: If the gap is long enough to end the word too
+        :return: The character, and a space if it ends a word
+        """
+        character = ""
+
+        if self.node != 1:
+            character = self.codec.trie_character(self.node) or "?"
+            self.node = 1
+            self.in_word = True
+
+        if end_of_word and self.in_word:
+            character += " "
+            self.in_word = False
+
+        return character
+
+    def flush(self) -> str:
+        """
+        Finishes anything still being received, at the end of the audio
+        """
+        output = ""
+
+        if self.run_is_tone and self.run_length:
+            output += self.end_run()
+            self.run_is_tone = False
+            self.run_length = 0
+
+        if self.warm_up is not None:
+            output += self.end_warm_up()
+
+        return output + self.end_character(False)
+
+
+def read_wav_chunks(path: str, chunk_time: float = 1.0) -> Iterator[tuple[np.ndarray, int]]:
+    """
+    Reads a WAV file a chunk at a time, mixed down to mono
+
+    :return: Iterator of (float32 samples between -1 and 1, sample rate)
+    :raises ValueError: If the WAV isn't 8 or 16 bit
+    """
+    with wave.open(path, "rb") as wav_file:
+        sample_rate = wav_file.getframerate()
+        channels = wav_file.getnchannels()
+        width = wav_file.getsampwidth()
+
+        if width == 1:
+            dtype, offset, scale = np.uint8, 128, 128
+        elif width == 2:
+            dtype, offset, scale = np.dtype("<i2"), 0, 32768
+        else:
+            raise ValueError(f"Can't read {width * 8} bit WAV files")
+
+        chunk_frames = max(1, int(chunk_time * sample_rate))
+
+        while True:
+            data = wav_file.readframes(chunk_frames)
+            if not data:
+                return
+
+            samples = np.frombuffer(data, dtype=dtype).astype(np.float32)
+            samples = (samples - offset) / scale
+
+            if channels > 1:
+                samples = samples.reshape(-1, channels).mean(axis=1)
+
+            yield samples, sample_rate
+
+
+def decode_wav(path: str, frequency: float | None = None, wpm: float = 15) -> Iterator[str]:
+    """
+    Decodes a WAV file, giving the text as it's decoded
+
+    :param frequency: Tone frequency in Hz, or None to find it
+    :param wpm: First guess at the speed
+    """
+    decoder: CWDecoder | None = None
+
+    for samples, sample_rate in read_wav_chunks(path):
+        if decoder is None:
+            decoder = CWDecoder(sample_rate, frequency, wpm)
+
+        text = decoder.feed(samples)
+        if text:
+            yield text
+
+    if decoder:
+        yield decoder.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode morse from a WAV file")
+    parser.add_argument("path")
+    parser.add_argument("--frequency", type=float, default=None,
+                        help="Tone frequency in Hz. Found from the audio if not given")
+    parser.add_argument("--wpm", type=float, default=15, help="First guess at the speed")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+
+    with wave.open(args.path, "rb") as wav_file:
+        audio_length = wav_file.getnframes() / wav_file.getframerate()
+
+    for text in decode_wav(args.path, args.frequency, args.wpm):
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nDecoded {audio_length:.1f}s of audio in {elapsed:.2f}s ({audio_length / elapsed:.0f}x real time)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
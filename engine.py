@@ -0,0 +1,330 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Queue and scoring logic of the trainer, without any drawing or sound.
+
+MorseTrainer is built on TrainerEngine. The engine can also be run on its
+own with a VirtualClock, which is how simulate.py runs sessions with
+simulated learners.
+"""
+
+
+import random
+import time
+
+from collections import deque
+from typing import Callable, NamedTuple
+
+import repetition
+
+from codec import code_length, morse
+
+
+class VirtualClock:
+    """
+    Clock that only moves when told to. Stands in for time.monotonic so that
+    a session can run without waiting for anything
+    """
+
+    def __init__(self, start: float = 0.0):
+        self.time = start
+
+    def __call__(self) -> float:
+        return self.time
+
+    def advance(self, seconds: float):
+        """
+        Moves the clock forward
+        """
+        self.time += seconds
+
+
+class Answer(NamedTuple):
+    """
+    Result of the player pressing a key
+    """
+    correct: bool
+    too_slow: bool
+    # Character that was learned by this answer, or an empty string
+    learned: str
+
+
+class Reaction(NamedTuple):
+    """
+    One measured answer
+    """
+    character: str
+    key: str
+    # Seconds from the end of the morse to the key press
+    seconds: float
+    correct: bool
+    too_slow: bool
+    # Clock time that the answer was scored
+    time: float
+
+
+class ReactionStream:
+    """
+    Reaction times as they are measured. Keeps the most recent, and passes
+    each new one to any listeners
+    """
+
+    def __init__(self, max_length: int = 1000):
+        self.recent: deque[Reaction] = deque(maxlen=max_length)
+        self.listeners: list[Callable[[Reaction], None]] = []
+
+    def listen(self, listener: Callable[[Reaction], None]):
+        """
+        Adds a function to call with each new reaction
+        """
+        self.listeners.append(listener)
+
+    def add(self, reaction: Reaction):
+        """
+        Records a reaction and tells the listeners
+        """
+        self.recent.append(reaction)
+
+        for listener in self.listeners:
+            listener(reaction)
+
+    def __iter__(self):
+        return iter(self.recent)
+
+    def __len__(self) -> int:
+        return len(self.recent)
+
+
+class TrainerEngine:
+    """
+    Queues of characters to train the player on, and what happens to them
+    when the player answers
+
+    The main queue is a repetition.RepetitionQueue, holding the characters
+    being learned. The character at the front is the one being asked. The
+    back queue holds characters that haven't been asked yet
+    """
+
+    # Amount of time to input the character before it's an error
+    time_to_guess_character = 1
+
+    # The index of the character based on the number of times the player had
+    # got it right consecutively.
+    new_indices = [3, 4, 6, 8]
+
+    # Ideal length of the main queue
+    main_queue_length = 8
+
+    # Characters to teach, and their codes
+    alphabet: dict[str, str] = morse
+
+    # How characters are spaced out in the main queue. "fixed" uses
+    # new_indices, the others are the names in repetition.modes
+    repetition_mode = "fixed"
+
+    # Give each character its own time to guess from how quickly it has
+    # been answered, instead of time_to_guess_character for all of them.
+    # Needs statistics, see stats.track
+    adaptive_time_to_guess = False
+
+    def __init__(self,
+                 clock: Callable[[], float] = time.monotonic,
+                 rng: random.Random | None = None):
+        """
+        :param clock: Gives the time in seconds. Used to time answers
+        :param rng: Random number generator used to shuffle characters
+        """
+        self.clock = clock
+        self.random = rng if rng else random.Random()
+
+        # Queues for what characters to add
+        self.back_character_queue: deque[str] = deque()
+        self.main_queue = self.make_main_queue()
+
+        self.learned_characters: list[str] = []
+
+        self.reaction_times = ReactionStream()
+
+        # stats.CharacterStatistics fed from reaction_times, if something has
+        # asked for them with stats.track
+        self.statistics = None
+
+    def generate_character_queue(self):
+        """
+        Generates the character queue that will be used to train the player.
+
+        Sets this value to self.back_character_queue
+
+        Back queue is a list of character ordered by how long it takes to key
+        them.
+
+        Also set's up the main character queue
+        """
+        characters = list(self.alphabet)
+        self.back_character_queue = deque()
+        self.main_queue = self.make_main_queue()
+
+        letters = [c for c in characters if c.isalpha()]
+        numbers = [c for c in characters if c.isdigit()]
+
+        for character_set in (letters, numbers):
+            lengths_dict: dict[int, list[str]] = {}
+            for char in character_set:
+                char_morse_length = code_length(self.alphabet[char])
+
+                if char_morse_length in lengths_dict:
+                    lengths_dict[char_morse_length].append(char)
+                else:
+                    lengths_dict[char_morse_length] = [char]
+
+            lengths_list = list(lengths_dict.items())
+            lengths_list.sort(key=lambda x: x[0])
+
+            to_add_to_queue = []
+            for length, letters in lengths_list:
+                self.random.shuffle(letters)
+                to_add_to_queue.extend(letters)
+
+            self.back_character_queue.extend(to_add_to_queue)
+
+        self.get_next_char()
+
+    def make_main_queue(self) -> repetition.RepetitionQueue:
+        """
+        Creates an empty main queue of the type set by repetition_mode
+        """
+        if self.repetition_mode == "fixed":
+            return repetition.FixedSlotQueue(self.new_indices)
+
+        return repetition.modes[self.repetition_mode]()
+
+    @property
+    def main_character_queue(self) -> list[tuple[str, int]]:
+        """
+        The main queue as a list of (character, number correct in a row), in
+        the order they'll be asked. Builds a new list, so only use it for
+        display and debugging
+        """
+        return self.main_queue.items_in_order()
+
+    def snapshot(self) -> dict:
+        """
+        Gets the state of the queues, as plain lists and numbers that can be
+        saved as JSON. restore() puts it back
+        """
+        return {
+            "repetition_mode": self.repetition_mode,
+            "back_character_queue": list(self.back_character_queue),
+            "main_queue": self.main_queue.get_state(),
+            "learned_characters": list(self.learned_characters),
+        }
+
+    def restore(self, snapshot: dict):
+        """
+        Puts the queues back to a state from snapshot()
+        """
+        self.repetition_mode = snapshot["repetition_mode"]
+        self.back_character_queue = deque(snapshot["back_character_queue"])
+
+        self.main_queue = self.make_main_queue()
+        self.main_queue.set_state(snapshot["main_queue"])
+
+        self.learned_characters = list(snapshot["learned_characters"])
+
+    def add_character_to_main_queue(self):
+        """
+        Adds a character from the back queue to the back of the main queue.
+
+        Adds a random character from the first 3 of the back queue
+
+        :raises ValueError: if self.back_character_queue is empty
+        """
+        if len(self.back_character_queue) == 0:
+            raise ValueError("Back character queue is empty")
+
+        choices = [self.back_character_queue.popleft()
+                   for _ in range(min(3, len(self.back_character_queue)))]
+
+        to_add = choices.pop(self.random.randrange(len(choices)))
+        self.main_queue.add(to_add)
+
+        # Put the others back in the same order
+        self.back_character_queue.extendleft(reversed(choices))
+
+    def get_next_char(self):
+        """
+        Gets the next character to play.
+
+        Adjusts the main queue by adding characters to it if necessary or
+        possible to make the main queue the ideal length
+
+        :raises ValueError: if queue is empty
+        """
+
+        while len(self.main_queue) < self.main_queue_length and self.back_character_queue:
+            self.add_character_to_main_queue()
+
+        return self.main_queue.front()
+
+    def is_queue_empty(self):
+        """
+        Returns if there are no more letters to select, and the game can end
+        """
+        return len(self.back_character_queue) + len(self.main_queue) == 0
+
+    def update_queue(self, correct: bool) -> str:
+        """
+        Updates the queue with the answer to the character at the front. It
+        goes back in the main queue to be asked again later, unless it has
+        now been learned
+
+        :return: The character learned, or an empty string
+        :raises ValueError: if queue is empty
+        """
+        character = self.main_queue.front()
+
+        if not self.main_queue.answer(correct):
+            return ""
+
+        self.learned_characters.append(character)
+        self.character_learned(character)
+
+        return character
+
+    def character_learned(self, character: str):
+        """
+        Called when a character comes off the queue for good. Does nothing
+        here, front ends override it to show the player
+        """
+        pass
+
+    def time_to_guess(self, character: str) -> float:
+        """
+        Gets the time allowed to answer a character
+        """
+        if self.adaptive_time_to_guess and self.statistics:
+            return self.statistics.time_to_guess(character, self.time_to_guess_character)
+
+        return self.time_to_guess_character
+
+    def answer(self, key: str, time_taken: float) -> Answer:
+        """
+        Scores the player's answer to the character at the front of the main
+        queue, and updates the queue
+
+        :param key: Character the player pressed
+        :param time_taken: Seconds from the end of the morse to the key press
+        :raises ValueError: if queue is empty
+        """
+        correct_char = self.main_queue.front() if len(self.main_queue) else ""
+
+        character_correct = key.upper() == correct_char
+        too_slow = self.time_to_guess(correct_char) < time_taken
+
+        self.reaction_times.add(Reaction(correct_char, key, time_taken, character_correct, too_slow, self.clock()))
+
+        learned = self.update_queue(character_correct and not too_slow)
+
+        return Answer(character_correct, too_slow, learned)
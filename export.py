@@ -0,0 +1,210 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Renders practice to WAV files, for listening away from the trainer. Each
+text file given becomes a WAV file, or with --groups, files of random groups
+of characters are made instead.
+
+The timing is the same as the box's: audio.render_elements with the same
+element and gap lengths, and Farnsworth spacing if asked for. Each file is
+rendered with audio.stream_words and written a chunk at a time, so a whole
+book takes no more memory than a sentence. Files are spread over a pool of
+processes.
+
+Usage:
+    python export.py book.txt news.txt --output wav --wpm 20 --farnsworth 12
+    python export.py --groups 100 --files 10 --characters KMRSUAPTLOWI --output wav
+"""
+
+
+import argparse
+import itertools
+import math
+import os
+import random
+import sys
+import time
+import wave
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import audio
+
+from codec import morse
+from words import code_groups, encode_words, read_words
+
+
+@dataclass
+class RenderSettings:
+    """
+    How to render every file
+    """
+    wpm: float = 20
+    farnsworth_wpm: float | None = None
+    frequency: float = audio.default_frequency
+    sample_rate: int = audio.default_sample_rate
+    amplitude: float = audio.default_amplitude
+    ramp_time: float = audio.default_ramp_time
+
+    # Length of each chunk written to the file, in seconds
+    chunk_time: float = 1.0
+
+
+@dataclass
+class ExportJob:
+    """
+    One file to render. Made from a text file if text_path is set, otherwise
+    from random groups
+    """
+    output_path: str
+    text_path: str | None = None
+
+    # Random groups, seeded so the same command makes the same files
+    groups: int = 0
+    characters: str = ""
+    group_length: int = 5
+    seed: int = 0
+
+
+def job_words(job: ExportJob):
+    """
+    Gets the words to send for a job
+    """
+    if job.text_path is not None:
+        with open(job.text_path, encoding="utf-8", errors="replace") as text_file:
+            yield from read_words(text_file)
+    else:
+        groups = code_groups(random.Random(job.seed), list(job.characters), job.group_length)
+        yield from itertools.islice(groups, job.groups)
+
+
+def render_file(job: ExportJob, settings: RenderSettings) -> tuple[str, float, float]:
+    """
+    Renders a job to its WAV file. Used as the unit of work for each process
+
+    :return: Path written, seconds of audio in it, and seconds it took
+    """
+    start = time.perf_counter()
+    samples = 0
+
+    chunks = audio.stream_words(encode_words(job_words(job)),
+                                settings.wpm,
+                                settings.frequency,
+                                settings.sample_rate,
+                                settings.farnsworth_wpm,
+                                settings.chunk_time,
+                                settings.amplitude,
+                                settings.ramp_time)
+
+    with wave.open(job.output_path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(settings.sample_rate)
+
+        for chunk in chunks:
+            wav_file.writeframes(chunk.samples.astype("<i2", copy=False).tobytes())
+            samples += chunk.samples.size
+
+    return job.output_path, samples / settings.sample_rate, time.perf_counter() - start
+
+
+def render_files(jobs: list[ExportJob],
+                 settings: RenderSettings,
+                 processes: int | None = None) -> tuple[list[tuple[str, float, float]], float]:
+    """
+    Renders every job across a pool of processes
+
+    :param processes: Number of processes. Defaults to the number of CPUs.
+        1 renders everything in this process
+    :return: render_file's result for each job, in order, and the seconds it
+        all took
+    """
+    start = time.perf_counter()
+
+    if processes == 1 or len(jobs) == 1:
+        results = [render_file(job, settings) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(render_file, jobs, [settings] * len(jobs)))
+
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render morse practice to WAV files")
+    parser.add_argument("texts", nargs="*", help="Text files to render, one WAV file each")
+    parser.add_argument("--output", default=".", help="Directory to write the WAV files to")
+    parser.add_argument("--groups", type=int, default=None,
+                        help="Render random groups of characters instead, this many per file")
+    parser.add_argument("--files", type=int, default=1, help="Number of files of random groups")
+    parser.add_argument("--characters", default="".join(morse), help="Characters to make groups from")
+    parser.add_argument("--group-length", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first file of groups. The others follow on")
+    parser.add_argument("--wpm", type=float, default=RenderSettings.wpm, help="Speed of the characters")
+    parser.add_argument("--farnsworth", type=float, default=None,
+                        help="Slower overall speed, with longer gaps between characters and words")
+    parser.add_argument("--frequency", type=float, default=RenderSettings.frequency, help="Tone in Hz")
+    parser.add_argument("--sample-rate", type=int, default=RenderSettings.sample_rate)
+    parser.add_argument("--amplitude", type=float, default=RenderSettings.amplitude,
+                        help="Peak level, 1 being full scale")
+    parser.add_argument("--ramp-time", type=float, default=RenderSettings.ramp_time,
+                        help="Rise and fall time of each tone in seconds")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+
+    if args.groups is not None:
+        characters = "".join(character for character in args.characters.upper() if character in morse)
+        if not characters:
+            sys.exit("No characters with morse to make groups from")
+
+        digits = len(str(args.files))
+        jobs = [ExportJob(os.path.join(args.output, f"groups_{index + 1:0{digits}}.wav"),
+                          groups=args.groups,
+                          characters=characters,
+                          group_length=args.group_length,
+                          seed=args.seed + index)
+                for index in range(args.files)]
+
+    elif args.texts:
+        jobs = [ExportJob(os.path.join(args.output, os.path.splitext(os.path.basename(path))[0] + ".wav"),
+                          text_path=path)
+                for path in args.texts]
+
+        # Files with the same name in different directories would be written
+        # to the same WAV file at once, by different processes
+        texts_by_output: dict[str, list[str]] = {}
+        for job in jobs:
+            texts_by_output.setdefault(os.path.normcase(os.path.abspath(job.output_path)), []).append(job.text_path)
+
+        clashes = [texts for texts in texts_by_output.values() if len(texts) > 1]
+        if clashes:
+            sys.exit("These would be written to the same WAV file, rename them or export them separately: "
+                     + "; ".join(", ".join(texts) for texts in clashes))
+
+    else:
+        parser.error("Give text files to render, or --groups")
+
+    settings = RenderSettings(wpm=args.wpm,
+                              farnsworth_wpm=args.farnsworth,
+                              frequency=args.frequency,
+                              sample_rate=args.sample_rate,
+                              amplitude=args.amplitude,
+                              ramp_time=args.ramp_time)
+
+    results, elapsed = render_files(jobs, settings, args.processes)
+
+    for path, seconds, _ in results:
+        print(f"{path}: {seconds / 60:.1f} minutes")
+
+    total = sum(seconds for _, seconds, _ in results)
+    print(f"Rendered {total / 60:.1f} minutes of audio in {elapsed:.2f}s, "
+          f"{total / elapsed if elapsed else math.inf:.0f} seconds of audio per second", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
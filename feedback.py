@@ -0,0 +1,183 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+What the box and the letters learned scorecard do over time, without
+drawing them. Each front end draws them its own way, main.py with pygame
+and terminal.py with curses, and plays the same timelines.
+
+Nothing in here depends on pygame.
+"""
+
+
+import time
+
+from typing import NamedTuple
+
+import audio
+import instrument
+
+from codec import morse
+from playback import Timeline
+
+
+class BoxState(NamedTuple):
+    """
+    Everything that decides what the box looks like. Never changed once made,
+    so it can be handed between threads
+    """
+    outer_colour: tuple[int, int, int]
+    inner_colour: tuple[int, int, int]
+    font_colour: tuple[int, int, int]
+    text: str
+
+
+class BoxFeedback:
+    """
+    Timelines for the box that flashes. Mixed into a box that draws itself,
+    which provides set_outer_colour, set_inner_colour, set_font_colour,
+    set_font, get_sound and play_sound. Sounds only need a stop() method
+    """
+    dit_length = 0.08
+
+    inner_colour_normal = (0, 0, 0)
+    # Colour of the inner box when flashing morse
+    inner_colour_morse = (255, 255, 255)
+
+    outer_colour_normal = (255, 255, 255)
+    outer_colour_error = (255, 0, 0)
+    outer_colour_too_slow = (255, 128, 0)
+    outer_colour_correct = (0, 255, 0)
+
+    font_colour_normal = (255, 255, 255)
+
+    tone_frequency = audio.default_frequency
+
+    # Clock used to time sounds. The same one as MorseTrainer.clock
+    clock = staticmethod(time.perf_counter)
+
+    def error_timeline(self, correct_character, too_slow: bool) -> Timeline:
+        """
+        Flashes the outer ring red and displays the correct character that the
+        user should have entered. Waits a bit then plays what the character in
+        morse again before another pause.
+
+        If too_slow is set to True, then the box flashes orange to indicate
+        that the character selected was correct, but was too slow
+
+        You can play the next character immediately after this timeline ends
+        """
+        if too_slow:
+            colour = self.outer_colour_too_slow
+        else:
+            colour = self.outer_colour_error
+
+        timeline = Timeline()
+
+        timeline.call(self.set_outer_colour, colour)
+        timeline.call(self.set_font_colour, colour)
+        timeline.call(self.set_font, correct_character)
+
+        timeline.wait(2)
+
+        # Replay the correct character morse
+        timeline.extend(self.morse_timeline(correct_character))
+
+        timeline.wait(1)
+
+        timeline.call(self.set_outer_colour, self.outer_colour_normal)
+        timeline.call(self.set_font, "")
+
+        timeline.wait(1)
+
+        return timeline
+
+    def correct_timeline(self) -> Timeline:
+        """
+        Flashes the background green to indicate a successful decode.
+
+        You can play the next character immediately after this timeline ends
+        """
+        timeline = Timeline()
+
+        timeline.call(self.set_outer_colour, self.outer_colour_correct)
+        timeline.wait(0.5)
+
+        timeline.call(self.set_outer_colour, self.outer_colour_normal)
+        timeline.wait(1)
+
+        return timeline
+
+    def morse_timeline(self, character: str) -> Timeline:
+        """
+        Plays the morse code of a character. Flashes the box and plays a tone
+
+        The audio is played with a single call, so only the flashing depends
+        on how the threads are scheduled. Waits a length of a dot between dots
+        and dashes, and one more after the last one
+
+        :param character: Letter or number
+        """
+        sound = self.get_sound(character)
+        timings = audio.element_timings(morse[character], self.dit_length)
+
+        timeline = Timeline()
+
+        timeline.call(self.play_sound, sound)
+        timeline.on_cancel(sound.stop)
+
+        for on, off in timings:
+            timeline.call_at(on, self.set_inner_colour, self.inner_colour_morse)
+            timeline.call_at(off, self.set_inner_colour, self.inner_colour_normal)
+
+        # Times each flash against its schedule. Added after the flashes, so
+        # each edge is timed straight after the one at the same time
+        if instrument.tracer:
+            timer = instrument.tracer.element_timer(character, timings, self.dit_length)
+
+            for index, edge in enumerate(edge for timing in timings for edge in timing):
+                timeline.call_at(edge, timer.edge, index)
+
+        timeline.wait(timings[-1][1] + self.dit_length)
+
+        return timeline
+
+
+class ScorecardFeedback:
+    """
+    Text and timeline of the letters learned scorecard. Mixed into a
+    scorecard that draws itself, which provides learned_letters, update and
+    set_count_colour
+    """
+
+    letters_per_line = 20
+
+    font_colour_normal = (255, 255, 255)
+    font_colour_new_letter = (0, 255, 0)
+
+    def scorecard_lines(self) -> list[str]:
+        """
+        Gets the count of letters learned, then the two lines of letters
+        """
+        return [f"Letters learned {len(self.learned_letters)}/{len(morse.keys())}",
+                " ".join(self.learned_letters[:self.letters_per_line]),
+                " ".join(self.learned_letters[self.letters_per_line:])]
+
+    def learned_timeline(self, new_learned_character: str) -> Timeline:
+        """
+        Adds a character to the letters learned, flashing the count green
+
+        :param new_learned_character: str of the character learned
+        :raises ValueError: if letter already in learned letters list
+        """
+        if new_learned_character in self.learned_letters:
+            raise ValueError("Letter already in learned letters list")
+
+        timeline = Timeline()
+
+        timeline.call(self.update, new_learned_character)
+        timeline.wait(0.5)
+        timeline.call(self.set_count_colour, self.font_colour_normal)
+
+        return timeline
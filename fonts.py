@@ -0,0 +1,112 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Finds the font files the game uses. Looking a system font up by name can be
+slow, on Linux it runs fc-list to list every font installed, so each lookup
+is done once and saved to a cache file that later runs read instead.
+
+Delete the cache file to make it look again, for example after installing
+a font that wasn't found before.
+"""
+
+
+import json
+import os
+
+import pygame
+
+
+def cache_directory() -> str:
+    """
+    Gets the directory that the cache file goes in
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "morse-code-learner")
+
+
+cache_path = os.path.join(cache_directory(), "fonts.json")
+
+# Lookups done in this process, by (name, bold). Values are (path, needs
+# fake bold). A path of None means the name wasn't found, and pygame's
+# default font is used
+resolved: dict[tuple[str, bool], tuple[str | None, bool]] = {}
+
+
+def read_cache() -> dict:
+    """
+    Reads the cache file, giving an empty cache if it's missing or broken
+    """
+    try:
+        with open(cache_path) as cache_file:
+            cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+    return cache if isinstance(cache, dict) else {}
+
+
+def write_cache(cache: dict):
+    """
+    Writes the cache file. Failing to write it isn't an error, the lookup
+    is just done again next time
+    """
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+
+        temporary_path = cache_path + ".tmp"
+        with open(temporary_path, "w") as cache_file:
+            json.dump(cache, cache_file, indent=1)
+
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        pass
+
+
+def resolve_font(name: str, bold: bool) -> tuple[str | None, bool]:
+    """
+    Finds the file for a system font, from the cache if possible
+
+    :return: Path of the font file, or None if there's no font of that name,
+        and if the font needs to be made bold because there's no bold file
+    """
+    key = (name, bold)
+    if key in resolved:
+        return resolved[key]
+
+    cache = read_cache()
+    cache_key = f"{name}:{'bold' if bold else 'regular'}"
+    entry = cache.get(cache_key)
+
+    if entry and (entry["path"] is None or os.path.exists(entry["path"])):
+        resolved[key] = (entry["path"], entry["fake_bold"])
+        return resolved[key]
+
+    path = pygame.font.match_font(name, bold=bold)
+
+    # match_font gives the regular file if there isn't a bold one
+    fake_bold = bool(bold and path and path == pygame.font.match_font(name))
+
+    cache[cache_key] = {"path": path, "fake_bold": fake_bold}
+    write_cache(cache)
+
+    resolved[key] = (path, fake_bold)
+    return resolved[key]
+
+
+def load_font(name: str, size: int, bold: bool = False) -> pygame.font.Font:
+    """
+    Loads a system font by name, like pygame.font.SysFont but without
+    searching the system fonts on every run
+    """
+    path, fake_bold = resolve_font(name, bold)
+
+    font = pygame.font.Font(path, size)
+
+    if path is None:
+        font.bold = bold
+    elif fake_bold:
+        font.bold = True
+
+    return font
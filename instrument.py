@@ -0,0 +1,226 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Instrumentation of the game's hot paths, to show if a slowdown is in
+drawing, audio or handling input.
+
+Turned on by setting the environment variable MORSE_TRAINER_DEBUG to 1. The
+game then draws the numbers in the corner of the window, and when it quits
+writes every measurement to MORSE_TRAINER_TRACE.json and .csv, which
+defaults to morse-trace in the working directory.
+
+When it's off, tracer is None, and each measured spot costs one check of
+it. Measurements are kept in bounded deques, so a long game doesn't grow
+without end.
+
+Doesn't depend on pygame
+"""
+
+
+import csv
+import json
+import os
+import threading
+import time
+
+from collections import Counter, deque
+from typing import Callable
+
+import numpy as np
+
+enabled = os.environ.get("MORSE_TRAINER_DEBUG", "") not in ("", "0")
+trace_path = os.environ.get("MORSE_TRAINER_TRACE", "morse-trace")
+
+# Set by MorseTrainer.debug() when enabled. Everything that measures checks
+# this first
+tracer: "Tracer | None" = None
+
+
+class Tracer:
+    """
+    Holds timings, counts and the timing of each played morse element.
+    Timings and element timings can be added from any thread
+    """
+
+    # Most samples kept of each timing, and of element timings
+    max_samples = 20_000
+
+    # Samples that summary() works from, the most recent
+    summary_samples = 500
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.start_time = clock()
+
+        # Timing name to deque of (time since start, seconds)
+        self.samples: dict[str, deque[tuple[float, float]]] = {}
+        self.counts: Counter[str] = Counter()
+
+        # (time since start, character, element index, kind, scheduled
+        # seconds, actual seconds) of each dit, dah and gap
+        self.elements: deque[tuple[float, str, int, str, float, float]] = deque(maxlen=self.max_samples)
+
+        # Threads seen so far, to count new ones
+        self.thread_idents: set[int] = {thread.ident for thread in threading.enumerate()}
+
+        # Only taken to make a new deque, adding to one is thread safe
+        self.lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        """
+        Records a timing
+        """
+        samples = self.samples.get(name)
+
+        if samples is None:
+            with self.lock:
+                samples = self.samples.setdefault(name, deque(maxlen=self.max_samples))
+
+        samples.append((self.clock() - self.start_time, seconds))
+
+    def count(self, name: str, amount: int = 1):
+        self.counts[name] += amount
+
+    def watch_threads(self):
+        """
+        Counts threads started since the last call
+        """
+        idents = {thread.ident for thread in threading.enumerate()}
+        self.counts["thread_spawns"] += len(idents - self.thread_idents)
+        self.counts["threads"] = len(idents)
+        self.thread_idents = idents
+
+    def element_timer(self, character: str, timings: list[tuple[float, float]], dit_length: float) -> "ElementTimer":
+        """
+        Makes a timer for one playing of a character. See ElementTimer
+        """
+        return ElementTimer(self, character, timings, dit_length)
+
+    def summary(self, name: str) -> dict[str, float]:
+        """
+        Gets the count, mean, 95th percentile and worst of the recent
+        samples of a timing, in seconds
+        """
+        samples = self.samples.get(name)
+        if not samples:
+            return {"count": 0, "mean": 0.0, "p95": 0.0, "max": 0.0}
+
+        recent = np.array([seconds for _, seconds in list(samples)[-self.summary_samples:]])
+
+        return {"count": len(samples),
+                "mean": float(recent.mean()),
+                "p95": float(np.percentile(recent, 95)),
+                "max": float(recent.max())}
+
+    def element_summary(self, kind: str) -> dict[str, float]:
+        """
+        Gets how far the recent dits, dahs or gaps were from the length they
+        were meant to be, as the mean and the worst, in seconds
+        """
+        errors = np.array([actual - scheduled
+                           for _, _, _, element_kind, scheduled, actual in list(self.elements)[-self.summary_samples:]
+                           if element_kind == kind])
+
+        if not errors.size:
+            return {"count": 0, "mean": 0.0, "max": 0.0}
+
+        return {"count": int(errors.size), "mean": float(errors.mean()), "max": float(np.abs(errors).max())}
+
+    def to_dict(self) -> dict:
+        """
+        Everything measured, for export_json
+        """
+        return {
+            "summary": {name: self.summary(name) for name in self.samples},
+            "elements_summary": {kind: self.element_summary(kind) for kind in ("dit", "dah", "gap")},
+            "counts": dict(self.counts),
+            "samples": {name: [list(sample) for sample in samples] for name, samples in self.samples.items()},
+            "elements": [{"time": time_since_start,
+                          "character": character,
+                          "index": index,
+                          "kind": kind,
+                          "scheduled": scheduled,
+                          "actual": actual}
+                         for time_since_start, character, index, kind, scheduled, actual in self.elements],
+        }
+
+    def export_json(self, path: str):
+        with open(path, "w") as json_file:
+            json.dump(self.to_dict(), json_file)
+
+    def export_csv(self, path: str):
+        """
+        Writes one row per measurement. Element rows have the kind of element
+        as the name, and what it was meant to be in scheduled
+        """
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(["time", "name", "seconds", "scheduled", "character"])
+
+            for name, samples in self.samples.items():
+                for time_since_start, seconds in samples:
+                    writer.writerow([f"{time_since_start:.6f}", name, f"{seconds:.6f}", "", ""])
+
+            for time_since_start, character, _, kind, scheduled, actual in self.elements:
+                writer.writerow([f"{time_since_start:.6f}", kind, f"{actual:.6f}", f"{scheduled:.6f}", character])
+
+    def export(self, path: str | None = None) -> list[str]:
+        """
+        Writes path.json and path.csv
+
+        :return: Paths written
+        """
+        path = path or trace_path
+        paths = [path + ".json", path + ".csv"]
+
+        self.export_json(paths[0])
+        self.export_csv(paths[1])
+
+        return paths
+
+
+class ElementTimer:
+    """
+    Times the dits, dahs and gaps of one playing of a character against the
+    times they were scheduled for. edge() is called each time the box
+    lights up or goes dark, straight after it does
+    """
+
+    def __init__(self, tracer: Tracer, character: str, timings: list[tuple[float, float]], dit_length: float):
+        """
+        :param timings: (start, stop) of each element, like
+            audio.element_timings gives
+        """
+        self.tracer = tracer
+        self.character = character
+        self.dit_length = dit_length
+
+        # Scheduled time of each edge, and when each actually happened
+        self.scheduled = [edge for timing in timings for edge in timing]
+        self.actual: list[float | None] = [None] * len(self.scheduled)
+
+    def edge(self, index: int):
+        """
+        Records that edge index has happened. Even edges are the start of an
+        element, odd ones the end
+        """
+        now = self.tracer.clock()
+        self.actual[index] = now
+
+        previous = self.actual[index - 1] if index else None
+        if previous is None:
+            return
+
+        if index % 2:
+            kind = "dah" if self.scheduled[index] - self.scheduled[index - 1] > self.dit_length * 2 else "dit"
+        else:
+            kind = "gap"
+
+        self.tracer.elements.append((now - self.tracer.start_time,
+                                     self.character,
+                                     index // 2,
+                                     kind,
+                                     self.scheduled[index] - self.scheduled[index - 1],
+                                     now - previous))
@@ -0,0 +1,166 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Decodes morse sent by hand, from the times a key goes down and up.
+
+Each key press is sorted into a dit or a dah by how long it was held,
+compared with running averages of the player's dits and dahs, so the
+decoder follows their speed and their own ratio of dah to dit. The gaps
+inside characters also feed the dit average, which lets it find the speed
+even when it starts far off. Gaps are sorted into gaps inside a character,
+between characters and between words using the dit average. Characters are
+decoded with the codec trie as the elements arrive.
+
+Nothing in here depends on pygame, times are just numbers in seconds.
+"""
+
+
+import audio
+
+from codec import Codec, default_codec
+
+
+class KeyingDecoder:
+    """
+    Streaming decoder for a straight key or paddle. Call key_down and key_up
+    as the key moves, and poll now and then while it's up, to finish
+    characters and words once the gap after them is long enough
+    """
+
+    # How quickly the dit and dah averages follow each new element
+    adapt_rate = 0.25
+
+    # Dahs are never taken to be shorter than this many dits
+    min_dah_ratio = 1.5
+
+    # Gaps longer than these many dits end a character, and a word
+    character_gap = 2.0
+    word_gap = 5.0
+
+    def __init__(self, wpm: float = 15, codec: Codec = default_codec):
+        """
+        :param wpm: First guess at the speed
+        :param codec: Codec used to turn elements into characters
+        """
+        self.codec = codec
+
+        self.dit = audio.wpm_to_dit_length(wpm)
+        self.dah = 3 * self.dit
+
+        # Time the key went down, if it's down, and the time it last came up
+        self.down_time: float | None = None
+        self.up_time: float | None = None
+
+        # Position in the decode trie of the character being sent
+        self.node = 1
+        self.in_word = False
+
+    @property
+    def wpm(self) -> float:
+        """
+        Current estimate of the sending speed
+        """
+        return audio.dit_length_to_wpm(self.dit)
+
+    def key_down(self, time: float) -> str:
+        """
+        The key has been pressed
+
+        :return: Any character and space finished by the gap before it
+        """
+        output = self.poll(time)
+
+        # A gap inside a character is a dit long, and there are more of them
+        # than of anything else, so they keep the speed right even when
+        # every element is being sorted into the wrong kind. The dah average
+        # is scaled with it, keeping the player's ratio
+        if self.up_time is not None and self.node != 1:
+            gap = time - self.up_time
+            if gap < self.character_gap * self.dit:
+                dit = self.dit + (gap - self.dit) * self.adapt_rate
+                self.dah *= dit / self.dit
+                self.dit = dit
+
+        self.down_time = time
+        return output
+
+    def key_up(self, time: float) -> str:
+        """
+        The key has been released
+
+        :return: "." or "-" for the element that was sent, or "" if the key
+            wasn't down
+        """
+        if self.down_time is None:
+            return ""
+
+        duration = time - self.down_time
+        self.down_time = None
+        self.up_time = time
+
+        dah = duration * 2 >= self.dit + self.dah
+
+        if dah:
+            self.dah += (duration - self.dah) * self.adapt_rate
+        else:
+            self.dit += (duration - self.dit) * self.adapt_rate
+
+        self.dah = max(self.dah, self.dit * self.min_dah_ratio)
+
+        # Too long for any code, the character comes out as unknown
+        if self.node < len(self.codec.trie):
+            self.node = self.codec.trie_step(self.node, dah)
+
+        return "-" if dah else "."
+
+    def poll(self, time: float) -> str:
+        """
+        Finishes the character, then the word, once the key has been up long
+        enough. Does nothing while the key is down
+
+        :return: Any character and space finished
+        """
+        if self.down_time is not None or self.up_time is None:
+            return ""
+
+        # Worked out the same way as next_deadline, so polling at a deadline
+        # always does what's due
+        output = ""
+
+        if self.node != 1 and time >= self.up_time + self.character_gap * self.dit:
+            output = self.codec.trie_character(self.node) or "?"
+            self.node = 1
+            self.in_word = True
+
+        if self.in_word and time >= self.up_time + self.word_gap * self.dit:
+            output += " "
+            self.in_word = False
+
+        return output
+
+    def next_deadline(self) -> float | None:
+        """
+        Gets the time poll next has something to do if the key stays up, or
+        None if it's waiting for the key
+        """
+        if self.down_time is not None or self.up_time is None:
+            return None
+
+        if self.node != 1:
+            return self.up_time + self.character_gap * self.dit
+
+        if self.in_word:
+            return self.up_time + self.word_gap * self.dit
+
+        return None
+
+    def flush(self) -> str:
+        """
+        Finishes anything still being sent
+        """
+        if self.up_time is None:
+            return ""
+
+        return self.poll(self.up_time + self.word_gap * self.dit)
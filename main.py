@@ -5,102 +5,195 @@ Licence : MIT
 """
 
 
+import argparse
+import random
+import string
 import threading
 import time
-import random
 
-from threading import Thread
+# Start of the startup time breakdown. Importing pygame is a large part
+import_start_time = time.perf_counter()
+
+from collections import OrderedDict
 
+import numpy as np
 import pygame
 from pygame import locals
 
-morse = {
-    "A": ".-",
-    "B": "-...",
-    "C": "-.-.",
-    "D": "-..",
-    "E": ".",
-    "F": "..-.",
-    "G": "--.",
-    "H": "....",
-    "I": "..",
-    "J": ".---",
-    "K": "-.-",
-    "L": ".-..",
-    "M": "--",
-    "N": "-.",
-    "O": "---",
-    "P": ".--.",
-    "Q": "--.-",
-    "R": ".-.",
-    "S": "...",
-    "T": "-",
-    "U": "..-",
-    "V": "...-",
-    "W": ".--",
-    "X": "-..-",
-    "Y": "-.--",
-    "Z": "--..",
-    "0": "-----",
-    "1": ".----",
-    "2": "..---",
-    "3": "...--",
-    "4": "....-",
-    "5": ".....",
-    "6": "-....",
-    "7": "--...",
-    "8": "---..",
-    "9": "----.",
-}
+import audio
+import fonts
+import instrument
+import progress
+import recording
+import stats
+
+from codec import morse
+from engine import TrainerEngine
+from feedback import BoxFeedback, BoxState, ScorecardFeedback
+from playback import Job, PlaybackScheduler, Timeline
+
+# Seconds the imports above took
+import_time = time.perf_counter() - import_start_time
 
 font_name = 'consolas'
 
+# Mixer buffer, in samples. Mixed sound is only heard once this much has
+# played out, so it's added to the end time of each sound
+mixer_buffer = 512
 
-def morse_length(character) -> int:
+# Posted to wake the main loop up when something needs drawing, or when the
+# box has finished playing
+redraw_event = pygame.event.custom_type()
+box_finished_event = pygame.event.custom_type()
+
+
+def post_event(event_type: int):
     """
-    Gets the amount of time that it takes to key a character in morse
+    Posts an event to wake the main loop. Does nothing once pygame has quit.
 
-    :return: number of 'dit' lengths it takes to key a character in morse
-    :raises KeyError: If character doesn't have morse code
+    Safe to call from any thread
     """
-    morse_sequence = morse[character]
+    if pygame.display.get_init():
+        try:
+            pygame.event.post(pygame.event.Event(event_type))
+        except pygame.error:
+            # Pygame quit since checking
+            pass
 
-    length = 0
 
-    # Length of the dits and dahs
-    for morse_character in morse_sequence:
-        assert morse_character in ".-" and len(morse_character) == 1
+def request_redraw():
+    """
+    Wakes the main loop so that it redraws anything that has changed.
+
+    Safe to call from any thread
+    """
+    post_event(redraw_event)
+
+
+class GlyphAtlas:
+    """
+    Images of single characters in one font, rendered once, so that lines of
+    text can be built with blits instead of rendering the font each time.
+
+    Glyphs are kept by (character, colour), and the least recently used are
+    dropped once there are more than max_glyphs. Safe to use from more than
+    one thread
+    """
+
+    max_glyphs = 512
+
+    # Rendered up front for each colour given to warm()
+    common_characters = "".join(morse) + string.ascii_lowercase + " /"
+
+    def __init__(self, font: pygame.font.Font):
+        self.font = font
+        self.height = font.get_linesize()
+
+        self.glyphs: OrderedDict[tuple[str, tuple[int, int, int]], pygame.Surface] = OrderedDict()
+        self.advances: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def warm(self, colours: list[tuple[int, int, int]]):
+        """
+        Renders the common characters in each colour
+        """
+        for colour in colours:
+            for character in self.common_characters:
+                self.glyph(character, colour)
+
+    def glyph(self, character: str, colour: tuple[int, int, int]) -> pygame.Surface:
+        """
+        Gets the image of a character, rendering it if it isn't cached
+        """
+        key = (character, colour)
+
+        with self.lock:
+            image = self.glyphs.get(key)
+            if image is not None:
+                self.glyphs.move_to_end(key)
+                return image
+
+        image = self.font.render(character, False, colour)
+
+        if instrument.tracer:
+            instrument.tracer.count("font_renders")
+
+        with self.lock:
+            self.glyphs[key] = image
+            while len(self.glyphs) > self.max_glyphs:
+                self.glyphs.popitem(last=False)
+
+        return image
+
+    def advance(self, character: str) -> int:
+        """
+        Gets the width in pixels that a character takes up in a line
+        """
+        width = self.advances.get(character)
+        if width is None:
+            width = self.font.size(character)[0]
+            self.advances[character] = width
+
+        return width
+
+    def size(self, text: str) -> tuple[int, int]:
+        """
+        Gets the width and height of a line of text
+        """
+        return sum(self.advance(character) for character in text), self.height
+
+    def draw(self, surface: pygame.Surface, text: str, colour: tuple[int, int, int], location: tuple[int, int]):
+        """
+        Draws a line of text onto a surface, top left at location
+        """
+        x, y = location
+
+        for character in text:
+            if character != " ":
+                surface.blit(self.glyph(character, colour), (x, y))
+
+            x += self.advance(character)
+
+
+# Atlases by (font size, bold), shared by everything that draws text
+atlases: dict[tuple[int, bool], GlyphAtlas] = {}
 
-        if morse_character == ".":
-            length += 1
-        else:
-            length += 3
 
-    # Add length between dits and dahs
-    length += len(morse_sequence) - 1
+def make_sound(samples: np.ndarray) -> pygame.mixer.Sound:
+    """
+    Makes a sound from mono int16 samples, copied to every mixer channel
+    """
+    channels = pygame.mixer.get_init()[2]
+    if channels > 1:
+        samples = np.repeat(samples[:, np.newaxis], channels, axis=1)
 
-    return length
+    return pygame.sndarray.make_sound(np.ascontiguousarray(samples))
 
 
-class Box(pygame.sprite.Sprite):
+def get_atlas(size: int, bold: bool) -> GlyphAtlas:
     """
-    Class for the box in the game that flashes
+    Gets the shared atlas for the game font at a size, making it if needed
+    """
+    key = (size, bold)
+
+    if key not in atlases:
+        atlases[key] = GlyphAtlas(fonts.load_font(font_name, size, bold))
+
+    return atlases[key]
+
+
+class Box(pygame.sprite.Sprite, BoxFeedback):
+    """
+    Class for the box in the game that flashes. What it plays is in
+    feedback.BoxFeedback
     """
-    dit_length = 0.08
     box_width = 200
     box_height = 200
     border_width = 10
 
-    inner_colour_normal = (0, 0, 0)
-    # Colour of the inner box when flashing morse
-    inner_colour_morse = (255, 255, 255)
-
-    outer_colour_normal = (255, 255, 255)
-    outer_colour_error = (255, 0, 0)
-    outer_colour_too_slow = (255, 128, 0)
-    outer_colour_correct = (0, 255, 0)
-
-    font_colour_normal = (255, 255, 255)
+    # Rendered morse, keyed on (character, wpm, frequency, sample rate).
+    # Shared by every box
+    sounds = audio.LRUCache(256)
 
     def __init__(self, ):
         """
@@ -108,212 +201,184 @@ class Box(pygame.sprite.Sprite):
         The surface is a fill colour, and contains a slightly smaller rectangle
         at the center, making an outer boarder.
         Starts with outer colour being white, and the inner colour being black.
+
+        The set functions can be called from any thread. They only publish a
+        new BoxState, which render() draws on the main thread
         """
         super(Box, self).__init__()
 
-        self.tone = pygame.mixer.Sound("Files/tone.wav")
-
         # Flag to communicate when game is paused
         self.paused: threading.Event = threading.Event()
 
-        self.surf = pygame.Surface((self.box_width, self.box_width))
-        self.surf.fill(self.outer_colour_normal)
+        # Time, by self.clock, that the last sound played is heard to finish
+        self.sound_end_time: float | None = None
+
+        # Seconds from a sound being mixed to it being heard
+        self.buffer_latency = mixer_buffer / pygame.mixer.get_init()[0]
+
+        # Two surfaces. render() draws into the back one then swaps it to the
+        # front, so self.surf always holds a whole frame
+        self.buffers = [pygame.Surface((self.box_width, self.box_width)) for _ in range(2)]
+        self.front_buffer = 0
+
+        # Location on the screen, and if the state has changed since it was
+        # last drawn there
+        self.rect = self.surf.get_rect()
+        self.dirty = True
 
         self.inner_box = pygame.Rect(self.border_width,
                                      self.border_width,
                                      self.box_width - self.border_width * 2,
                                      self.box_height - self.border_width * 2
                                      )
-        self.inner_box_colour = self.inner_colour_normal
-
-        self.font = pygame.font.SysFont(font_name, 40, True)
-        self.font_colour = self.font_colour_normal
-        self.font_img: pygame.Surface | None = None
-        self.set_font("")  # Set font to blank text
 
-        self.draw_inner_box()
+        # Only taken by the set functions, so the render thread never waits
+        self.state_lock = threading.Lock()
+        self.state = BoxState(self.outer_colour_normal,
+                              self.inner_colour_normal,
+                              self.font_colour_normal,
+                              "")
 
-    def set_font(self, text):
-        """
-        Sets the font on the inner box. Also draws it, drawing over any text
-        that already exists
-        """
-        # Draw over any text that exists already
-        self.draw_inner_box()
+        # State in the front buffer
+        self.drawn_state: BoxState | None = None
 
-        # Create the font image
-        self.font_img = self.font.render(text, False, self.font_colour)
+        self.atlas = get_atlas(40, True)
+        self.atlas.warm([self.font_colour_normal, self.outer_colour_error, self.outer_colour_too_slow])
 
-        self.draw_font()
+        self.render()
 
-    def draw_font(self):
+    @property
+    def surf(self) -> pygame.Surface:
         """
-        Draws the font in the center of the inner box
+        Surface holding the last complete frame
         """
-        if self.font_img and not self.paused.is_set():
-            font_img_rect = self.font_img.get_rect()
-            font_img_rect.center = (self.box_width / 2, self.box_height / 2)
-
-            self.surf.blit(self.font_img, font_img_rect)
+        return self.buffers[self.front_buffer]
 
-    def draw_inner_box(self):
+    def publish(self, **changes):
         """
-        Redraws the inner box. Required if either colour changes
+        Replaces the state with a copy that has some fields changed, and marks
+        the box to be redrawn
         """
-        if self.paused.is_set():
-            self.inner_box_colour = self.inner_colour_normal
+        with self.state_lock:
+            self.state = self.state._replace(**changes)
 
-        pygame.draw.rect(self.surf, self.inner_box_colour, self.inner_box)
+        self.changed()
 
-    def set_outer_colour(self, colour: tuple[int, int, int]):
+    def changed(self):
         """
-        Sets the boarder colour of the box
-        :param colour: RGB tuple
+        Marks the box as needing to be redrawn on the screen
         """
-        if self.paused.is_set():
-            colour = self.outer_colour_normal
+        self.dirty = True
+        request_redraw()
 
-        self.surf.fill(colour)
-        self.draw_inner_box()
-        self.draw_font()
-
-    def set_inner_colour(self, colour):
+    def render(self):
         """
-        Sets the inner colour of the box
-        :param colour: RGB tuple
-        """
-        self.inner_box_colour = colour
-        self.draw_inner_box()
-        self.draw_font()
-
-    def set_font_colour(self, colour: tuple[int, int, int]):
-        """
-        Sets the colour of the font in the inner box
-        :param colour: RGB tuple
-        """
-        self.font_colour = colour
-        self.draw_font()
-
-    def play_error(self, correct_character, too_slow: bool):
-        """
-        Flashes the outer ring red and displays the correct character that the
-        user should have entered. Waits a bit then plays what the character in
-        morse again before another pause.
+        Draws the latest state into the back buffer, then swaps it to the
+        front. Does nothing if the state hasn't changed.
 
-        If too_slow is set to True, then the box flashes orange to indicate
-        that the character selected was correct, but was too slow
-
-        You can play the next character immediately after this function finishes
+        Only call this from the thread that draws to the screen
         """
-        if too_slow:
-            colour = self.outer_colour_too_slow
-        else:
-            colour = self.outer_colour_error
+        state = self.state
+        paused = self.paused.is_set()
 
-        self.set_outer_colour(colour)
-        self.set_font_colour(colour)
+        if paused:
+            state = BoxState(self.outer_colour_normal, self.inner_colour_normal, state.font_colour, "")
 
-        self.set_font(correct_character)
+        if state == self.drawn_state:
+            return
 
-        time.sleep(2)
+        back_buffer = 1 - self.front_buffer
+        surf = self.buffers[back_buffer]
 
-        # Replay the correct character morse
-        self.play_morse(correct_character)
+        surf.fill(state.outer_colour)
+        pygame.draw.rect(surf, state.inner_colour, self.inner_box)
 
-        time.sleep(1)
+        if state.text:
+            text_rect = pygame.Rect((0, 0), self.atlas.size(state.text))
+            text_rect.center = (self.box_width // 2, self.box_height // 2)
 
-        self.set_outer_colour(self.outer_colour_normal)
-        self.set_font("")
+            self.atlas.draw(surf, state.text, state.font_colour, text_rect.topleft)
 
-        time.sleep(1)
+        self.front_buffer = back_buffer
+        self.drawn_state = state
 
-    def play_correct(self):
+    def set_font(self, text):
         """
-        Flashes the background green to indicate a successful decode.
-
-        You can play the next character immediately after this function finishes
+        Sets the text on the inner box, replacing any text that already
+        exists. Drawn in the current font colour
         """
-        self.set_outer_colour(self.outer_colour_correct)
-        time.sleep(0.5)
+        self.publish(text=text)
 
-        self.set_outer_colour(self.outer_colour_normal)
-        time.sleep(1)
-
-    def dit(self):
+    def set_outer_colour(self, colour: tuple[int, int, int]):
         """
-        Plays a 'dit'
-        Plays sound and flashes the inner box
-
-        Does nothing when the game is paused
+        Sets the boarder colour of the box
+        :param colour: RGB tuple
         """
-        if self.paused.is_set():
-            return
-
-        self.tone.play()
-        self.set_inner_colour(self.inner_colour_morse)
-
-        time.sleep(self.dit_length)
-
-        self.tone.stop()
-        self.set_inner_colour(self.inner_colour_normal)
+        self.publish(outer_colour=colour)
 
-    def dah(self):
+    def set_inner_colour(self, colour):
         """
-        Plays a 'dah'
-        Plays sound and flashes the inner box. Does this for 3 times as long
-        as Box.dit
-
-        Does nothing when the game is paused
+        Sets the inner colour of the box
+        :param colour: RGB tuple
         """
-        if self.paused.is_set():
-            return
-
-        self.tone.play()
-        self.set_inner_colour(self.inner_colour_morse)
-
-        time.sleep(self.dit_length * 3)
+        self.publish(inner_colour=colour)
 
-        self.tone.stop()
-        self.set_inner_colour(self.inner_colour_normal)
-
-    def play_morse(self, character: str):
+    def set_font_colour(self, colour: tuple[int, int, int]):
         """
-        Takes input as a character and plays its morse code. Flashes the box
-        and plays a tone
-
-        Waits a length of a dot between dots and dashes. Doesn't wait after
-        character is done
+        Sets the colour of the font in the inner box
+        :param colour: RGB tuple
+        """
+        self.publish(font_colour=colour)
 
-        Must be run in a thread
+    def get_sound(self, character: str) -> pygame.mixer.Sound:
+        """
+        Gets the sound of a character in morse at the current speed and tone.
+        The whole character, gaps included, is one buffer so it can be played
+        with a single call and has exact timing
 
         :param character: Letter or number
+        :raises KeyError: If character doesn't have morse code
         """
-        character_morse = morse[character]
+        sample_rate = pygame.mixer.get_init()[0]
+        wpm = audio.dit_length_to_wpm(self.dit_length)
+        key = (character, wpm, self.tone_frequency, sample_rate)
+
+        def render():
+            start = time.perf_counter()
+            sound = make_sound(audio.render_sequence(morse[character], wpm, self.tone_frequency, sample_rate))
+
+            if instrument.tracer:
+                instrument.tracer.add("audio_render", time.perf_counter() - start)
 
-        for i in character_morse:
+            return sound
 
-            if self.paused.is_set():
-                return
+        return self.sounds.get(key, render)
 
-            if i == ".":
-                self.dit()
-            elif i == "-":
-                self.dah()
+    def play_sound(self, sound: pygame.mixer.Sound):
+        """
+        Plays a sound, unless the game is paused. Records when the end of the
+        sound will be heard, from its length and the mixer's buffer, in
+        sound_end_time
+        """
+        if not self.paused.is_set():
+            start = self.clock()
+            sound.play()
+            self.sound_end_time = start + self.buffer_latency + sound.get_length()
 
-            time.sleep(self.dit_length)
+            if instrument.tracer:
+                instrument.tracer.add("audio_play", self.clock() - start)
 
     def reset_box(self):
         """
         Draws the box in the normal state. White outline with a black inner
         colour, and no fonts
         """
-        self.inner_box_colour = self.inner_colour_normal
-        self.set_font("")
+        self.publish(outer_colour=self.outer_colour_normal,
+                     inner_colour=self.inner_colour_normal,
+                     text="")
 
-        self.set_outer_colour(self.outer_colour_normal)
 
-
-class LettersLearned(pygame.sprite.Sprite):
+class LettersLearned(pygame.sprite.Sprite, ScorecardFeedback):
     """
     Scorecard at the top of the game
 
@@ -329,23 +394,22 @@ class LettersLearned(pygame.sprite.Sprite):
     # Number of pixels between text
     spacing = 5
 
-    letters_per_line = 20
     font_size = 10
 
-    font_colour_normal = (255, 255, 255)
-    font_colour_new_letter = (0, 255, 0)
-
     def __init__(self, window_width):
         """
-        Sets up the font object that will be used to render the text
+        Sets up the glyph atlas that the text is drawn from
         """
         super().__init__()
 
         self.width = window_width
         self.surf = pygame.Surface((window_width, self.height))
+        self.rect = self.surf.get_rect()
+        self.dirty = True
 
         self.font_size = 20
-        self.font = pygame.font.SysFont(font_name, self.font_size, bold=True)
+        self.atlas = get_atlas(self.font_size, True)
+        self.atlas.warm([self.font_colour_normal, self.font_colour_new_letter])
 
         self.font_colour_count = self.font_colour_normal
         self.font_colour_lines = self.font_colour_normal
@@ -358,26 +422,16 @@ class LettersLearned(pygame.sprite.Sprite):
         self.top_text_center = self.spacing + int(round(self.font_size / 2))
         self.bottom_text_center = self.height - int(self.spacing + round(self.font_size) / 2)
 
-        # Image of rendered text
-        self.font_img_count: pygame.Surface | None = None
-        self.font_img_letter_line_one: pygame.Surface | None = None
-        self.font_img_letter_line_two: pygame.Surface | None = None
+        # Text of each line, and its colour
+        self.font_lines: list[tuple[str, tuple[int, int, int]]] = []
 
-        # Locations to draw the font images
+        # Locations to draw the lines
         self.font_img_count_rect: pygame.rect.Rect | None = None
         self.font_img_letter_line_one_rect: pygame.rect.Rect | None = None
         self.font_img_letter_line_two_rect: pygame.rect.Rect | None = None
 
         self.update()
 
-    def font_images(self):
-        """
-        Gets the font images
-        """
-        return [self.font_img_count,
-                self.font_img_letter_line_one,
-                self.font_img_letter_line_two]
-
     def font_rects(self):
         """
         Gets the location where the fonts will be drawn
@@ -388,38 +442,39 @@ class LettersLearned(pygame.sprite.Sprite):
 
     def render_on_surface(self):
         """
-        Renders the font images onto the surface, according to their locations
+        Draws the lines of text onto the surface from the glyph atlas,
+        according to their locations
         """
 
         self.surf.fill(color=(0, 0, 0))
 
-        for image, rect in zip(self.font_images(), self.font_rects()):
-            if image and rect:
-                self.surf.blit(source=image, dest=rect)
+        for (text, colour), rect in zip(self.font_lines, self.font_rects()):
+            if text and rect:
+                self.atlas.draw(self.surf, text, colour, rect.topleft)
+
+        self.dirty = True
+        request_redraw()
 
     def create_font_images(self):
         """
-        Sets the font images and font images rect objects bases on the current
-        letters learned list
+        Sets the lines of text and their rect objects bases on the current
+        letters learned list. Nothing is rendered here, the text is drawn from
+        the glyph atlas by render_on_surface
 
         :return: None
         """
 
-        text_count = f"Letters learned {len(self.learned_letters)}/{len(morse.keys())}"
-        text_line_one = " ".join(self.learned_letters[:self.letters_per_line])
-        text_line_two = " ".join(self.learned_letters[self.letters_per_line:])
+        text_count, text_line_one, text_line_two = self.scorecard_lines()
 
-        img0 = self.font.render(text_count, False, self.font_colour_count)
-        img1 = self.font.render(text_line_one, False, self.font_colour_lines)
-        img2 = self.font.render(text_line_two, False, self.font_colour_lines)
+        self.font_lines = [(text_count, self.font_colour_count),
+                           (text_line_one, self.font_colour_lines),
+                           (text_line_two, self.font_colour_lines)]
 
-        self.font_img_count = img0
-        self.font_img_letter_line_one = img1
-        self.font_img_letter_line_two = img2
+        rects = [pygame.Rect((0, 0), self.atlas.size(text)) for text, _ in self.font_lines]
 
-        self.font_img_count_rect = img0.get_rect()
-        self.font_img_letter_line_one_rect = img1.get_rect()
-        self.font_img_letter_line_two_rect = img2.get_rect()
+        self.font_img_count_rect = rects[0]
+        self.font_img_letter_line_one_rect = rects[1]
+        self.font_img_letter_line_two_rect = rects[2]
 
         # Center each Rect
         center_x = int(round(self.width / 2))
@@ -443,9 +498,8 @@ class LettersLearned(pygame.sprite.Sprite):
         Updates the letters learned list
 
         If no new learned character is provided, then the fonts images are
-        simply redrawn.
-
-        This is designed to run in thread
+        simply redrawn. If one is, the count turns green until
+        set_count_colour is used to change it back
 
         :param new_learned_character: str of the character learned
         :return: None
@@ -456,115 +510,373 @@ class LettersLearned(pygame.sprite.Sprite):
 
         if new_learned_character:
             self.learned_letters.append(new_learned_character)
-
             self.font_colour_count = self.font_colour_new_letter
-            self.create_font_images()
-            self.render_on_surface()
 
-            time.sleep(0.5)
+        self.create_font_images()
+        self.render_on_surface()
 
-            self.font_colour_count = self.font_colour_normal
-            self.create_font_images()
-            self.render_on_surface()
+    def set_count_colour(self, colour: tuple[int, int, int]):
+        """
+        Sets the colour of the count of letters learned and redraws
+        """
+        self.font_colour_count = colour
+        self.create_font_images()
+        self.render_on_surface()
 
-        else:
-            self.create_font_images()
-            self.render_on_surface()
 
+class TextLine(pygame.sprite.Sprite):
+    """
+    Single line of text, centered on a point. Used for the paused text
+    """
 
-class MorseTrainer:
+    def __init__(self, font: pygame.font.Font, center_x: int, bottom: int):
+        super().__init__()
+
+        self.font = font
+        self.center_x = center_x
+        self.bottom = bottom
+
+        self.surf: pygame.Surface | None = None
+        self.rect: pygame.Rect | None = None
+        self.dirty = True
+
+        self.set_text("")
+
+    def set_text(self, text: str):
+        """
+        Renders new text and marks it to be redrawn
+        """
+        self.surf = self.font.render(text, True, (255, 255, 255), (0, 0, 0))
+
+        if instrument.tracer:
+            instrument.tracer.count("font_renders")
+
+        self.rect = self.surf.get_rect()
+        self.rect.centerx = self.center_x
+        self.rect.bottom = self.bottom
+
+        self.dirty = True
+        request_redraw()
+
+
+class DebugHud(pygame.sprite.Sprite):
     """
-    Main class for morse code trainer game
+    Numbers from instrument.tracer, in the bottom left corner. Shown when
+    MORSE_TRAINER_DEBUG is set
     """
-    window_width = 500
-    window_height = 500
 
-    # Amount of time to input the character before it's an error
-    time_to_guess_character = 1
+    font_size = 12
+    font_colour = (255, 255, 0)
+    width = 200
 
-    # The index of the character based on the number of times the player had
-    # got it right consecutively.
-    new_indices = [3, 4, 6, 8]
+    # Timings shown, and their labels
+    timings = (("loop", "loop"), ("draw", "draw"), ("input", "input"), ("audio", "audio_play"))
 
-    # Ideal length of the main queue
-    main_queue_length = 8
+    def __init__(self, tracer: instrument.Tracer, left: int, bottom: int):
+        super().__init__()
 
-    paused_text_distance_from_bottom = 30
+        self.tracer = tracer
+        self.atlas = get_atlas(self.font_size, False)
 
-    def __init__(self):
-        # Pygame initialisation
-        pygame.init()
-        pygame.mixer.init()
-        pygame.font.init()
+        self.lines = len(self.timings) + 2
+        self.surf = pygame.Surface((self.width, self.atlas.height * self.lines))
+        self.rect = self.surf.get_rect(left=left, bottom=bottom)
+        self.dirty = True
 
-        self.screen = pygame.display.set_mode(size=(self.window_width, self.window_height))
-        self.box = Box()
-        self.box_thread: Thread | None = None
-        self.letters_learned = LettersLearned(self.window_width)
+        self.text: list[str] = []
+        self.update_text()
 
-        self.need_new_character = False
-        self.correct_char = ""
+    def update_text(self):
+        """
+        Takes the latest numbers from the tracer. Drawn next time the screen
+        is
+        """
+        text = []
 
-        # Queues for what characters to add
-        self.back_character_queue: list[str] = []
-        self.main_character_queue: list[tuple[str, int]] = []
+        for label, name in self.timings:
+            summary = self.tracer.summary(name)
+            text.append(f"{label:<5} {summary['mean'] * 1000:.2f} p95 {summary['p95'] * 1000:.2f} ms")
+
+        errors = [f"{kind} {self.tracer.element_summary(kind)['mean'] * 1000:+.1f}" for kind in ("dit", "dah", "gap")]
+        text.append(" ".join(errors))
+
+        counts = self.tracer.counts
+        text.append(f"fonts {counts['font_renders']} threads {counts['threads']} +{counts['thread_spawns']}")
+
+        if text != self.text:
+            self.text = text
+            self.dirty = True
+
+    def render(self):
+        """
+        Draws the text. Called by the Renderer
+        """
+        self.surf.fill((0, 0, 0))
+
+        for index, line in enumerate(self.text):
+            self.atlas.draw(self.surf, line, self.font_colour, (0, index * self.atlas.height))
 
-        # Work out location to draw the middle box
-        mid_point = (self.window_width / 2, self.window_height / 2)
-        offset = self.box.box_width / 2
-        self.box_location = (mid_point[0] - offset, mid_point[1] - offset)
 
-        self.paused_font = pygame.font.SysFont(font_name, size=30)
+class Renderer:
+    """
+    Draws sprites onto the screen. Only sprites that have changed since they
+    were last drawn are redrawn, and only their part of the display is
+    updated.
+
+    Sprites need surf, rect and dirty attributes. Sprites can set dirty from
+    any thread. Sprites that draw their own surface on the main thread, like
+    Box, have a render() method that is called first
+    """
+
+    background_colour = (0, 0, 0)
+
+    def __init__(self, screen: pygame.Surface, frame_rate: int):
+        """
+        :param screen: Display surface
+        :param frame_rate: Most frames to draw per second
+        """
+        self.screen = screen
+        self.frame_rate = frame_rate
+        self.clock = pygame.time.Clock()
+
+        self.sprites = []
+
+        # Seconds the last draw waited to keep under the frame rate. Only
+        # measured when instrument.tracer is set
+        self.pacing_time = 0.0
 
-        self.paused_text = self.get_paused_text("")
+        # Where each sprite was last drawn, so it can be cleared when it moves
+        # or gets smaller
+        self.drawn_rects: dict[int, pygame.Rect] = {}
 
-    def get_paused_text(self, text) -> pygame.Surface:
+    def add(self, sprite):
         """
-        Render some text onto a surface
+        Adds a sprite to be drawn
         """
-        return self.paused_font.render(text,
-                                       True,
-                                       (255, 255, 255),
-                                       (0, 0, 0))
+        self.sprites.append(sprite)
+        sprite.dirty = True
 
-    def generate_character_queue(self):
+    def redraw_all(self):
         """
-        Generates the character queue that will be used to train the player.
+        Marks everything to be redrawn. Use when the window has been covered
+        """
+        self.screen.fill(self.background_colour)
+        self.drawn_rects.clear()
 
-        Sets this value to self.back_character_queue
+        for sprite in self.sprites:
+            sprite.dirty = True
 
-        Back queue is a list of character ordered by how long it takes to key
-        them.
+    def draw(self) -> bool:
+        """
+        Redraws the sprites that have changed and updates those parts of the
+        display. Waits if needed to keep under the frame rate
 
-        Also set's up the main character queue
+        :return: If anything was drawn
         """
-        characters = list(morse.keys())
-        self.back_character_queue = []
+        tracer = instrument.tracer
+        start = time.perf_counter() if tracer else 0.0
 
-        letters = [c for c in characters if c.isalpha()]
-        numbers = [c for c in characters if c.isdigit()]
+        self.pacing_time = 0.0
+        update_rects = []
 
-        for character_set in (letters, numbers):
-            lengths_dict: dict[int, list[str]] = {}
-            for char in character_set:
-                char_morse_length = morse_length(char)
+        for sprite in self.sprites:
+            if not sprite.dirty:
+                continue
 
-                if char_morse_length in lengths_dict:
-                    lengths_dict[char_morse_length].append(char)
-                else:
-                    lengths_dict[char_morse_length] = [char]
+            # Cleared before drawing, so a change made part way through drawing
+            # gets picked up next frame
+            sprite.dirty = False
+
+            if hasattr(sprite, "render"):
+                sprite.render()
+
+            rect = sprite.rect.copy()
+            old_rect = self.drawn_rects.get(id(sprite))
+
+            if old_rect and old_rect != rect:
+                self.screen.fill(self.background_colour, old_rect)
+                update_rects.append(old_rect)
+
+            self.screen.blit(source=sprite.surf, dest=rect)
+            self.drawn_rects[id(sprite)] = rect
+            update_rects.append(rect)
+
+        if not update_rects:
+            return False
+
+        pygame.display.update(update_rects)
+
+        if tracer:
+            drawn = time.perf_counter()
+            tracer.add("draw", drawn - start)
+
+            self.clock.tick(self.frame_rate)
+            self.pacing_time = time.perf_counter() - drawn
+        else:
+            self.clock.tick(self.frame_rate)
+
+        return True
+
+
+class StartupTimer:
+    """
+    Times each step of starting the game, to show where startup time goes
+    """
+
+    def __init__(self, start_time: float):
+        """
+        :param start_time: time.perf_counter() when startup began
+        """
+        self.start_time = start_time
+        self.last_time = start_time
+        self.times: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float):
+        """
+        Records a step that was timed before startup began, like the imports
+        """
+        self.times[name] = seconds
+        self.start_time -= seconds
+
+    def lap(self, name: str):
+        """
+        Records the time since the last step as the time for step name
+        """
+        now = time.perf_counter()
+        self.times[name] = now - self.last_time
+        self.last_time = now
+
+    def report(self) -> str:
+        """
+        Gets the breakdown as one line of text
+        """
+        steps = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.times.items())
+        return f"Started in {(self.last_time - self.start_time) * 1000:.0f}ms ({steps})"
+
+
+class MorseTrainer(TrainerEngine):
+    """
+    Main class for morse code trainer game
+    """
+    window_width = 500
+    window_height = 500
+
+    paused_text_distance_from_bottom = 30
+
+    # Most frames to draw per second. Frames are only drawn when something
+    # changes
+    frame_rate = 60
+
+    # Seconds of real time for each second of waiting, for playback and the
+    # pauses in the main loop. 0 runs as fast as possible, for replays
+    time_scale = 1.0
+
+    # Seconds between updates of the debug HUD
+    hud_interval = 0.5
+
+    # If a trainer has counted import_time in its startup time. Only the
+    # first in a process waits for the imports
+    imports_timed = False
+
+    def __init__(self,
+                 progress_path: str | None = progress.default_path,
+                 seed: int | None = None,
+                 record_path: str | None = None):
+        """
+        :param progress_path: Database to save progress in and resume from.
+            None to not save anything
+        :param seed: Seed for the order characters are asked in. Random if
+            not given
+        :param record_path: File to record the game in, for replay.py
+        """
+        self.startup_timer = StartupTimer(time.perf_counter())
 
-            lengths_list = list(lengths_dict.items())
-            lengths_list.sort(key=lambda x: x[0])
+        if not MorseTrainer.imports_timed:
+            self.startup_timer.add("imports", import_time)
+            MorseTrainer.imports_timed = True
 
-            to_add_to_queue = []
-            for length, letters in lengths_list:
-                random.shuffle(letters)
-                to_add_to_queue.extend(letters)
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
 
-            self.back_character_queue.extend(to_add_to_queue)
+        # High resolution, so reaction times are accurate to well under a
+        # frame
+        super().__init__(clock=time.perf_counter, rng=random.Random(self.seed))
 
-        self.get_next_char()
+        self.progress: progress.ProgressStore | None = None
+        if progress_path:
+            self.progress = progress.ProgressStore(progress_path)
+            self.reaction_times.listen(self.progress.record)
+
+        # Statistics of this game's answers
+        stats.track(self)
+
+        self.record_path = record_path
+        self.recorder: recording.Recorder | None = None
+
+        # Number of characters played so far. Lets a replay keep in step
+        self.characters_played = 0
+
+        # Time, by self.clock, that pygame.event.wait() last returned. Used as
+        # the time of the key presses it gave, as pygame events don't carry
+        # their own timestamps
+        self.events_time = 0.0
+
+        # Time pygame.event.wait() was last called, and the debug HUD. Only
+        # used when instrumentation is on
+        self.wait_started = 0.0
+        self.hud: DebugHud | None = None
+        self.hud_time = 0.0
+
+        self.startup_timer.lap("setup")
+
+        # Pygame initialisation. Only the parts that are used, pygame.init()
+        # would start every subsystem
+        pygame.display.init()
+        self.startup_timer.lap("display")
+
+        pygame.mixer.init(buffer=mixer_buffer)
+        self.startup_timer.lap("mixer")
+
+        pygame.font.init()
+        self.startup_timer.lap("font")
+
+        self.screen = pygame.display.set_mode(size=(self.window_width, self.window_height))
+        self.startup_timer.lap("window")
+
+        self.box = Box()
+        self.box_playing = threading.Event()
+        self.box_job: Job | None = None
+
+        # Runs everything that happens over time, like playing morse
+        self.scheduler = PlaybackScheduler(time_scale=self.time_scale)
+        self.letters_learned = LettersLearned(self.window_width)
+
+        self.need_new_character = True
+        self.correct_char = ""
+
+        # Work out location to draw the middle box
+        mid_point = (self.window_width / 2, self.window_height / 2)
+        offset = self.box.box_width / 2
+        self.box_location = (mid_point[0] - offset, mid_point[1] - offset)
+        self.box.rect.topleft = self.box_location
+
+        self.paused_font = fonts.load_font(font_name, 30)
+
+        self.paused_text = TextLine(self.paused_font,
+                                    self.screen.get_rect().centerx,
+                                    self.window_height - self.paused_text_distance_from_bottom)
+
+        self.renderer = Renderer(self.screen, self.frame_rate)
+        for sprite in (self.box, self.letters_learned, self.paused_text):
+            self.renderer.add(sprite)
+
+        self.startup_timer.lap("sprites")
+
+        self.draw_elements()
+        self.startup_timer.lap("first frame")
+
+        if instrument.enabled:
+            print(self.startup_timer.report())
+            self.debug()
 
     def is_playing(self) -> bool:
         """
@@ -572,85 +884,113 @@ class MorseTrainer:
         or flashes correct or error. Player input shouldn't be recorded while
         is_playing is True
         """
-        return self.box_thread and self.box_thread.is_alive()
+        return self.box_playing.is_set()
 
-    def set_box_thread(self, target, args: tuple = None):
+    def play_on_box(self, timeline: Timeline):
         """
-        Set's the box thread up and starts it.
+        Starts a timeline from one of the box's timeline functions.
 
-        Use this function to call the play functions from self.box
+        is_playing is True until it ends or is cancelled, when
+        box_finished_event is posted
         """
-        if args:
-            self.box_thread = Thread(target=target, args=args)
-        else:
-            self.box_thread = Thread(target=target)
+        def finished():
+            self.box_playing.clear()
+            self.record("end")
+            post_event(box_finished_event)
 
-        self.box_thread.start()
+        self.box_playing.set()
+        self.box_job = self.scheduler.submit(timeline, on_finished=finished)
 
-    def add_character_to_main_queue(self):
+    def character_learned(self, character: str):
         """
-        Adds a character from the back queue to the back of the main queue.
+        Flashes the new character up on the letters learned scorecard
+        """
+        self.scheduler.submit(self.letters_learned.learned_timeline(character))
 
-        Adds a random character from the first 3 of the back queue
+    def resume(self) -> bool:
+        """
+        Puts the queues back to where they were when the last game was
+        quit
 
-        :raises ValueError: if self.back_character_queue is empty
+        :return: If there was a game to resume
         """
-        if len(self.back_character_queue) == 0:
-            raise ValueError("Back character queue is empty")
+        snapshot = self.load_snapshot()
+        if not snapshot:
+            return False
+
+        self.restore(snapshot)
+
+        self.letters_learned.learned_letters = list(self.learned_characters)
+        self.letters_learned.update()
 
-        to_add = random.choice(self.back_character_queue[:3])
-        self.main_character_queue.append((to_add, 0))
-        self.back_character_queue.remove(to_add)
+        return True
 
-    def get_next_char(self):
+    def load_snapshot(self) -> dict | None:
         """
-        Gets the next character to play.
+        Gets the queues to resume from, or None to start from the beginning
+        """
+        return self.progress.load_snapshot() if self.progress else None
 
-        Adjusts the main queue by adding characters to it if necessary or
-        possible to make the main queue the ideal length
+    def save_progress(self):
+        """
+        Saves the state of the queues. The writing happens on the store's
+        own thread
+        """
+        if self.progress:
+            self.progress.save_snapshot(self.snapshot())
 
-        :raises ValueError: if queue is empty
+    def start_recording(self, resumed: bool):
         """
+        Starts recording the game, if there's a file to record it to
 
-        while len(self.main_character_queue) < self.main_queue_length and self.back_character_queue:
-            self.add_character_to_main_queue()
+        :param resumed: If the queues were resumed rather than started from
+            the beginning
+        """
+        if not self.record_path:
+            return
 
-        if self.main_character_queue:
-            return self.main_character_queue[0][0]
-        else:
-            raise ValueError("Queue empty")
+        settings = {
+            "repetition_mode": self.repetition_mode,
+            "new_indices": list(self.new_indices),
+            "main_queue_length": self.main_queue_length,
+            "time_to_guess_character": self.time_to_guess_character,
+            "adaptive_time_to_guess": self.adaptive_time_to_guess,
+            "dit_length": self.box.dit_length,
+        }
+
+        self.recorder = recording.Recorder(self.record_path, self.seed, settings,
+                                           self.snapshot() if resumed else None, clock=self.clock)
 
-    def is_queue_empty(self):
+    def record(self, kind: str, *data):
         """
-        Returns if there are no more letters to select, and the game can end
+        Adds an event to the recording, if there is one
         """
-        return len(self.back_character_queue) + len(self.main_character_queue) == 0
+        if self.recorder:
+            self.recorder.write(kind, *data)
 
-    def update_queue(self, correct: bool):
+    def sleep(self, seconds: float):
         """
-        Updates the queue if the character was correct
+        Waits, scaled by time_scale
+        """
+        time.sleep(seconds * self.time_scale)
 
-        If the new index is larger than the length of the queue, character
-        gets appended onto the end.
+    def quit_game(self):
+        """
+        Stops the threads and closes the window
+        """
+        self.scheduler.stop()
 
-        If the number of correct guesses in a row is too large for a new index,
-        then pops the element off queue
+        if self.recorder:
+            self.record("quit")
+            self.recorder.close()
 
-        :raises ValueError: if queue is empty
-        """
-        item = self.main_character_queue[0]
-        if correct:
-            new_item = (item[0], item[1] + 1)
-        else:
-            new_item = (item[0], 0)
+        if self.progress:
+            self.progress.close()
 
-        self.main_character_queue.pop(0)
+        if instrument.tracer:
+            print("Wrote trace to " + " and ".join(instrument.tracer.export()))
 
-        if new_item[1] < len(self.new_indices):
-            new_item_index = self.new_indices[new_item[1]]
-            self.main_character_queue.insert(new_item_index, new_item)
-        else:
-            Thread(target=self.letters_learned.update, args=(item[0],)).start()
+        pygame.quit()
 
     def pause(self):
         """
@@ -660,150 +1000,196 @@ class MorseTrainer:
         self.need_new_character = True
         self.box.paused.set()
 
-        self.box.reset_box()
+        if self.box_job:
+            self.scheduler.cancel(self.box_job)
 
-        self.paused_text = self.get_paused_text("Paused")
+        self.box.reset_box()
 
-        self.draw_elements()
+        self.paused_text.set_text("Paused")
 
         while True:
-            for event in pygame.event.get():
+            self.draw_elements()
+
+            for event in self.wait_for_events():
                 if event.type == locals.KEYDOWN:
                     if event.key == locals.K_ESCAPE:
                         print("Unpause")
+                        self.record("unpause")
 
                         self.box.paused.clear()
-                        self.paused_text = self.get_paused_text("")
+                        self.paused_text.set_text("")
                         self.draw_elements()
 
                         return
 
                 if event.type == locals.QUIT:
-                    pygame.quit()
+                    self.quit_game()
                     print("Quit")
                     quit(0)
 
-            self.draw_elements()
-
     def draw_elements(self):
         """
-        Draws the elements on the screen and updates the display
+        Draws the elements that have changed on the screen and updates those
+        parts of the display
         """
-        self.screen.fill((0, 0, 0))
+        self.renderer.draw()
 
-        # Draw the box in the middle of the screen
-        self.screen.blit(source=self.box.surf, dest=self.box_location)
+    def wait_for_events(self) -> list[pygame.event.Event]:
+        """
+        Waits until there is at least one event, then gets all of them.
 
-        # Draw the letters learned at the top
-        self.screen.blit(source=self.letters_learned.surf, dest=(0, 0))
+        Anything that changes on screen posts redraw_event, so there's no need
+        to keep checking while nothing happens
+        """
+        if instrument.tracer:
+            self.wait_started = self.clock()
 
-        # Draw the paused text
-        paused_location = self.paused_text.get_rect()
+        events = [pygame.event.wait()]
+        self.events_time = self.clock()
 
-        paused_location.centerx = self.screen.get_rect().centerx
-        paused_location.bottom = self.window_height - self.paused_text_distance_from_bottom
+        events.extend(pygame.event.get())
 
-        self.screen.blit(source=self.paused_text, dest=paused_location)
+        for event in events:
+            if event.type == pygame.WINDOWEXPOSED:
+                self.renderer.redraw_all()
 
-        pygame.display.flip()
+        return events
 
     def start(self):
         """
         Main game loop
         """
 
-        time.sleep(0.5)
+        self.sleep(0.5)
 
         self.need_new_character = True
 
-        self.generate_character_queue()
+        # Seeded before resuming, so a recording is replayed with the same
+        # random numbers
+        resumed = self.resume()
+        if not resumed:
+            self.generate_character_queue()
 
-        # Time when the box stopped playing the morse character
-        stopped_playing_time = None
+        self.start_recording(resumed)
 
         while True:
+            loop_start = self.clock()
 
             # Play the next character to guess
             if self.need_new_character and not self.is_playing():
-                if self.main_character_queue:
+                if not self.is_queue_empty():
                     self.correct_char = self.get_next_char()
 
-                    # Play the morse code in a thread
-                    self.set_box_thread(self.box.play_morse, (self.correct_char,))
+                    # Play the morse code on the scheduler
+                    self.play_on_box(self.box.morse_timeline(self.correct_char))
+                    self.characters_played += 1
+                    self.record("play", self.correct_char)
 
                     self.need_new_character = False
 
                 else:
-                    pygame.quit()
-                    quit(0)
+                    # Finished, so the next game starts from the beginning
+                    if self.progress:
+                        self.progress.clear_snapshot()
 
-            if stopped_playing_time is None and not self.is_playing():
-                # The box has just stopped playing
-
-                stopped_playing_time = time.time()
+                    self.quit_game()
+                    quit(0)
 
             self.draw_elements()
 
             # Handle events:  key presses and others
-            for event in pygame.event.get():
+            for event in self.wait_for_events():
 
-                if not self.is_playing() and event.type == locals.KEYDOWN:
+                waiting_for_answer = not self.is_playing() and not self.need_new_character
+
+                if waiting_for_answer and event.type == locals.KEYDOWN:
                     char_of_key: str = event.unicode
                     if char_of_key.isalnum():
                         # Key pressed is an alphanumeric key (0-9, a-z)
 
-                        time_taken = time.time() - stopped_playing_time
-                        stopped_playing_time = None
+                        # From the end of the morse audio to when the key
+                        # press woke the loop. Replays give the recorded time
+                        time_taken = getattr(event, "reaction_seconds", None)
+                        if time_taken is None:
+                            time_taken = self.events_time - self.box.sound_end_time
 
-                        character_correct = char_of_key.upper() == self.correct_char
-                        too_slow = self.time_to_guess_character < time_taken
+                        answer = self.answer(char_of_key, time_taken)
+                        self.record("key", char_of_key, time_taken, answer.correct, answer.too_slow)
+                        self.save_progress()
 
                         # Player got it wrong
-                        if not character_correct:
-                            self.set_box_thread(self.box.play_error, args=(self.correct_char, False))
+                        if not answer.correct:
+                            self.play_on_box(self.box.error_timeline(self.correct_char, False))
 
                         # Player got it right, but was too slow
-                        elif too_slow:
-                            self.set_box_thread(self.box.play_error, args=(self.correct_char, True))
+                        elif answer.too_slow:
+                            self.play_on_box(self.box.error_timeline(self.correct_char, True))
 
                         # Player got it right
                         else:
-                            self.set_box_thread(self.box.play_correct)
+                            self.play_on_box(self.box.correct_timeline())
 
-                        self.update_queue(character_correct and not too_slow)
                         self.need_new_character = True
 
+                        if instrument.tracer:
+                            instrument.tracer.add("input", self.clock() - self.events_time)
+
                 if event.type == locals.KEYDOWN and event.key == locals.K_ESCAPE:
                     # Esc key pressed after the thing has played. Pause the game.
+                    self.record("pause")
                     self.update_queue(correct=False)
-                    stopped_playing_time = None
+                    self.save_progress()
 
                     # Function returns when user unpauses
                     self.pause()
 
-                    time.sleep(1)
+                    self.sleep(1)
 
                 if event.type == locals.QUIT:
-                    pygame.quit()
+                    self.quit_game()
                     print("Quit")
                     return
 
+            if instrument.tracer:
+                self.trace_loop(loop_start)
+
+    def trace_loop(self, loop_start: float):
+        """
+        Records the time the last main loop iteration spent working, leaving
+        out waiting for events and for the frame rate, and updates the HUD
+        """
+        tracer = instrument.tracer
+        now = self.clock()
+
+        before_wait = self.wait_started - loop_start - self.renderer.pacing_time
+        tracer.add("loop", before_wait + now - self.events_time)
+        tracer.watch_threads()
+
+        if self.hud and now - self.hud_time >= self.hud_interval:
+            self.hud.update_text()
+            self.hud_time = now
+
     def debug(self):
         """
-        Testing function
+        Turns on the instrumentation. The hot paths are measured into
+        instrument.tracer, shown in the corner of the window, and written out
+        when the game quits. Called when MORSE_TRAINER_DEBUG is set
         """
-        pass
+        tracer = instrument.Tracer(self.clock)
+        instrument.tracer = tracer
 
+        for name, seconds in self.startup_timer.times.items():
+            tracer.add(f"startup_{name}", seconds)
 
-if __name__ == "__main__":
-    debug = False
+        self.hud = DebugHud(tracer, 5, self.window_height - 5)
+        self.renderer.add(self.hud)
 
-    if debug:
-        print("*" * 50 + " DEBUG! " + "*" * 50)
 
-        t = MorseTrainer()
-        t.debug()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learn morse code")
+    parser.add_argument("--record", metavar="PATH", help="Record the game to a file, for replay.py")
+    parser.add_argument("--seed", type=int, help="Seed for the order characters are asked in")
+    args = parser.parse_args()
 
-    else:
-        t = MorseTrainer()
-        t.start()
+    t = MorseTrainer(seed=args.seed, record_path=args.record)
+    t.start()
@@ -0,0 +1,241 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Searches for the queue settings that teach every character in the fewest
+attempts: TrainerEngine.new_indices, main_queue_length and
+time_to_guess_character. Each setting is tried on simulated learners, see
+simulate.py.
+
+Candidates are picked at random from the ranges given. Each round every
+candidate runs the same new seeds, then the worse half is dropped and the
+next round runs twice as many, so most sessions go to the candidates that
+are hard to tell apart. The current settings run in every round, to compare
+against. Sessions are run with simulate.run_sessions_vectorised, spread over
+a pool of processes.
+
+A longer time to guess always takes fewer attempts, as slow answers stop
+counting, and fewer new indices mean fewer right answers in a row to learn
+a character. Either would win by lowering the bar for knowing a character,
+so by default the number of new indices is the same as
+TrainerEngine.new_indices, and the time to guess goes no higher than
+TrainerEngine.time_to_guess_character. --indices-count and --time-to-guess
+open them up.
+
+Usage:
+    python optimise.py --candidates 64 --sessions 1000
+    python optimise.py --queue-length 6 10 --time-to-guess 0.8 1.0 --learning-rate 0.25
+"""
+
+
+import argparse
+import math
+import os
+import random
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from engine import TrainerEngine
+from simulate import SessionParameters, SessionResult, run_sessions_vectorised
+
+
+@dataclass
+class SearchSpace:
+    """
+    Ranges to pick settings from. Both ends are included. The number of new
+    indices and the slowest time to guess are held to the current settings,
+    so the candidates are held to the same bar for learning a character
+    """
+    indices_count: tuple[int, int] = (len(TrainerEngine.new_indices), len(TrainerEngine.new_indices))
+    index: tuple[int, int] = (1, 12)
+    queue_length: tuple[int, int] = (4, 12)
+    time_to_guess: tuple[float, float] = (0.6, TrainerEngine.time_to_guess_character)
+
+    def pick(self, rng: random.Random, learner: dict, max_attempts: int) -> SessionParameters:
+        """
+        Picks random settings. The indices are sorted, so a character comes
+        back later each time it's got right
+        """
+        new_indices = sorted(rng.randint(*self.index) for _ in range(rng.randint(*self.indices_count)))
+
+        return SessionParameters(new_indices=new_indices,
+                                 main_queue_length=rng.randint(*self.queue_length),
+                                 time_to_guess_character=round(rng.uniform(*self.time_to_guess), 2),
+                                 learner=learner,
+                                 max_attempts=max_attempts)
+
+
+@dataclass
+class Candidate:
+    """
+    Settings being tried, and the attempts each session took so far
+    """
+    parameters: SessionParameters
+    attempts: list[int] = field(default_factory=list)
+    unfinished: int = 0
+
+    def add(self, results: list[SessionResult]):
+        self.attempts.extend(result.attempts for result in results)
+        self.unfinished += sum(not result.finished for result in results)
+
+    @property
+    def mean_attempts(self) -> float:
+        """
+        Mean attempts to learn every character. Sessions that gave up count
+        as the attempts they gave up at
+        """
+        return sum(self.attempts) / len(self.attempts) if self.attempts else math.inf
+
+    @property
+    def standard_error(self) -> float:
+        if len(self.attempts) < 2:
+            return math.inf
+
+        return float(np.std(self.attempts, ddof=1) / math.sqrt(len(self.attempts)))
+
+    def describe(self) -> str:
+        parameters = self.parameters
+        return (f"--new-indices {' '.join(map(str, parameters.new_indices))} "
+                f"--main-queue-length {parameters.main_queue_length} "
+                f"--time-to-guess {parameters.time_to_guess_character:g}")
+
+
+def evaluate(candidates: list[Candidate],
+             seeds: range,
+             pool: ProcessPoolExecutor | None,
+             chunk_size: int = 1000):
+    """
+    Runs every candidate on the same seeds, and adds the results to them
+
+    :param pool: Pool to run the chunks of sessions on, or None to run them
+        in this process
+    """
+    chunks = [seeds[i:i + chunk_size] for i in range(0, len(seeds), chunk_size)]
+    work = [(candidate, chunk) for candidate in candidates for chunk in chunks]
+
+    run = pool.map if pool else map
+    for (candidate, _), results in zip(work, run(run_sessions_vectorised,
+                                                 [candidate.parameters for candidate, _ in work],
+                                                 [chunk for _, chunk in work])):
+        candidate.add(results)
+
+
+def search(space: SearchSpace,
+           candidates: int,
+           sessions: int,
+           learner: dict | None = None,
+           processes: int | None = None,
+           seed: int = 0,
+           max_attempts: int = 5000) -> tuple[list[Candidate], Candidate, int, float]:
+    """
+    Picks random candidates and narrows them down by successive halving
+
+    :param candidates: Number of random candidates
+    :param sessions: Sessions each candidate runs in the first round
+    :param learner: Passed to LearnerModel
+    :param processes: Number of processes. Defaults to the number of CPUs.
+        1 runs everything in this process
+    :param seed: Seed for the candidates and the sessions
+    :param max_attempts: Give up on sessions that take longer than this.
+        Stops hopeless settings taking up the search
+    :return: Every candidate, best first, the current settings, the number
+        of sessions run and the seconds it took
+    """
+    rng = random.Random(seed)
+    learner = learner or {}
+
+    current = Candidate(SessionParameters(learner=learner, max_attempts=max_attempts))
+    tried = [Candidate(space.pick(rng, learner, max_attempts)) for _ in range(candidates)]
+
+    remaining = list(tried)
+    first_seed = seed
+    total_sessions = 0
+    start = time.perf_counter()
+
+    pool = ProcessPoolExecutor(max_workers=processes) if processes != 1 else None
+
+    try:
+        while True:
+            seeds = range(first_seed, first_seed + sessions)
+            evaluate(remaining + [current], seeds, pool)
+
+            total_sessions += len(seeds) * (len(remaining) + 1)
+            first_seed += sessions
+
+            if len(remaining) == 1:
+                break
+
+            remaining.sort(key=lambda candidate: candidate.mean_attempts)
+            remaining = remaining[:(len(remaining) + 1) // 2]
+            sessions *= 2
+    finally:
+        if pool:
+            pool.shutdown()
+
+    # Candidates dropped early ran fewer sessions, so they sort after the
+    # ones that lasted longer
+    tried.sort(key=lambda candidate: (-len(candidate.attempts), candidate.mean_attempts))
+
+    return tried, current, total_sessions, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search for the queue settings that teach simulated learners quickest")
+    parser.add_argument("--candidates", type=int, default=64, help="Number of random settings to try")
+    parser.add_argument("--sessions", type=int, default=1000,
+                        help="Sessions each candidate runs in the first round. Doubles each round")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--indices-count", type=int, nargs=2, default=SearchSpace.indices_count,
+                        metavar=("MIN", "MAX"), help="Number of new indices")
+    parser.add_argument("--index", type=int, nargs=2, default=SearchSpace.index, metavar=("MIN", "MAX"),
+                        help="Range of each new index")
+    parser.add_argument("--queue-length", type=int, nargs=2, default=SearchSpace.queue_length,
+                        metavar=("MIN", "MAX"), help="Range of the main queue length")
+    parser.add_argument("--time-to-guess", type=float, nargs=2, default=SearchSpace.time_to_guess,
+                        metavar=("MIN", "MAX"), help="Range of the time to guess, in seconds")
+    parser.add_argument("--max-attempts", type=int, default=5000, help="Give up on sessions that take longer")
+    parser.add_argument("--learning-rate", type=float, default=0.35)
+    parser.add_argument("--accuracy", type=float, default=0.97,
+                        help="Chance a learned character is answered right")
+    parser.add_argument("--top", type=int, default=10, help="Number of candidates to show")
+    args = parser.parse_args()
+
+    space = SearchSpace(tuple(args.indices_count), tuple(args.index), tuple(args.queue_length),
+                        tuple(args.time_to_guess))
+
+    tried, current, total_sessions, elapsed = search(space,
+                                                     args.candidates,
+                                                     args.sessions,
+                                                     {"learning_rate": args.learning_rate,
+                                                      "best_accuracy": args.accuracy},
+                                                     args.processes,
+                                                     args.seed,
+                                                     args.max_attempts)
+
+    print(f"{'attempts':>9} {'error':>6} {'sessions':>9} {'gave up':>8}  settings")
+    for candidate in [current] + tried[:args.top]:
+        label = "  (current)" if candidate is current else ""
+        print(f"{candidate.mean_attempts:>9.1f} {candidate.standard_error:>6.2f} {len(candidate.attempts):>9} "
+              f"{candidate.unfinished:>8}  {candidate.describe()}{label}")
+
+    best = tried[0]
+    print()
+    print(f"Best: new_indices = {best.parameters.new_indices}, "
+          f"main_queue_length = {best.parameters.main_queue_length}, "
+          f"time_to_guess_character = {best.parameters.time_to_guess_character:g}")
+    print(f"{best.mean_attempts:.1f} attempts against {current.mean_attempts:.1f} now "
+          f"({best.mean_attempts / current.mean_attempts - 1:+.1%})")
+
+    processes = args.processes or os.cpu_count()
+    print(f"Ran {total_sessions} sessions in {elapsed:.1f}s, {total_sessions / elapsed:.0f} per second, "
+          f"{total_sessions / elapsed / processes:.0f} per process")
+
+
+if __name__ == "__main__":
+    main()
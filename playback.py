@@ -0,0 +1,276 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Runs timed feedback, like playing morse and flashing the box, on one long
+lived worker thread.
+
+Things to do are described by a Timeline, a list of function calls at times
+from the start. Timelines are submitted to a PlaybackScheduler, which calls
+each function when it's due against a monotonic clock.
+"""
+
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+import traceback
+
+from typing import Callable
+
+
+def report_error(function: Callable | None):
+    """
+    Prints the exception being handled, raised by a function called from a
+    timeline
+    """
+    name = getattr(function, "__qualname__", repr(function))
+    print(f"Error in playback calling {name}:", file=sys.stderr)
+    traceback.print_exc()
+
+
+class Timeline:
+    """
+    List of function calls, each at a time in seconds from the start.
+
+    Built up like a script, with a cursor that moves forward with wait():
+
+        timeline = Timeline()
+        timeline.call(box.set_outer_colour, red)
+        timeline.wait(2)
+        timeline.call(box.set_outer_colour, white)
+    """
+
+    def __init__(self):
+        self.commands: list[tuple[float, Callable, tuple]] = []
+        self.cancel_functions: list[Callable] = []
+
+        # Time that the next call() happens at
+        self.cursor = 0.0
+
+    @property
+    def length(self) -> float:
+        """
+        Time from the start to the end of the timeline
+        """
+        return self.cursor
+
+    def call(self, function: Callable, *args):
+        """
+        Adds a call to function at the cursor
+        """
+        self.commands.append((self.cursor, function, args))
+
+    def call_at(self, offset: float, function: Callable, *args):
+        """
+        Adds a call to function offset seconds after the cursor. Doesn't move
+        the cursor
+        """
+        self.commands.append((self.cursor + offset, function, args))
+
+    def wait(self, seconds: float):
+        """
+        Moves the cursor forward
+        """
+        self.cursor += seconds
+
+    def on_cancel(self, function: Callable):
+        """
+        Adds a function to call if the timeline is cancelled before it ends,
+        for example to stop a sound
+        """
+        self.cancel_functions.append(function)
+
+    def extend(self, timeline: "Timeline"):
+        """
+        Adds another timeline at the cursor, and moves the cursor to its end
+        """
+        for offset, function, args in timeline.commands:
+            self.commands.append((self.cursor + offset, function, args))
+
+        self.cancel_functions.extend(timeline.cancel_functions)
+        self.cursor += timeline.length
+
+
+class Job:
+    """
+    Timeline that has been submitted to a PlaybackScheduler
+    """
+
+    def __init__(self, timeline: Timeline, on_finished: Callable | None):
+        self.timeline = timeline
+        self.on_finished = on_finished
+
+        self.cancelled = False
+        self.finished = threading.Event()
+        self.finish_lock = threading.Lock()
+
+    def is_finished(self) -> bool:
+        """
+        Returns if the job has ended, either by running to the end or being
+        cancelled
+        """
+        return self.finished.is_set()
+
+    def finish(self):
+        """
+        Marks the job as done and calls its on_finished function. Only does
+        anything the first time it's called
+        """
+        with self.finish_lock:
+            if self.finished.is_set():
+                return
+
+            self.finished.set()
+
+        if self.on_finished:
+            self.on_finished()
+
+
+class PlaybackScheduler:
+    """
+    Worker thread that runs the calls of every submitted timeline at the
+    right time. Timelines that overlap run together, their calls interleaved
+    by time.
+
+    Functions are run on the worker thread, one at a time, so they should
+    return quickly. A function that raises has its error printed, and the
+    rest of its timeline is cancelled
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic, time_scale: float = 1.0):
+        """
+        :param clock: Monotonic clock in seconds. Must tick at the same rate
+            as real time, as waits use threading.Condition
+        :param time_scale: Seconds of real time for each second of a
+            timeline. 0 makes every call as soon as possible, still in order
+        """
+        self.clock = clock
+        self.time_scale = time_scale
+
+        # Heap of (due time, order added, job, function, args). A function of
+        # None marks the end of a job
+        self.heap: list[tuple[float, int, Job, Callable | None, tuple]] = []
+        self.order = itertools.count()
+
+        self.condition = threading.Condition()
+        self.stopped = False
+
+        self.thread = threading.Thread(target=self.run, name="playback", daemon=True)
+        self.thread.start()
+
+    def submit(self, timeline: Timeline, on_finished: Callable | None = None) -> Job:
+        """
+        Starts a timeline now
+
+        :param timeline: Calls to make
+        :param on_finished: Called on the worker thread when the timeline ends
+            or is cancelled
+        :return: Job that can be cancelled
+        """
+        job = Job(timeline, on_finished)
+        start = self.clock()
+
+        with self.condition:
+            # Sorted, so that calls keep their order when time_scale is 0
+            for offset, function, args in sorted(timeline.commands, key=lambda command: command[0]):
+                heapq.heappush(self.heap, (start + offset * self.time_scale, next(self.order), job, function, args))
+
+            heapq.heappush(self.heap, (start + timeline.length * self.time_scale, next(self.order), job, None, ()))
+
+            self.condition.notify()
+
+        return job
+
+    def cancel(self, job: Job | None = None):
+        """
+        Cancels a job, or every job if none is given. Calls that haven't
+        happened yet are dropped, then the cancel functions and on_finished
+        are called on this thread
+        """
+        with self.condition:
+            if job is None:
+                jobs = {item[2] for item in self.heap}
+            elif job.is_finished() or job.cancelled:
+                return
+            else:
+                jobs = {job}
+
+            for cancelled_job in jobs:
+                cancelled_job.cancelled = True
+
+            self.heap = [item for item in self.heap if item[2] not in jobs]
+            heapq.heapify(self.heap)
+
+        for cancelled_job in jobs:
+            for function in cancelled_job.timeline.cancel_functions:
+                try:
+                    function()
+                except Exception:
+                    report_error(function)
+
+            try:
+                cancelled_job.finish()
+            except Exception:
+                report_error(cancelled_job.on_finished)
+
+    def stop(self):
+        """
+        Stops the worker thread. Anything still to run is dropped
+        """
+        with self.condition:
+            self.stopped = True
+            self.heap.clear()
+            self.condition.notify()
+
+    def next_call(self):
+        """
+        Waits until the first call on the heap is due, and removes it
+
+        :return: Item from the heap, or None if stopped
+        """
+        with self.condition:
+            while not self.stopped:
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+
+                delay = self.heap[0][0] - self.clock()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+
+                return heapq.heappop(self.heap)
+
+        return None
+
+    def run(self):
+        """
+        Worker thread loop
+        """
+        while True:
+            item = self.next_call()
+            if item is None:
+                return
+
+            _, _, job, function, args = item
+
+            # Could have been cancelled since it came off the heap
+            if job.cancelled:
+                continue
+
+            try:
+                if function is None:
+                    job.finish()
+                else:
+                    function(*args)
+
+            except Exception:
+                # One broken call mustn't stop every other timeline, or leave
+                # anything waiting on this one forever. The rest of the job is
+                # dropped, and on_finished is still called
+                report_error(job.on_finished if function is None else function)
+                self.cancel(job)
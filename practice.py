@@ -0,0 +1,356 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Copy practice. Plays a continuous stream of morse, from a text file or
+random groups of characters, for the player to write down. The box flashes
+with each tone, and with --show the words are written under it once
+they've been sent.
+
+The audio is rendered a small chunk at a time and queued on a mixer channel
+just before the one playing ends, so there are no gaps between chunks, and
+a text of any length plays in the same memory.
+
+With --qrm, --noise or --fading the morse is mixed by qrm.SignalMixer with
+other stations, noise and static, for practice copying on a busy band.
+
+Usage:
+    python practice.py book.txt --wpm 20 --farnsworth 12 --show
+    python practice.py --groups 50
+    python practice.py --corpus words.index
+    python practice.py --groups 50 --qrm 5 --noise 0.2 --crashes 1 --fading 0.6
+"""
+
+
+import argparse
+import itertools
+import random
+import sys
+import threading
+import time
+
+from typing import Iterable, Iterator
+
+import pygame
+from pygame import locals
+
+import audio
+import corpus
+import fonts
+import main
+import progress
+import qrm
+import stats
+
+from codec import morse
+from playback import PlaybackScheduler, Timeline
+from words import code_groups, encode_words, read_words
+
+# Posted when the whole stream has played
+stream_finished_event = pygame.event.custom_type()
+
+
+def learned_words(index_path: str, rng: random.Random) -> Iterator[str]:
+    """
+    Endless words from a corpus index made only of the characters learned
+    in the saved progress, favouring words with the ones most often got
+    wrong
+
+    :raises ValueError: if no words can be made from them
+    """
+    store = progress.ProgressStore()
+    snapshot = store.load_snapshot()
+    statistics = stats.CharacterStatistics.from_attempts(store.attempts())
+    store.close()
+
+    learned = snapshot["learned_characters"] if snapshot else []
+
+    index = corpus.CorpusIndex.load(index_path)
+    if not index.count(learned):
+        raise ValueError(f"No words can be made from the characters learned so far: {''.join(learned)!r}")
+
+    return index.words(rng, learned, corpus.weak_character_weights(statistics, learned))
+
+
+class CopyText(main.TextLine):
+    """
+    Line of the words sent so far, most recent on the right. Words can be
+    added from any thread, the text is rendered on the main thread
+    """
+
+    max_characters = 30
+
+    def __init__(self, font: pygame.font.Font, center_x: int, bottom: int):
+        self.words: list[str] = []
+        self.words_lock = threading.Lock()
+
+        super().__init__(font, center_x, bottom)
+
+    def add_word(self, word: str):
+        """
+        Adds a word to the end of the line
+        """
+        with self.words_lock:
+            self.words.append(word)
+
+            while len(" ".join(self.words)) > self.max_characters and len(self.words) > 1:
+                self.words.pop(0)
+
+        self.dirty = True
+        main.request_redraw()
+
+    def render(self):
+        """
+        Renders the current words. Called by the Renderer
+        """
+        with self.words_lock:
+            text = " ".join(self.words)
+
+        self.surf = self.font.render(text, True, (255, 255, 255), (0, 0, 0))
+        self.rect = self.surf.get_rect()
+        self.rect.centerx = self.center_x
+        self.rect.bottom = self.bottom
+
+
+class StreamPlayer:
+    """
+    Plays chunks from audio.stream_words on one mixer channel without gaps,
+    on a thread of its own. Each chunk's flashes are started on the
+    scheduler when the chunk starts playing, so they stay in step with the
+    audio however long the stream runs
+    """
+
+    # How often to check if the queued chunk has started
+    poll_time = 0.002
+
+    def __init__(self,
+                 chunks: Iterable[audio.StreamChunk],
+                 box: main.Box,
+                 scheduler: PlaybackScheduler,
+                 copy_text: CopyText | None):
+        """
+        :param copy_text: Where to write each word once it's sent, or None to
+            not show them
+        """
+        self.chunks = chunks
+        self.box = box
+        self.scheduler = scheduler
+        self.copy_text = copy_text
+
+        self.sample_rate = pygame.mixer.get_init()[0]
+        self.channel = pygame.mixer.Channel(0)
+
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="stream", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stops playing. Chunks already rendered are dropped
+        """
+        self.stopped.set()
+        self.channel.stop()
+
+    def chunk_timeline(self, chunk: audio.StreamChunk) -> Timeline:
+        """
+        Flashes the box, and writes the words, at the times in a chunk
+        """
+        timeline = Timeline()
+
+        for index, event in chunk.events:
+            offset = index / self.sample_rate
+
+            if event is True:
+                timeline.call_at(offset, self.box.set_inner_colour, self.box.inner_colour_morse)
+            elif event is False:
+                timeline.call_at(offset, self.box.set_inner_colour, self.box.inner_colour_normal)
+            elif self.copy_text:
+                timeline.call_at(offset, self.copy_text.add_word, event)
+
+        return timeline
+
+    def wait_until(self, condition) -> bool:
+        """
+        Polls until a function of no arguments returns True
+
+        :return: False if stopped first
+        """
+        while not condition():
+            if self.stopped.wait(self.poll_time):
+                return False
+
+        return True
+
+    def run(self):
+        """
+        Keeps one chunk queued behind the one playing. pygame only allows one
+        queued sound, so the next chunk is queued as soon as the last one
+        starts
+        """
+        chunks = iter(self.chunks)
+
+        first = next(chunks, None)
+        if first is None or self.stopped.is_set():
+            main.post_event(stream_finished_event)
+            return
+
+        self.channel.play(main.make_sound(first.samples))
+        self.scheduler.submit(self.chunk_timeline(first))
+
+        for chunk in chunks:
+            sound = main.make_sound(chunk.samples)
+            timeline = self.chunk_timeline(chunk)
+
+            if self.stopped.is_set():
+                return
+
+            self.channel.queue(sound)
+
+            if not self.wait_until(lambda: self.channel.get_queue() is None):
+                return
+
+            self.scheduler.submit(timeline)
+
+        if self.wait_until(lambda: not self.channel.get_busy()):
+            main.post_event(stream_finished_event)
+
+
+class CopyPractice:
+    """
+    Window with the box, and optionally the words sent, for copy practice
+    """
+
+    window_width = main.MorseTrainer.window_width
+    window_height = main.MorseTrainer.window_height
+    frame_rate = main.MorseTrainer.frame_rate
+
+    def __init__(self, chunks: Iterable[audio.StreamChunk], show_words: bool):
+        pygame.display.init()
+        pygame.mixer.init(buffer=main.mixer_buffer)
+        pygame.font.init()
+
+        self.screen = pygame.display.set_mode(size=(self.window_width, self.window_height))
+        pygame.display.set_caption("Copy practice")
+
+        self.box = main.Box()
+        self.box.rect.center = self.screen.get_rect().center
+
+        self.copy_text = CopyText(fonts.load_font(main.font_name, 30),
+                                  self.screen.get_rect().centerx,
+                                  self.window_height - main.MorseTrainer.paused_text_distance_from_bottom)
+
+        self.renderer = main.Renderer(self.screen, self.frame_rate)
+        for sprite in (self.box, self.copy_text):
+            self.renderer.add(sprite)
+
+        self.scheduler = PlaybackScheduler()
+        self.player = StreamPlayer(chunks, self.box, self.scheduler, self.copy_text if show_words else None)
+
+    def start(self):
+        """
+        Plays the stream until it ends or the window is closed. Esc also
+        stops it
+        """
+        self.player.start()
+
+        running = True
+        while running:
+            self.renderer.draw()
+
+            for event in [pygame.event.wait(), *pygame.event.get()]:
+                if event.type == pygame.WINDOWEXPOSED:
+                    self.renderer.redraw_all()
+
+                if event.type in (locals.QUIT, stream_finished_event):
+                    running = False
+
+                if event.type == locals.KEYDOWN and event.key == locals.K_ESCAPE:
+                    running = False
+
+        self.player.stop()
+        self.scheduler.stop()
+        pygame.quit()
+
+
+def main_function():
+    parser = argparse.ArgumentParser(description="Copy practice with a continuous stream of morse")
+    parser.add_argument("path", nargs="?", help="Text file to send, - for standard input. "
+                                                "Random groups of characters if not given")
+    parser.add_argument("--wpm", type=float, default=audio.dit_length_to_wpm(main.Box.dit_length),
+                        help="Speed of the characters")
+    parser.add_argument("--farnsworth", type=float, default=None,
+                        help="Slower overall speed, with longer gaps between characters and words")
+    parser.add_argument("--groups", type=int, default=None,
+                        help="Number of random groups or words to send, when there's no text file")
+    parser.add_argument("--corpus", metavar="INDEX",
+                        help="Send words from an index made by corpus.py, using only the characters learned so far")
+    parser.add_argument("--show", action="store_true", help="Write each word under the box once it's sent")
+    parser.add_argument("--qrm", type=int, default=0, help="Number of other stations sending at the same time")
+    parser.add_argument("--noise", type=float, default=0.0, help="Level of the band noise, 0.1 is light")
+    parser.add_argument("--crashes", type=float, default=0.0, help="Static crashes per second")
+    parser.add_argument("--fading", type=float, default=0.0,
+                        help="How far signals fade, from 0 for none to 1 for fading out completely")
+    parser.add_argument("--drift", type=float, default=0.03,
+                        help="How much the other stations' speed wanders from word to word")
+    args = parser.parse_args()
+
+    if args.path and args.corpus:
+        parser.error("--corpus sends words of its own, so can't be used with a text file")
+
+    if args.path and args.groups is not None:
+        parser.error("--groups only counts random groups or words, so can't be used with a text file")
+
+    if args.path == "-":
+        words = read_words(sys.stdin)
+    elif args.path:
+        words = read_words(open(args.path, encoding="utf-8", errors="replace"))
+    else:
+        if args.corpus:
+            try:
+                words = learned_words(args.corpus, random.Random())
+            except ValueError as error:
+                sys.exit(str(error))
+        else:
+            words = code_groups(random.Random(), list(morse))
+
+        if args.groups:
+            words = itertools.islice(words, args.groups)
+
+    # Rendered at the mixer's rate, which is only known once it's started
+    def chunks():
+        sample_rate = pygame.mixer.get_init()[0]
+
+        if not (args.qrm or args.noise or args.fading):
+            yield from audio.stream_words(encode_words(words),
+                                          args.wpm,
+                                          main.Box.tone_frequency,
+                                          sample_rate,
+                                          farnsworth_wpm=args.farnsworth)
+            return
+
+        rng = random.Random()
+        signals = [qrm.Signal(encode_words(words),
+                              args.wpm,
+                              main.Box.tone_frequency,
+                              farnsworth_wpm=args.farnsworth,
+                              fading_depth=args.fading,
+                              fading_rate=rng.uniform(0.05, 0.2))]
+        signals += qrm.random_signals(rng, args.qrm, main.Box.tone_frequency, args.wpm,
+                                      drift=args.drift, fading_depth=args.fading)
+
+        mixer = qrm.SignalMixer(signals, qrm.BandConditions(noise_level=args.noise, crash_rate=args.crashes),
+                                sample_rate, seed=rng.getrandbits(64))
+        yield from mixer.chunks()
+
+    practice = CopyPractice(chunks(), args.show)
+
+    start = time.perf_counter()
+    practice.start()
+    print(f"Practised for {time.perf_counter() - start:.0f}s")
+
+
+if __name__ == "__main__":
+    main_function()
@@ -0,0 +1,320 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Saves the player's progress, so that quitting doesn't lose it.
+
+Progress is kept in an SQLite database with two tables. attempts is a log
+of every answer given, which only ever has rows added. snapshot holds one
+row, the state of the trainer's queues after the latest answer, so resuming
+reads one row instead of going back through the whole log.
+
+Writes are done by a thread of their own, which collects everything given
+to it over batch_time and writes it in one transaction. Recording an answer
+only puts it on a queue, so the game never waits for the disk.
+
+Delete the database file to start again from nothing.
+"""
+
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from contextlib import closing
+
+from engine import Reaction
+
+
+def data_directory() -> str:
+    """
+    Gets the directory that the progress database goes in
+    """
+    base = os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "morse-code-learner")
+
+
+default_path = os.path.join(data_directory(), "progress.db")
+
+schema = """
+CREATE TABLE IF NOT EXISTS attempts (
+    time REAL NOT NULL,
+    character TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    correct INTEGER NOT NULL,
+    too_slow INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshot (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    time REAL NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+
+class ProgressStore:
+    """
+    Attempt log and queue snapshot, written in the background
+    """
+
+    # Run when the store is opened, to make the tables
+    tables = schema
+
+    def __init__(self, path: str = default_path, batch_time: float = 1.0):
+        """
+        :param path: Database file. Its directory is made if needed
+        :param batch_time: Longest time, in seconds, that a write is held
+            back to be batched with others
+        """
+        self.path = path
+        self.batch_time = batch_time
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(self.connect()) as connection:
+            connection.executescript(self.tables)
+
+        # Writes waiting for the thread. Each is ("attempt", row),
+        # ("snapshot", state or None to delete it), or None to stop
+        self.pending: queue.Queue[tuple[str, object] | None] = queue.Queue()
+
+        self.thread = threading.Thread(target=self.run, name="progress", daemon=True)
+        self.thread.start()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Opens a connection to the database. Each thread uses its own
+        """
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def record(self, reaction: Reaction):
+        """
+        Adds an answer to the attempt log. Can be given to
+        ReactionStream.listen
+        """
+        row = (time.time(), reaction.character, reaction.key, reaction.seconds,
+               int(reaction.correct), int(reaction.too_slow))
+        self.pending.put(("attempt", row))
+
+    def save_snapshot(self, state: dict):
+        """
+        Replaces the saved queue state, from TrainerEngine.snapshot(). Only
+        the latest in each batch is written
+        """
+        self.pending.put(("snapshot", state))
+
+    def clear_snapshot(self):
+        """
+        Deletes the saved queue state, so the next game starts from the
+        beginning. The attempt log is kept
+        """
+        self.pending.put(("snapshot", None))
+
+    def load_snapshot(self) -> dict | None:
+        """
+        Reads the saved queue state, or None if there isn't one. Doesn't see
+        writes that are still waiting, call flush() first if that matters
+        """
+        with closing(self.connect()) as connection:
+            row = connection.execute("SELECT state FROM snapshot WHERE id = 0").fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def attempts(self) -> list[tuple[float, str, str, float, bool, bool]]:
+        """
+        Reads the whole attempt log, oldest first, as (time, character, key,
+        seconds, correct, too slow)
+        """
+        with closing(self.connect()) as connection:
+            rows = connection.execute("SELECT time, character, key, seconds, correct, too_slow "
+                                      "FROM attempts ORDER BY rowid").fetchall()
+
+        return [(t, character, key, seconds, bool(correct), bool(too_slow))
+                for t, character, key, seconds, correct, too_slow in rows]
+
+    def flush(self):
+        """
+        Waits until everything given so far has been written
+        """
+        self.pending.join()
+
+    def close(self):
+        """
+        Writes anything waiting and stops the thread
+        """
+        if self.thread.is_alive():
+            self.pending.put(None)
+            self.thread.join()
+
+    def next_batch(self) -> tuple[list[tuple[str, object]], bool]:
+        """
+        Waits for a write, then collects any others given within batch_time
+
+        :return: The writes, and if the store is closing
+        """
+        first = self.pending.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.batch_time
+
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return batch, False
+
+            try:
+                item = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                return batch, False
+
+            if item is None:
+                return batch, True
+
+            batch.append(item)
+
+    def write_batch(self, connection: sqlite3.Connection, batch: list[tuple[str, object]]):
+        """
+        Writes a batch in one transaction
+        """
+        rows = [item for kind, item in batch if kind == "attempt"]
+        snapshots = [item for kind, item in batch if kind == "snapshot"]
+
+        with connection:
+            if rows:
+                connection.executemany("INSERT INTO attempts VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+            if snapshots and snapshots[-1] is None:
+                connection.execute("DELETE FROM snapshot")
+            elif snapshots:
+                connection.execute("INSERT OR REPLACE INTO snapshot VALUES (0, ?, ?)",
+                                   (time.time(), json.dumps(snapshots[-1], separators=(",", ":"))))
+
+    def run(self):
+        """
+        Thread that does the writing
+        """
+        connection = self.connect()
+
+        closing = False
+        while not closing:
+            batch, closing = self.next_batch()
+
+            if batch:
+                try:
+                    self.write_batch(connection, batch)
+                except sqlite3.Error as error:
+                    # Losing some progress is better than stopping the game
+                    print(f"Couldn't save progress: {error}")
+
+            # The None that stops the thread is a task too
+            for _ in range(len(batch) + closing):
+                self.pending.task_done()
+
+        connection.close()
+
+
+shared_schema = """
+CREATE TABLE IF NOT EXISTS learner_attempts (
+    learner TEXT NOT NULL,
+    time REAL NOT NULL,
+    character TEXT NOT NULL,
+    key TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    correct INTEGER NOT NULL,
+    too_slow INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS learner_snapshots (
+    learner TEXT PRIMARY KEY,
+    time REAL NOT NULL,
+    state TEXT NOT NULL
+);
+"""
+
+
+class SharedProgressStore(ProgressStore):
+    """
+    Progress of many learners in one database, with one thread writing for
+    all of them. Used by server.py, so a seat doesn't need a thread and a
+    file of its own.
+
+    Use learner() to get each learner's progress, which works the same way
+    as a ProgressStore of their own
+    """
+
+    tables = shared_schema
+
+    def learner(self, name: str) -> "LearnerProgress":
+        return LearnerProgress(self, name)
+
+    def load_learner_snapshot(self, name: str) -> dict | None:
+        with closing(self.connect()) as connection:
+            row = connection.execute("SELECT state FROM learner_snapshots WHERE learner = ?", (name,)).fetchone()
+
+        return json.loads(row[0]) if row else None
+
+    def learner_attempts(self, name: str) -> list[tuple[float, str, str, float, bool, bool]]:
+        """
+        Reads a learner's attempt log, like ProgressStore.attempts
+        """
+        with closing(self.connect()) as connection:
+            rows = connection.execute("SELECT time, character, key, seconds, correct, too_slow "
+                                      "FROM learner_attempts WHERE learner = ? ORDER BY rowid", (name,)).fetchall()
+
+        return [(t, character, key, seconds, bool(correct), bool(too_slow))
+                for t, character, key, seconds, correct, too_slow in rows]
+
+    def write_batch(self, connection: sqlite3.Connection, batch: list[tuple[str, object]]):
+        """
+        Writes a batch in one transaction. Attempts have the learner's name
+        first, and snapshots are (name, state). Only each learner's latest
+        snapshot is written
+        """
+        rows = [item for kind, item in batch if kind == "attempt"]
+        snapshots = dict(item for kind, item in batch if kind == "snapshot")
+
+        with connection:
+            if rows:
+                connection.executemany("INSERT INTO learner_attempts VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+            connection.executemany("DELETE FROM learner_snapshots WHERE learner = ?",
+                                   [(name,) for name, state in snapshots.items() if state is None])
+            connection.executemany("INSERT OR REPLACE INTO learner_snapshots VALUES (?, ?, ?)",
+                                   [(name, time.time(), json.dumps(state, separators=(",", ":")))
+                                    for name, state in snapshots.items() if state is not None])
+
+
+class LearnerProgress:
+    """
+    One learner's progress in a SharedProgressStore. Has the same methods as
+    ProgressStore that the trainer uses
+    """
+
+    def __init__(self, store: SharedProgressStore, name: str):
+        self.store = store
+        self.name = name
+
+    def record(self, reaction: Reaction):
+        row = (self.name, time.time(), reaction.character, reaction.key, reaction.seconds,
+               int(reaction.correct), int(reaction.too_slow))
+        self.store.pending.put(("attempt", row))
+
+    def save_snapshot(self, state: dict):
+        self.store.pending.put(("snapshot", (self.name, state)))
+
+    def clear_snapshot(self):
+        self.store.pending.put(("snapshot", (self.name, None)))
+
+    def load_snapshot(self) -> dict | None:
+        return self.store.load_learner_snapshot(self.name)
@@ -0,0 +1,399 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Mixes the signal being copied with interfering stations (QRM), noise and
+static crashes (QRN), and fading, like a crowded band in a contest.
+
+Every signal keeps its own speed, pitch and level, and wanders in speed
+from word to word like a real operator. The mix is made a block at a time,
+with every signal in one numpy array, so each block costs about the same
+small amount whatever the number of signals, and the blocks play one after
+another on the mixer without gaps.
+
+Nothing in here depends on pygame. The blocks are audio.StreamChunk, with
+the events of the signal being copied, so anything that plays
+audio.stream_words can play a mix instead.
+"""
+
+
+import math
+import random
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+import numpy as np
+
+import audio
+
+from codec import morse
+from words import code_groups, encode_words
+
+
+class EnvelopeStream:
+    """
+    Level of one signal's tone at each sample, 0 or 1 with a rise and fall,
+    given out a block at a time. Renders a word at a time as needed
+    """
+
+    def __init__(self,
+                 words: Iterable[tuple[str, np.ndarray]],
+                 wpm: float,
+                 sample_rate: int,
+                 farnsworth_wpm: float | None = None,
+                 drift: float = 0.0,
+                 rng: random.Random | None = None,
+                 delay: float = 0.0):
+        """
+        :param words: Each word, and its elements including the gap after it,
+            like words.encode_words gives
+        :param drift: How much the speed wanders from word to word, as the
+            standard deviation of each step, a fraction of wpm
+        :param delay: Seconds of silence before the first word
+        """
+        self.words = iter(words)
+        self.wpm = wpm
+        self.sample_rate = sample_rate
+        self.farnsworth_wpm = farnsworth_wpm
+        self.drift = drift
+        self.rng = rng or random.Random()
+
+        # Speed of the next word, as a fraction of wpm
+        self.speed = 1.0
+
+        # Rendered envelope not yet given out, and events with sample
+        # indexes from the start of it
+        self.pending = np.zeros(int(round(delay * sample_rate)), dtype=np.float32)
+        self.pending_events: list[tuple[int, bool | str]] = []
+
+        self.finished = False
+
+    def render_word(self) -> bool:
+        """
+        Adds the next word to the pending envelope
+
+        :return: False if there are no more words
+        """
+        word_elements = next(self.words, None)
+        if word_elements is None:
+            return False
+
+        word, elements = word_elements
+
+        if self.drift:
+            # Wanders, but is pulled back towards the set speed
+            self.speed = 1 + (self.speed - 1) * 0.8 + self.rng.gauss(0, self.drift)
+            self.speed = min(max(self.speed, 0.5), 1.5)
+
+        wpm = self.wpm * self.speed
+        farnsworth_wpm = self.farnsworth_wpm * self.speed if self.farnsworth_wpm else None
+
+        envelope = audio.render_envelope(elements, wpm, self.sample_rate, farnsworth_wpm=farnsworth_wpm)
+
+        # Same rounding as render_envelope, so the events line up with it
+        units = audio.element_units(elements, wpm, farnsworth_wpm)
+        boundaries = np.rint(units * (audio.wpm_to_dit_length(wpm) * self.sample_rate)).astype(np.int64)
+        boundaries += self.pending.size
+
+        tone = np.asarray(elements) > 0
+        for start, stop in zip(boundaries[:-1][tone].tolist(), boundaries[1:][tone].tolist()):
+            self.pending_events.append((start, True))
+            self.pending_events.append((stop, False))
+
+        self.pending_events.append((int(boundaries[1:][tone][-1]) if tone.any() else int(boundaries[0]), word))
+
+        self.pending = np.concatenate((self.pending, envelope))
+        return True
+
+    def read(self, length: int) -> tuple[np.ndarray, list[tuple[int, bool | str]]]:
+        """
+        Gets the next block. Once the words run out the rest is silence and
+        finished is set
+
+        :return: float32 envelope, and the events in it with sample indexes
+            from the start of the block
+        """
+        while self.pending.size < length and not self.finished:
+            if not self.render_word():
+                self.finished = True
+
+        block = self.pending[:length]
+        if block.size < length:
+            block = np.concatenate((block, np.zeros(length - block.size, dtype=np.float32)))
+
+        self.pending = self.pending[length:]
+
+        events = [(index, event) for index, event in self.pending_events if index < length]
+        self.pending_events = [(index - length, event) for index, event in self.pending_events if index >= length]
+
+        return block, events
+
+
+class BandNoise:
+    """
+    Noise limited to a band around the tones, like the audio from a receiver
+    with a narrow filter. Made by overlapping frames of white noise filtered
+    by FFT, with windows whose squares add to one, so it's smooth and evenly
+    loud across the joins
+    """
+
+    frame_length = 2048
+
+    def __init__(self, sample_rate: int, low: float, high: float, rng: np.random.Generator):
+        """
+        :param low: Bottom of the band in Hz
+        :param high: Top of the band in Hz
+        """
+        self.rng = rng
+        self.hop = self.frame_length // 2
+
+        frequencies = np.fft.rfftfreq(self.frame_length, 1 / sample_rate)
+        self.band = (frequencies >= low) & (frequencies <= high)
+
+        # Sine window. Each sample is in two frames, whose windows' squares
+        # add to one, so the noise level is the same everywhere. Scaled so
+        # the noise has an RMS of 1
+        window = np.sin(np.pi * (np.arange(self.frame_length) + 0.5) / self.frame_length)
+        self.window = (window * math.sqrt(self.band.size / max(1, self.band.sum()))).astype(np.float32)
+
+        # Second half of the last frame, to add to the next, and noise made
+        # but not given out yet
+        self.tail = np.zeros(self.hop, dtype=np.float32)
+        self.pending = np.zeros(0, dtype=np.float32)
+
+    def read(self, length: int) -> np.ndarray:
+        """
+        Gets the next length samples of noise
+        """
+        frames = max(0, -(-(length - self.pending.size) // self.hop))
+
+        if frames:
+            white = self.rng.standard_normal((frames, self.frame_length), dtype=np.float32)
+            spectrum = np.fft.rfft(white, axis=1)
+            spectrum[:, ~self.band] = 0
+            filtered = np.fft.irfft(spectrum, n=self.frame_length, axis=1).astype(np.float32) * self.window
+
+            heads = filtered[:, :self.hop]
+            tails = np.concatenate((self.tail[np.newaxis], filtered[:-1, self.hop:]))
+            self.tail = filtered[-1, self.hop:].copy()
+
+            self.pending = np.concatenate((self.pending, (heads + tails).ravel()))
+
+        block, self.pending = self.pending[:length], self.pending[length:]
+        return block
+
+
+@dataclass
+class Signal:
+    """
+    One station on the band
+    """
+    words: Iterable[tuple[str, np.ndarray]]
+    wpm: float
+    frequency: float = audio.default_frequency
+    # Level compared with full scale, before fading
+    level: float = 1.0
+    farnsworth_wpm: float | None = None
+    # See EnvelopeStream
+    drift: float = 0.0
+    delay: float = 0.0
+    # Fading takes the level down by up to this fraction, and back, this many
+    # times a second
+    fading_depth: float = 0.0
+    fading_rate: float = 0.1
+
+
+@dataclass
+class BandConditions:
+    """
+    Noise and static on top of the signals
+    """
+    # RMS level of the noise compared with full scale
+    noise_level: float = 0.0
+    # Width of the band the noise is limited to, centered on the signal
+    # being copied, in Hz
+    bandwidth: float = 800.0
+    # Static crashes per second, how loud they are on average compared with
+    # the noise, and how quickly they die away in seconds
+    crash_rate: float = 0.0
+    crash_level: float = 4.0
+    crash_decay: float = 0.05
+
+
+class SignalMixer:
+    """
+    Mixes signals, noise and static into blocks. The first signal is the one
+    being copied: its events go in each block, and the mix ends with it
+    """
+
+    def __init__(self,
+                 signals: list[Signal],
+                 conditions: BandConditions | None = None,
+                 sample_rate: int = audio.default_sample_rate,
+                 amplitude: float = audio.default_amplitude,
+                 seed: int | None = None):
+        """
+        :param amplitude: Peak level of a signal with a level of 1, like
+            audio.render_elements. Turned down if every signal at once, plus
+            the noise, could go over full scale. Static crashes above full
+            scale are clipped
+        """
+        conditions = conditions or BandConditions()
+
+        self.sample_rate = sample_rate
+        self.conditions = conditions
+
+        rng = random.Random(seed)
+        self.noise_rng = np.random.default_rng(rng.getrandbits(64))
+
+        self.streams = [EnvelopeStream(signal.words,
+                                       signal.wpm,
+                                       sample_rate,
+                                       signal.farnsworth_wpm,
+                                       signal.drift,
+                                       random.Random(rng.getrandbits(64)),
+                                       signal.delay)
+                        for signal in signals]
+
+        # Per signal columns, so the whole mix is a few array operations
+        # Phase step per sample, and the phase at the start of the next block.
+        # The phase is kept below 2 pi, so each block can be worked out in
+        # float32 without losing accuracy however long it runs
+        self.steps = np.array([2 * np.pi * signal.frequency / sample_rate for signal in signals])[:, np.newaxis]
+        self.phases = np.array([rng.uniform(0, 2 * np.pi) for _ in signals])[:, np.newaxis]
+        self.levels = np.array([signal.level for signal in signals])
+        self.fading_depths = np.array([signal.fading_depth for signal in signals])
+        self.fading_rates = np.array([signal.fading_rate for signal in signals])
+        self.fading_phases = np.array([rng.uniform(0, 2 * np.pi) for _ in signals])
+
+        loudest = self.levels.sum() + 3 * conditions.noise_level
+        self.scale = min(amplitude, 0.9 / loudest if loudest else amplitude) * 32767
+
+        centre = signals[0].frequency if signals else audio.default_frequency
+        self.noise = BandNoise(sample_rate,
+                               centre - conditions.bandwidth / 2,
+                               centre + conditions.bandwidth / 2,
+                               self.noise_rng)
+
+        # Level of the static crashes at the end of the last block
+        self.crash_envelope = 0.0
+
+        # Samples made so far
+        self.position = 0
+
+    def gains(self, length: int) -> np.ndarray:
+        """
+        Level of each signal across a block, with fading. Fading is slow, so
+        the level is worked out at the ends of the block and joined with a
+        straight line
+        """
+        ends = np.array([self.position, self.position + length]) / self.sample_rate
+        cycles = self.fading_phases[:, np.newaxis] + 2 * np.pi * self.fading_rates[:, np.newaxis] * ends
+        fade = 1 - self.fading_depths[:, np.newaxis] * (0.5 - 0.5 * np.cos(cycles))
+        levels = (self.levels[:, np.newaxis] * fade).astype(np.float32)
+
+        steps = np.linspace(0, 1, length, endpoint=False, dtype=np.float32)
+        return levels[:, :1] + (levels[:, 1:] - levels[:, :1]) * steps
+
+    def static(self, length: int) -> np.ndarray:
+        """
+        Level of the noise across a block, with static crashes. Each crash
+        jumps up then dies away exponentially
+        """
+        conditions = self.conditions
+
+        if not conditions.crash_rate:
+            return np.float32(conditions.noise_level)
+
+        count = self.noise_rng.poisson(conditions.crash_rate * length / self.sample_rate)
+        impulses = np.zeros(length)
+        np.add.at(impulses,
+                  self.noise_rng.integers(0, length, count),
+                  self.noise_rng.exponential(conditions.crash_level * conditions.noise_level, count))
+
+        # envelope[n] = envelope[n - 1] * decay + impulses[n], all at once
+        decay = math.exp(-1 / (conditions.crash_decay * self.sample_rate))
+        powers = decay ** np.arange(length)
+        envelope = powers * (self.crash_envelope * decay + np.cumsum(impulses / powers))
+        self.crash_envelope = float(envelope[-1])
+
+        return (conditions.noise_level + envelope).astype(np.float32)
+
+    def block(self, length: int) -> audio.StreamChunk:
+        """
+        Mixes the next block
+
+        :return: Chunk with the events of the signal being copied
+        """
+        envelopes = []
+        events = []
+
+        for index, stream in enumerate(self.streams):
+            envelope, stream_events = stream.read(length)
+            envelopes.append(envelope)
+
+            if index == 0:
+                events = stream_events
+
+        tones = np.sin(self.phases.astype(np.float32) + self.steps.astype(np.float32) * np.arange(length, dtype=np.float32))
+        self.phases = (self.phases + self.steps * length) % (2 * np.pi)
+
+        mix = np.einsum("ij,ij,ij->j", np.array(envelopes), tones, self.gains(length))
+
+        if self.conditions.noise_level:
+            mix += self.noise.read(length) * self.static(length)
+
+        samples = np.clip(mix * self.scale, -32768, 32767).astype(np.int16)
+
+        chunk = audio.StreamChunk(samples, self.position, events)
+        self.position += length
+
+        return chunk
+
+    @property
+    def finished(self) -> bool:
+        return not self.streams or (self.streams[0].finished and self.streams[0].pending.size == 0)
+
+    def chunks(self, chunk_time: float = 0.1) -> Iterator[audio.StreamChunk]:
+        """
+        Blocks until the signal being copied has ended
+        """
+        length = max(1, int(round(chunk_time * self.sample_rate)))
+
+        while not self.finished:
+            yield self.block(length)
+
+
+def random_signals(rng: random.Random,
+                   count: int,
+                   frequency: float,
+                   wpm: float,
+                   spread: float = 600.0,
+                   drift: float = 0.03,
+                   fading_depth: float = 0.0) -> list[Signal]:
+    """
+    Interfering stations at random pitches around a frequency, at random
+    speeds and levels, sending random groups that never end
+
+    :param spread: Widest offset from frequency in Hz
+    """
+    characters = list(morse)
+    signals = []
+
+    for _ in range(count):
+        offset = rng.uniform(50, spread) * rng.choice((-1, 1))
+
+        signals.append(Signal(encode_words(code_groups(random.Random(rng.getrandbits(64)),
+                                                       characters,
+                                                       rng.randint(3, 6))),
+                              wpm=wpm * rng.uniform(0.7, 1.6),
+                              frequency=max(100.0, frequency + offset),
+                              level=rng.uniform(0.2, 1.2),
+                              drift=drift,
+                              delay=rng.uniform(0, 3),
+                              fading_depth=fading_depth,
+                              fading_rate=rng.uniform(0.05, 0.3)))
+
+    return signals
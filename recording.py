@@ -0,0 +1,103 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Records a game so it can be played back exactly by replay.py.
+
+A recording is a text file of JSON lines. The first line is a header with
+the seed of the trainer's random numbers, the settings, and the queues it
+resumed from if any. Every other line is an event:
+
+    [time, "play", character]                           Morse starts playing
+    [time, "end"]                                       The box stops playing
+    [time, "key", key, seconds, correct, too slow]      An answer
+    [time, "pause"]
+    [time, "unpause"]
+    [time, "quit"]
+
+Times are seconds from the start of the recording.
+"""
+
+
+import json
+import threading
+import time
+
+from typing import Callable, Iterator
+
+# Changed if the format changes in a way old recordings can't be read
+version = 1
+
+
+class Recorder:
+    """
+    Writes a recording as a game is played. Events can be written from any
+    thread
+    """
+
+    def __init__(self,
+                 path: str,
+                 seed: int,
+                 settings: dict,
+                 snapshot: dict | None = None,
+                 clock: Callable[[], float] = time.perf_counter):
+        """
+        :param path: File to write
+        :param seed: Seed of the trainer's random number generator
+        :param settings: Trainer settings that change how it behaves
+        :param snapshot: Queues the game resumed from, from
+            TrainerEngine.snapshot(), or None if it started from nothing
+        :param clock: Clock that event times are measured with
+        """
+        self.clock = clock
+        self.start_time = clock()
+
+        # Line buffered, so every event is in the file as soon as it happens,
+        # even if the game crashes
+        self.lock = threading.Lock()
+        self.file = open(path, "w", buffering=1)
+
+        header = {"version": version, "seed": seed, "settings": settings,
+                  "snapshot": snapshot, "started": time.time()}
+        self.file.write(json.dumps(header, separators=(",", ":")) + "\n")
+
+    def write(self, kind: str, *data):
+        """
+        Adds an event, timed now
+        """
+        line = json.dumps([round(self.clock() - self.start_time, 4), kind, *data], separators=(",", ":"))
+
+        with self.lock:
+            if not self.file.closed:
+                self.file.write(line + "\n")
+
+    def close(self):
+        """
+        Finishes the file
+        """
+        with self.lock:
+            self.file.close()
+
+
+def read_recording(path: str) -> tuple[dict, Iterator[list]]:
+    """
+    Reads a recording
+
+    :return: The header, and an iterator of the events
+    :raises ValueError: if the file isn't a recording this version can read
+    """
+    recording_file = open(path)
+
+    header = json.loads(recording_file.readline() or "null")
+    if not isinstance(header, dict) or header.get("version") != version:
+        recording_file.close()
+        raise ValueError(f"{path} isn't a version {version} recording")
+
+    def events() -> Iterator[list]:
+        with recording_file:
+            for line in recording_file:
+                if line.strip():
+                    yield json.loads(line)
+
+    return header, events()
@@ -0,0 +1,298 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Spaced repetition queues for the characters (or words) being learned.
+
+Each item has a due time, counted in asks: the number of answers the
+player has given so far. Items are kept in a heap ordered by due time, so
+getting the next item and putting it back are O(log n) however many items
+there are. Per item state is kept in arrays indexed by a small integer id.
+
+Three ways of choosing when an item comes back are available:
+    FixedSlotQueue  The trainer's original behaviour. After k right answers in
+                    a row, the item comes back after new_indices[k] others
+    LeitnerQueue    Items move up a box when right and back to the first box
+                    when wrong. Each box has a longer interval
+    SM2Queue        SuperMemo 2 style. The interval grows by a per item ease
+                    factor, which drops when the item is got wrong
+"""
+
+
+import heapq
+import itertools
+
+from array import array
+
+
+class RepetitionQueue:
+    """
+    Base class for the queues. Subclasses decide when an answered item is
+    due again, and when it has been learned
+    """
+
+    # Names of the per item arrays, saved by get_state. Subclasses with their
+    # own arrays add them
+    state_arrays = ("streaks", "queued")
+
+    def __init__(self):
+        # Heap of (due, order, item id). The order breaks ties between items
+        # due at the same time
+        self.heap: list[tuple[int, int, int]] = []
+        self.order = itertools.count()
+
+        # Item names and ids
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+
+        # Number of right answers in a row, and if it's in the heap, by id
+        self.streaks = array("l")
+        self.queued = array("b")
+
+        # Number of answers given so far
+        self.step = 0
+
+        # Latest due time given out, so new items can go after everything
+        self.last_due = 0
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def add(self, name: str):
+        """
+        Adds a new item to the back of the queue
+
+        :raises ValueError: if the item is already in the queue
+        """
+        if name in self.ids:
+            item = self.ids[name]
+            if self.queued[item]:
+                raise ValueError(f"{name!r} already in queue")
+
+            self.streaks[item] = 0
+        else:
+            item = len(self.names)
+            self.names.append(name)
+            self.ids[name] = item
+            self.streaks.append(0)
+            self.queued.append(0)
+            self.new_item(item)
+
+        self.queued[item] = 1
+
+        due = max(self.last_due + 1, self.step + 1)
+        self.last_due = due
+
+        heapq.heappush(self.heap, (due, next(self.order), item))
+
+    def front(self) -> str:
+        """
+        Gets the item to ask next
+
+        :raises ValueError: if queue is empty
+        """
+        if not self.heap:
+            raise ValueError("Queue empty")
+
+        return self.names[self.heap[0][2]]
+
+    def answer(self, correct: bool) -> bool:
+        """
+        Records the answer to the item at the front, and puts it back in the
+        queue when it's next due, unless it has been learned
+
+        :return: True if the item was learned, and has left the queue
+        :raises ValueError: if queue is empty
+        """
+        if not self.heap:
+            raise ValueError("Queue empty")
+
+        _, _, item = heapq.heappop(self.heap)
+        self.step += 1
+
+        if correct:
+            self.streaks[item] += 1
+        else:
+            self.streaks[item] = 0
+
+        interval = self.next_interval(item, correct)
+        if interval is None:
+            self.queued[item] = 0
+            return True
+
+        due = self.step + interval
+        self.last_due = max(self.last_due, due)
+
+        # Negative order puts it ahead of items already due at that time,
+        # like inserting into a list at that index
+        heapq.heappush(self.heap, (due, -next(self.order), item))
+
+        return False
+
+    def items_in_order(self) -> list[tuple[str, int]]:
+        """
+        Gets the queue as a list of (name, right answers in a row), in the
+        order they'll be asked. O(n log n), for display and debugging
+        """
+        return [(self.names[item], self.streaks[item]) for _, _, item in sorted(self.heap)]
+
+    def get_state(self) -> dict:
+        """
+        Gets everything needed to rebuild the queue, as plain lists and
+        numbers that can be saved as JSON
+        """
+        state = {
+            "heap": [list(entry) for entry in self.heap],
+            # Only the order of the numbers matters, so skipping the one taken
+            # here doesn't change anything
+            "order": next(self.order),
+            "names": list(self.names),
+            "step": self.step,
+            "last_due": self.last_due,
+        }
+
+        for name in self.state_arrays:
+            state[name] = getattr(self, name).tolist()
+
+        return state
+
+    def set_state(self, state: dict):
+        """
+        Rebuilds the queue from a state given by get_state
+        """
+        self.heap = [tuple(entry) for entry in state["heap"]]
+        heapq.heapify(self.heap)
+        self.order = itertools.count(state["order"])
+
+        self.names = list(state["names"])
+        self.ids = {name: item for item, name in enumerate(self.names)}
+        self.step = state["step"]
+        self.last_due = state["last_due"]
+
+        for name in self.state_arrays:
+            values = getattr(self, name)
+            setattr(self, name, array(values.typecode, state[name]))
+
+    def new_item(self, item: int):
+        """
+        Sets up per item state for a new id. Subclasses with their own arrays
+        append to them here
+        """
+        pass
+
+    def next_interval(self, item: int, correct: bool) -> int | None:
+        """
+        Gets the number of asks until an item that has just been answered is
+        due again, or None if it's learned
+        """
+        raise NotImplementedError
+
+
+class FixedSlotQueue(RepetitionQueue):
+    """
+    After k right answers in a row an item comes back after new_indices[k]
+    other items. Once there are no more indices it's learned
+    """
+
+    def __init__(self, new_indices: list[int]):
+        super().__init__()
+        self.new_indices = list(new_indices)
+
+    def next_interval(self, item: int, correct: bool) -> int | None:
+        streak = self.streaks[item]
+
+        if streak < len(self.new_indices):
+            # Slot n means n other items come first
+            return self.new_indices[streak] + 1
+
+        return None
+
+
+class LeitnerQueue(RepetitionQueue):
+    """
+    Leitner boxes. Right answers move an item up a box, wrong ones send it
+    back to the first. It's learned when right in the last box
+    """
+
+    state_arrays = RepetitionQueue.state_arrays + ("boxes",)
+
+    def __init__(self, intervals: list[int] = (2, 4, 8, 16, 32)):
+        """
+        :param intervals: Asks until an item in each box is due again
+        """
+        super().__init__()
+        self.intervals = list(intervals)
+        self.boxes = array("b")
+
+    def new_item(self, item: int):
+        self.boxes.append(0)
+
+    def next_interval(self, item: int, correct: bool) -> int | None:
+        if not correct:
+            self.boxes[item] = 0
+            return self.intervals[0]
+
+        if self.boxes[item] == len(self.intervals) - 1:
+            return None
+
+        self.boxes[item] += 1
+        return self.intervals[self.boxes[item]]
+
+
+class SM2Queue(RepetitionQueue):
+    """
+    SuperMemo 2. After the first and second right answers in a row the
+    intervals are 1 then 6, then they grow by the item's ease factor.
+    Answers are graded 4 when right and 1 when wrong, so wrong answers make
+    an item come back sooner from then on. It's learned once its interval
+    reaches learned_interval
+    """
+
+    state_arrays = RepetitionQueue.state_arrays + ("eases", "intervals")
+
+    initial_ease = 2.5
+    minimum_ease = 1.3
+
+    def __init__(self, learned_interval: int = 40):
+        """
+        :param learned_interval: Interval, in asks, at which an item counts as
+            learned
+        """
+        super().__init__()
+        self.learned_interval = learned_interval
+
+        self.eases = array("f")
+        self.intervals = array("l")
+
+    def new_item(self, item: int):
+        self.eases.append(self.initial_ease)
+        self.intervals.append(0)
+
+    def next_interval(self, item: int, correct: bool) -> int | None:
+        quality = 4 if correct else 1
+
+        ease = self.eases[item] + (0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self.eases[item] = max(self.minimum_ease, ease)
+
+        streak = self.streaks[item]
+        if streak <= 1:
+            interval = 1
+        elif streak == 2:
+            interval = 6
+        else:
+            interval = int(round(self.intervals[item] * self.eases[item]))
+
+        self.intervals[item] = interval
+
+        if interval >= self.learned_interval:
+            return None
+
+        return interval
+
+
+# Queues that don't need any settings from the trainer, by name
+modes = {
+    "leitner": LeitnerQueue,
+    "sm2": SM2Queue,
+}
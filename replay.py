@@ -0,0 +1,192 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Plays back a game recorded with `python main.py --record PATH`, by driving
+MorseTrainer with the recorded key presses. The trainer is seeded and set
+up the same way, and each answer is given the reaction time that was
+recorded, so the replay asks the same characters and scores them the same
+way as the original game. Any difference is printed.
+
+With --fast every wait is skipped and the game runs headless, which takes
+a fraction of a second per hundred answers. Useful for reproducing bug
+reports, and for checking changes against real games.
+
+Usage:
+    python replay.py game.jsonl [--fast]
+"""
+
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Play back a recorded game")
+    parser.add_argument("path")
+    parser.add_argument("--fast", action="store_true",
+                        help="Skip every wait, and don't open a window or play sound")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+
+    # Has to be set before pygame starts
+    if arguments.fast:
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import main
+import recording
+
+
+class ReplayTrainer(main.MorseTrainer):
+    """
+    MorseTrainer set up from a recording's header. Doesn't save progress
+    """
+
+    def __init__(self, header: dict, fast: bool):
+        settings = header["settings"]
+
+        self.time_scale = 0 if fast else 1
+        self.header_snapshot = header["snapshot"]
+
+        super().__init__(progress_path=None, seed=header["seed"])
+
+        self.box.dit_length = settings["dit_length"]
+
+        self.repetition_mode = settings["repetition_mode"]
+        self.new_indices = list(settings["new_indices"])
+        self.main_queue_length = settings["main_queue_length"]
+        self.time_to_guess_character = settings["time_to_guess_character"]
+        self.adaptive_time_to_guess = settings["adaptive_time_to_guess"]
+
+    def load_snapshot(self) -> dict | None:
+        return self.header_snapshot
+
+
+class Replayer:
+    """
+    Posts the recorded events to a ReplayTrainer from another thread, each
+    once the trainer has reached the same point in the game
+    """
+
+    def __init__(self, trainer: ReplayTrainer, events, fast: bool):
+        self.trainer = trainer
+        self.events = events
+        self.fast = fast
+
+        # Differences from the recording
+        self.differences: list[str] = []
+        self.answers = 0
+
+        self.thread = threading.Thread(target=self.run, name="replay", daemon=True)
+
+    def wait_until(self, condition):
+        """
+        Waits until a function of no arguments returns True
+        """
+        while not condition():
+            time.sleep(0.0005)
+
+    def waiting_for_answer(self) -> bool:
+        return not self.trainer.is_playing() and not self.trainer.need_new_character
+
+    def run(self):
+        trainer = self.trainer
+
+        # Characters the recording has played so far
+        played = 0
+        start_time = time.perf_counter()
+
+        for event in self.events:
+            event_time, kind, *data = event
+
+            if kind == "play":
+                played += 1
+
+                self.wait_until(lambda: trainer.characters_played >= played)
+                if trainer.correct_char != data[0]:
+                    self.differences.append(f"character {played}: played {trainer.correct_char}, recorded {data[0]}")
+
+            elif kind == "key":
+                key, seconds, correct, too_slow = data
+
+                self.wait_until(lambda: trainer.characters_played >= played and self.waiting_for_answer())
+
+                if not self.fast:
+                    time.sleep(seconds)
+
+                answers = len(trainer.reaction_times)
+                pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=0, unicode=key, reaction_seconds=seconds))
+
+                self.wait_until(lambda: len(trainer.reaction_times) > answers)
+                self.answers += 1
+
+                reaction = trainer.reaction_times.recent[-1]
+                if (reaction.correct, reaction.too_slow) != (correct, too_slow):
+                    self.differences.append(f"answer {self.answers}: scored {reaction.correct, reaction.too_slow}, "
+                                            f"recorded {correct, too_slow}")
+
+            elif kind in ("pause", "unpause", "quit"):
+                self.wait_until(lambda: trainer.characters_played >= played)
+
+                if not self.fast:
+                    time.sleep(max(0.0, event_time - (time.perf_counter() - start_time)))
+
+                if kind == "pause":
+                    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE, unicode="\x1b"))
+                    self.wait_until(trainer.box.paused.is_set)
+
+                elif kind == "unpause":
+                    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_ESCAPE, unicode="\x1b"))
+                    self.wait_until(lambda: not trainer.box.paused.is_set())
+
+                else:
+                    main.post_event(pygame.QUIT)
+                    return
+
+        # Recording ended without a quit, so the game was finished or crashed
+        main.post_event(pygame.QUIT)
+
+
+def replay(path: str, fast: bool) -> tuple[int, list[str]]:
+    """
+    Plays back a recording
+
+    :return: Number of answers replayed, and the differences from the
+        recording
+    """
+    header, events = recording.read_recording(path)
+
+    trainer = ReplayTrainer(header, fast)
+    replayer = Replayer(trainer, events, fast)
+
+    replayer.thread.start()
+
+    try:
+        trainer.start()
+    except SystemExit:
+        # The game quits when every character has been learned
+        pass
+
+    return replayer.answers, replayer.differences
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    answers, differences = replay(arguments.path, arguments.fast)
+    elapsed = time.perf_counter() - start
+
+    for difference in differences:
+        print(difference)
+
+    print(f"Replayed {answers} answers in {elapsed:.2f}s, {len(differences)} differences")
+    sys.exit(1 if differences else 0)
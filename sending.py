@@ -0,0 +1,424 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Sending practice. The box shows a character, and the player sends it with
+the spacebar as a straight key, or with a paddle on two keys: left Ctrl or
+comma for dits, right Ctrl or full stop for dahs, which is how most USB
+paddle adapters show up. Holding a paddle repeats its element, and holding
+both alternates them.
+
+The box lights up and a sidetone plays while the key is down. Each element
+is decoded by keyer.KeyingDecoder as soon as the key comes up, and each
+character once the gap after it is long enough, so the box flashes green or
+red while the player is still keying.
+
+A key event is handled as soon as the main loop wakes for it. The sidetone
+starts before anything is drawn, and drawing is never held back to a frame
+rate, so keying adds well under a frame of latency. pygame events have no
+time stamps, so the time the loop wakes is used for the key's time.
+
+Usage:
+    python sending.py --wpm 18
+    python sending.py --characters KMRSU --paddle-wpm 20
+    python sending.py --free
+"""
+
+
+import argparse
+import math
+import random
+import threading
+import time
+
+import numpy as np
+import pygame
+from pygame import locals
+
+import audio
+import fonts
+import main
+import progress
+
+from codec import morse
+from keyer import KeyingDecoder
+from playback import Job, PlaybackScheduler, Timeline
+
+# Posted by the paddle when its tone starts and stops
+paddle_key_event = pygame.event.custom_type()
+
+straight_keys = (locals.K_SPACE,)
+dit_keys = (locals.K_LCTRL, locals.K_COMMA)
+dah_keys = (locals.K_RCTRL, locals.K_PERIOD)
+
+
+class Sidetone:
+    """
+    Tone that plays for as long as the key is held. A short loop of the tone
+    is played over and over on a channel of its own, so it can start and
+    stop at any moment
+    """
+
+    # Length of the loop. Any length works, as it's a whole number of periods
+    loop_time = 0.1
+
+    # Fade in and out, to stop the tone clicking
+    ramp_ms = 3
+
+    def __init__(self, frequency: float, amplitude: float = audio.default_amplitude):
+        sample_rate = pygame.mixer.get_init()[0]
+
+        loop = audio.tone_bank.get_loop(frequency, sample_rate)
+        repeats = math.ceil(self.loop_time * sample_rate / loop.size)
+
+        self.sound = main.make_sound((np.tile(loop, repeats) * (amplitude * 32767)).astype(np.int16))
+
+        # Kept for the sidetone, so playing the morse for a mistake never
+        # takes it
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+
+    def start(self):
+        self.channel.play(self.sound, loops=-1, fade_ms=self.ramp_ms)
+
+    def stop(self):
+        self.channel.fadeout(self.ramp_ms)
+
+
+class Paddle:
+    """
+    Electronic keyer for a paddle. Sends dits and dahs of exactly the right
+    length, with a dit of silence after each, on the scheduler's thread.
+
+    Pressing a paddle while an element is being sent queues its element, so
+    quick presses aren't lost
+    """
+
+    def __init__(self, scheduler: PlaybackScheduler, dit_length: float, set_key):
+        """
+        :param set_key: Called with True when the tone should start, and
+            False when it should stop, on the scheduler's thread
+        """
+        self.scheduler = scheduler
+        self.dit_length = dit_length
+        self.set_key = set_key
+
+        # Indexed by dah. If each paddle is held, and if it has been pressed
+        # since its element was last sent
+        self.held = [False, False]
+        self.pressed = [False, False]
+
+        # Element being sent or just sent, None when idle
+        self.last: bool | None = None
+        self.lock = threading.Lock()
+
+    def press(self, dah: bool):
+        with self.lock:
+            self.held[dah] = True
+            self.pressed[dah] = True
+
+            if self.last is None:
+                self.send_next()
+
+    def release(self, dah: bool):
+        with self.lock:
+            self.held[dah] = False
+
+    def choose(self) -> bool | None:
+        """
+        Gets the next element to send. The other paddle goes first, so
+        holding both alternates
+        """
+        order = (False, True) if self.last is None else (not self.last, self.last)
+
+        for dah in order:
+            if self.held[dah] or self.pressed[dah]:
+                return dah
+
+        return None
+
+    def send_next(self):
+        """
+        Starts the next element, if a paddle wants one. Call with the lock
+        held
+        """
+        dah = self.choose()
+        self.last = dah
+
+        if dah is None:
+            return
+
+        self.pressed[dah] = False
+        length = self.dit_length * (3 if dah else 1)
+
+        timeline = Timeline()
+        timeline.call(self.set_key, True)
+        timeline.call_at(length, self.set_key, False)
+        timeline.call_at(length + self.dit_length, self.next_element)
+
+        self.scheduler.submit(timeline)
+
+    def next_element(self):
+        with self.lock:
+            self.send_next()
+
+
+class SendingPractice:
+    """
+    Window with the box, the elements of the character being sent, and the
+    characters sent so far
+    """
+
+    window_width = main.MorseTrainer.window_width
+    window_height = main.MorseTrainer.window_height
+
+    # Drawing is cheap and only happens when something changes, so it isn't
+    # held to a frame rate, which would hold up the next key event
+    frame_rate = 0
+
+    # Characters of sent text to show
+    max_characters = 30
+
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self, characters: list[str] | None, wpm: float, paddle_wpm: float):
+        """
+        :param characters: Characters to ask for, or None to just decode
+            whatever is sent
+        :param wpm: First guess at the player's speed
+        :param paddle_wpm: Speed the paddle sends at
+        """
+        pygame.display.init()
+        pygame.mixer.init(buffer=main.mixer_buffer)
+        pygame.font.init()
+
+        self.screen = pygame.display.set_mode(size=(self.window_width, self.window_height))
+        pygame.display.set_caption("Sending practice")
+
+        self.box = main.Box()
+        self.box.rect.center = self.screen.get_rect().center
+
+        font = fonts.load_font(main.font_name, 30)
+        center_x = self.screen.get_rect().centerx
+        bottom = self.window_height - main.MorseTrainer.paused_text_distance_from_bottom
+
+        self.sent_text = main.TextLine(font, center_x, bottom)
+        self.elements_text = main.TextLine(font, center_x, self.box.rect.bottom + 50)
+
+        self.renderer = main.Renderer(self.screen, self.frame_rate)
+        for sprite in (self.box, self.sent_text, self.elements_text):
+            self.renderer.add(sprite)
+
+        self.scheduler = PlaybackScheduler(clock=self.clock)
+        self.sidetone = Sidetone(main.Box.tone_frequency)
+        self.decoder = KeyingDecoder(wpm)
+        self.paddle = Paddle(self.scheduler, audio.wpm_to_dit_length(paddle_wpm), self.paddle_key)
+
+        self.characters = characters
+        self.rng = random.Random()
+        self.target: str | None = None
+
+        # Feedback being shown. Keying is ignored until it's done
+        self.feedback: Job | None = None
+
+        self.sent = ""
+        self.elements = ""
+
+        # Time the main loop woke for the latest events
+        self.events_time = self.clock()
+
+        # Seconds from waking for a key press to the sidetone starting
+        self.key_latencies: list[float] = []
+
+    def set_tone(self, on: bool):
+        """
+        Starts or stops the sidetone, and lights the box while it plays
+        """
+        if on:
+            self.sidetone.start()
+            self.box.set_inner_colour(self.box.inner_colour_morse)
+        else:
+            self.sidetone.stop()
+            self.box.set_inner_colour(self.box.inner_colour_normal)
+
+    def paddle_key(self, down: bool):
+        """
+        Keys the sidetone for the paddle, and hands the time to the main
+        loop, which does all the decoding
+        """
+        self.set_tone(down)
+
+        if pygame.display.get_init():
+            try:
+                pygame.event.post(pygame.event.Event(paddle_key_event, down=down, time=self.clock()))
+            except pygame.error:
+                pass
+
+    def next_target(self):
+        """
+        Picks a new character to send, and shows it in the box
+        """
+        if self.characters:
+            self.target = self.rng.choice(self.characters)
+            self.box.set_font(self.target)
+
+    def show_target(self):
+        self.box.set_font_colour(self.box.font_colour_normal)
+        self.box.set_font(self.target)
+
+    def is_giving_feedback(self) -> bool:
+        return self.feedback is not None and not self.feedback.is_finished()
+
+    def add_element(self, element: str):
+        self.elements += element
+        self.elements_text.set_text(self.elements)
+
+    def add_output(self, output: str):
+        """
+        Shows characters the decoder has finished, and marks them against the
+        character asked for
+        """
+        if not output:
+            return
+
+        self.sent = (self.sent + output)[-self.max_characters:]
+        self.sent_text.set_text(self.sent)
+
+        for character in output:
+            if character == " ":
+                continue
+
+            self.elements = ""
+            self.elements_text.set_text("")
+
+            if self.target is None or self.is_giving_feedback():
+                continue
+
+            if character == self.target:
+                self.feedback = self.scheduler.submit(self.box.correct_timeline(), self.next_target)
+            else:
+                self.feedback = self.scheduler.submit(self.box.error_timeline(self.target, False), self.show_target)
+
+    def handle_event(self, event: pygame.event.Event) -> bool:
+        """
+        :return: False if the window should close
+        """
+        if event.type == pygame.WINDOWEXPOSED:
+            self.renderer.redraw_all()
+
+        elif event.type == locals.QUIT:
+            return False
+
+        elif event.type == locals.KEYDOWN:
+            if event.key == locals.K_ESCAPE:
+                return False
+
+            if self.is_giving_feedback():
+                return True
+
+            if event.key in straight_keys:
+                self.set_tone(True)
+                self.key_latencies.append(self.clock() - self.events_time)
+                self.add_output(self.decoder.key_down(self.events_time))
+
+            elif event.key in dit_keys or event.key in dah_keys:
+                self.paddle.press(event.key in dah_keys)
+
+        # Always handled, so the tone never gets stuck on
+        elif event.type == locals.KEYUP:
+            if event.key in straight_keys:
+                self.set_tone(False)
+                self.add_element(self.decoder.key_up(self.events_time))
+
+            elif event.key in dit_keys or event.key in dah_keys:
+                self.paddle.release(event.key in dah_keys)
+
+        elif event.type == paddle_key_event:
+            if event.down:
+                self.add_output(self.decoder.key_down(event.time))
+            else:
+                self.add_element(self.decoder.key_up(event.time))
+
+        return True
+
+    def wait_for_events(self) -> list[pygame.event.Event]:
+        """
+        Waits for at least one event, or until the decoder has a character
+        or word to finish
+        """
+        deadline = self.decoder.next_deadline()
+
+        if deadline is None:
+            events = [pygame.event.wait()]
+        else:
+            timeout = max(0, math.ceil((deadline - self.clock()) * 1000))
+            events = [pygame.event.wait(timeout)]
+
+        self.events_time = self.clock()
+        events.extend(pygame.event.get())
+
+        return events
+
+    def start(self):
+        """
+        Runs until the window is closed or Esc is pressed
+        """
+        self.next_target()
+
+        running = True
+        while running:
+            self.renderer.draw()
+
+            for event in self.wait_for_events():
+                running = self.handle_event(event) and running
+
+            self.add_output(self.decoder.poll(self.clock()))
+
+        self.scheduler.stop()
+        self.sidetone.stop()
+        pygame.quit()
+
+
+def learned_characters() -> list[str]:
+    """
+    Gets the characters learned in the saved progress, or every character if
+    nothing's been learned yet
+    """
+    store = progress.ProgressStore()
+    snapshot = store.load_snapshot()
+    store.close()
+
+    learned = snapshot["learned_characters"] if snapshot else []
+    return learned or list(morse)
+
+
+def main_function():
+    wpm = audio.dit_length_to_wpm(main.Box.dit_length)
+
+    parser = argparse.ArgumentParser(description="Sending practice with a straight key or paddle")
+    parser.add_argument("--wpm", type=float, default=wpm, help="First guess at your sending speed")
+    parser.add_argument("--paddle-wpm", type=float, default=wpm, help="Speed the paddle sends at")
+    parser.add_argument("--characters", help="Characters to ask for. The ones learned so far if not given")
+    parser.add_argument("--free", action="store_true", help="Don't ask for characters, just decode what's sent")
+    args = parser.parse_args()
+
+    if args.free:
+        characters = None
+    elif args.characters:
+        characters = [character for character in args.characters.upper() if character in morse]
+    else:
+        characters = learned_characters()
+
+    practice = SendingPractice(characters, args.wpm, args.paddle_wpm)
+    practice.start()
+
+    print(f"Sent at about {practice.decoder.wpm:.0f} WPM")
+
+    if practice.key_latencies:
+        latencies = np.array(practice.key_latencies) * 1000
+        print(f"Key to sidetone: median {np.median(latencies):.2f}ms, worst {latencies.max():.2f}ms")
+
+
+if __name__ == "__main__":
+    main_function()
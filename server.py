@@ -0,0 +1,357 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Runs the training of many learners from one process, for a lab where each
+seat would otherwise run a trainer of its own. Seats connect with client.py
+over a Unix socket, or a TCP port on localhost, and both sides send JSON
+lines.
+
+The server keeps each learner's queues, with the same queue logic as the
+game, and saves everyone's progress to one database with one thread. It
+tells each seat what to play and if each answer was right. The seat plays
+the morse and the feedback, times the answer, and says when it's ready for
+the next character.
+
+The morse of each character is rendered once for each speed, tone and
+sample rate, and the same encoded message is sent to every seat that needs
+it, once each. Every seat is handled on one asyncio event loop, so a seat
+costs its connection and its queues, not a thread or caches of its own.
+
+Messages from a seat:
+    {"type": "hello", "learner": name, "wpm": wpm, "frequency": hz, "sample_rate": rate}
+    {"type": "ready"}                               Wants the next character
+    {"type": "key", "key": key, "seconds": seconds} An answer, timed from the end of the morse
+    {"type": "pause"}                               Counts as wrong, like pausing the game
+
+Messages to a seat:
+    {"type": "learned", "characters": [...]}        After hello, the characters learned so far
+    {"type": "sound", "character": c, "wpm": wpm, "frequency": hz, "sample_rate": rate,
+     "samples": base64 of little endian int16}      Before a character is first played
+    {"type": "play", "character": c}
+    {"type": "answer", "character": c, "correct": bool, "too_slow": bool, "learned": c or ""}
+    {"type": "finished"}                            Every character has been learned
+    {"type": "error", "message": text}
+
+Usage:
+    python server.py
+    python server.py --port 5050 --progress lab.db
+"""
+
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+
+import audio
+import progress
+
+from codec import morse
+from engine import ReactionStream, TrainerEngine
+
+default_socket_path = os.path.join(progress.data_directory(), "server.sock")
+default_progress_path = os.path.join(progress.data_directory(), "lab.db")
+
+# Connections waiting to be accepted. A whole lab reconnects at once when the
+# server restarts
+backlog = 1024
+
+# Longest line a reader needs to take, bytes. Sound messages are the longest,
+# a long character at a slow speed is a few hundred KB
+message_limit = 2 ** 22
+
+
+def encode(message: dict) -> bytes:
+    """
+    Encodes a message as one line
+    """
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+class SoundCache:
+    """
+    Sound messages for each character, ready to send. Shared by every seat,
+    so each is only rendered and encoded once
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.messages = audio.LRUCache(max_size)
+
+    def message(self, character: str, wpm: float, frequency: float, sample_rate: int) -> bytes:
+        def render() -> bytes:
+            samples = audio.render_sequence(morse[character], wpm, frequency, sample_rate)
+
+            return encode({"type": "sound",
+                           "character": character,
+                           "wpm": wpm,
+                           "frequency": frequency,
+                           "sample_rate": sample_rate,
+                           "samples": base64.b64encode(samples.astype("<i2").tobytes()).decode()})
+
+        return self.messages.get((character, wpm, frequency, sample_rate), render)
+
+
+class Seat(TrainerEngine):
+    """
+    One learner's training, driven by the messages from their seat
+    """
+
+    def __init__(self, learner: str, settings: dict, sounds: SoundCache, send,
+                 store: progress.SharedProgressStore | None):
+        """
+        :param learner: Name the learner's progress is saved under
+        :param settings: The hello message, with the speed, tone and sample
+            rate of the seat
+        :param send: Called with each encoded message for the seat
+        :param store: Where to save progress, or None to not save it
+        """
+        super().__init__()
+
+        self.learner = learner
+        self.sounds = sounds
+        self.send = send
+
+        self.wpm = float(settings["wpm"])
+        self.frequency = float(settings["frequency"])
+        self.sample_rate = int(settings["sample_rate"])
+
+        # Answers only go to the progress store, so none are kept here
+        self.reaction_times = ReactionStream(max_length=0)
+
+        self.progress = store.learner(learner) if store else None
+        if self.progress:
+            self.reaction_times.listen(self.progress.record)
+
+        # Characters the seat has the sound of
+        self.sounds_sent: set[str] = set()
+
+        # Character being asked, waiting for an answer, or an empty string
+        self.asking = ""
+
+    def start(self):
+        """
+        Resumes the learner's progress, or starts from the beginning
+        """
+        snapshot = self.progress.load_snapshot() if self.progress else None
+
+        if snapshot:
+            self.restore(snapshot)
+        else:
+            self.generate_character_queue()
+
+        self.send(encode({"type": "learned", "characters": list(self.learned_characters)}))
+
+    def save_progress(self):
+        if self.progress:
+            self.progress.save_snapshot(self.snapshot())
+
+    def handle(self, message: dict):
+        """
+        Handles a message from the seat
+
+        :raises KeyError: if the message is missing something
+        :raises ValueError: if the message isn't understood
+        """
+        kind = message["type"]
+
+        if kind == "ready":
+            self.ask()
+
+        elif kind == "key":
+            if not self.asking:
+                return
+
+            answer = self.answer(str(message["key"]), float(message["seconds"]))
+            self.save_progress()
+
+            self.send(encode({"type": "answer",
+                              "character": self.asking,
+                              "correct": answer.correct,
+                              "too_slow": answer.too_slow,
+                              "learned": answer.learned}))
+            self.asking = ""
+
+        elif kind == "pause":
+            if not self.asking:
+                return
+
+            self.update_queue(correct=False)
+            self.save_progress()
+            self.asking = ""
+
+        else:
+            raise ValueError(f"Unknown message type {kind!r}")
+
+    def ask(self):
+        """
+        Sends the next character to play, and its sound if the seat doesn't
+        have it
+        """
+        if self.asking:
+            return
+
+        if self.is_queue_empty():
+            if self.progress:
+                self.progress.clear_snapshot()
+
+            self.send(encode({"type": "finished"}))
+            return
+
+        self.asking = self.get_next_char()
+
+        if self.asking not in self.sounds_sent:
+            self.send(self.sounds.message(self.asking, self.wpm, self.frequency, self.sample_rate))
+            self.sounds_sent.add(self.asking)
+
+        self.send(encode({"type": "play", "character": self.asking}))
+
+
+class TrainerServer:
+    """
+    Accepts seats, and passes their messages to their Seat
+    """
+
+    # Settings a seat can ask for, both ends included. Sounds are rendered
+    # on the event loop every seat shares, so a very slow speed or high
+    # sample rate from one seat would hold up all the others
+    wpm_range = (5, 60)
+    sample_rate_range = (8000, 192000)
+    lowest_frequency = 100
+
+    def __init__(self, store: progress.SharedProgressStore | None = None):
+        self.store = store
+        self.sounds = SoundCache()
+
+        # Seats connected, by learner. A learner can only be at one seat
+        self.seats: dict[str, Seat] = {}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Runs a seat's connection until it closes
+        """
+        seat: Seat | None = None
+
+        try:
+            async for line in reader:
+                message = json.loads(line)
+
+                if not isinstance(message, dict):
+                    raise ValueError("Messages have to be JSON objects")
+
+                if seat is None:
+                    seat = self.open_seat(message, writer.write)
+                else:
+                    seat.handle(message)
+
+                # Stop reading from a seat that isn't reading what's sent
+                await writer.drain()
+
+        except (KeyError, ValueError, TypeError) as error:
+            writer.write(encode({"type": "error", "message": str(error)}))
+
+        except ConnectionError:
+            pass
+
+        finally:
+            if seat is not None:
+                del self.seats[seat.learner]
+                print(f"{seat.learner} left, {len(self.seats)} seats")
+
+            writer.close()
+
+    def open_seat(self, message: dict, send) -> Seat:
+        """
+        Starts a seat from its hello message
+
+        :raises ValueError: if it isn't a hello, the learner is already at
+            another seat, or a setting is out of range
+        """
+        if message.get("type") != "hello":
+            raise ValueError("Expected hello")
+
+        self.check_settings(message)
+
+        learner = str(message["learner"])
+        if learner in self.seats:
+            raise ValueError(f"{learner} is already connected")
+
+        seat = Seat(learner, message, self.sounds, send, self.store)
+        seat.start()
+
+        self.seats[learner] = seat
+        print(f"{learner} joined, {len(self.seats)} seats")
+
+        return seat
+
+    def check_settings(self, message: dict):
+        """
+        Checks the speed, tone and sample rate in a hello message can be
+        rendered
+
+        :raises ValueError: if one is out of range
+        """
+        wpm = float(message["wpm"])
+        frequency = float(message["frequency"])
+        sample_rate = int(message["sample_rate"])
+
+        # Written so NaN fails too
+        if not self.wpm_range[0] <= wpm <= self.wpm_range[1]:
+            raise ValueError(f"wpm has to be from {self.wpm_range[0]} to {self.wpm_range[1]}")
+
+        if not self.sample_rate_range[0] <= sample_rate <= self.sample_rate_range[1]:
+            raise ValueError(f"sample_rate has to be from {self.sample_rate_range[0]} "
+                             f"to {self.sample_rate_range[1]}")
+
+        if not self.lowest_frequency <= frequency < sample_rate / 2:
+            raise ValueError(f"frequency has to be at least {self.lowest_frequency}, "
+                             "and below half the sample rate")
+
+    async def serve(self, socket_path: str | None = default_socket_path, port: int | None = None):
+        """
+        Serves seats until cancelled
+
+        :param socket_path: Unix socket to listen on, if port isn't given
+        :param port: TCP port to listen on, on localhost only
+        """
+        if port is not None:
+            listener = await asyncio.start_server(self.handle_connection, "127.0.0.1", port, backlog=backlog)
+            print(f"Listening on 127.0.0.1:{port}")
+        else:
+            os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+
+            # Left behind by a server that didn't close
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+
+            listener = await asyncio.start_unix_server(self.handle_connection, socket_path, backlog=backlog)
+            print(f"Listening on {socket_path}")
+
+        async with listener:
+            await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train many learners from one process")
+    parser.add_argument("--socket", default=default_socket_path, help="Unix socket to listen on")
+    parser.add_argument("--port", type=int, help="Listen on this TCP port on localhost instead")
+    parser.add_argument("--progress", default=default_progress_path, help="Database to save everyone's progress in")
+    parser.add_argument("--no-progress", action="store_true", help="Don't save progress")
+    args = parser.parse_args()
+
+    store = None if args.no_progress else progress.SharedProgressStore(args.progress)
+    server = TrainerServer(store)
+
+    try:
+        asyncio.run(server.serve(args.socket, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
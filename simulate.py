@@ -0,0 +1,467 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Runs training sessions with simulated learners instead of people, on a
+virtual clock, so that thousands of sessions finish in seconds. Used to
+tune TrainerEngine.new_indices and TrainerEngine.main_queue_length.
+
+Usage:
+    python simulate.py --sessions 10000 --new-indices 3 4 6 8 --main-queue-length 8
+    python simulate.py --sessions 100000 --vectorised
+"""
+
+
+import argparse
+import math
+import os
+import random
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import numpy as np
+
+import repetition
+import stats
+
+from codec import code_length, morse, morse_length
+from engine import TrainerEngine, VirtualClock
+
+# Lengths of the feedback played by the box. These match Box.morse_timeline,
+# Box.correct_timeline and Box.error_timeline
+dit_length = 0.08
+correct_feedback_time = 1.5
+error_feedback_time = 2 + 1 + 1
+
+
+class LearnerModel:
+    """
+    Simulated learner. Every character starts unknown, and the learner gets
+    more likely to answer it right, and quicker, each time they're shown it.
+
+    Override correct_probability or latency for other models
+    """
+
+    def __init__(self,
+                 rng: random.Random,
+                 learning_rate: float = 0.35,
+                 best_accuracy: float = 0.97,
+                 fastest_latency: float = 0.35,
+                 slowest_latency: float = 2.0,
+                 latency_spread: float = 0.25):
+        """
+        :param rng: Random number generator for this learner
+        :param learning_rate: How quickly a character is learned from each
+            time it's shown
+        :param best_accuracy: Chance of a right answer for a character that's
+            fully learned
+        :param fastest_latency: Reaction time in seconds for a character
+            that's fully learned
+        :param slowest_latency: Reaction time in seconds for a character that
+            has never been seen
+        :param latency_spread: Standard deviation of the log of the reaction
+            time
+        """
+        self.random = rng
+        self.learning_rate = learning_rate
+        self.best_accuracy = best_accuracy
+        self.fastest_latency = fastest_latency
+        self.slowest_latency = slowest_latency
+        self.latency_spread = latency_spread
+
+        # Number of times each character has been shown
+        self.exposures: dict[str, int] = {}
+
+    def familiarity(self, character: str) -> float:
+        """
+        How well the character is known, from 0 to 1
+        """
+        return 1 - math.exp(-self.learning_rate * self.exposures.get(character, 0))
+
+    def correct_probability(self, character: str) -> float:
+        """
+        Chance of answering the character right
+        """
+        return self.best_accuracy * self.familiarity(character)
+
+    def latency(self, character: str) -> float:
+        """
+        Seconds taken to answer the character
+        """
+        unfamiliarity = 1 - self.familiarity(character)
+        typical = self.fastest_latency + (self.slowest_latency - self.fastest_latency) * unfamiliarity
+
+        return typical * self.random.lognormvariate(0, self.latency_spread)
+
+    def respond(self, character: str) -> tuple[str, float]:
+        """
+        Answers a character that has just been played
+
+        :return: Key pressed and seconds taken to press it
+        """
+        latency = self.latency(character)
+
+        if self.random.random() < self.correct_probability(character):
+            key = character
+        else:
+            key = self.random.choice(self.wrong_keys(character))
+
+        return key, latency
+
+    def wrong_keys(self, character: str) -> list[str]:
+        """
+        Keys that may be pressed by mistake
+        """
+        return [c for c in morse if c != character]
+
+    def shown(self, character: str):
+        """
+        Called when the correct character is shown or played again as
+        feedback, which is when the learner learns from it
+        """
+        self.exposures[character] = self.exposures.get(character, 0) + 1
+
+
+@dataclass
+class SessionParameters:
+    """
+    Settings for a simulated session
+    """
+    new_indices: list[int] = field(default_factory=lambda: list(TrainerEngine.new_indices))
+    main_queue_length: int = TrainerEngine.main_queue_length
+    time_to_guess_character: float = TrainerEngine.time_to_guess_character
+    repetition_mode: str = TrainerEngine.repetition_mode
+    adaptive_time_to_guess: bool = TrainerEngine.adaptive_time_to_guess
+
+    # Passed to LearnerModel
+    learner: dict = field(default_factory=dict)
+
+    # Give up on sessions that take longer than this
+    max_attempts: int = 100_000
+
+
+@dataclass
+class SessionResult:
+    """
+    What happened in a simulated session
+    """
+    seed: int
+    attempts: int
+    correct: int
+    # Simulated time, in seconds, that the session would take for real
+    duration: float
+    finished: bool
+
+
+def make_engine(parameters: SessionParameters, clock, rng: random.Random) -> TrainerEngine:
+    """
+    Creates an engine using the parameters instead of the class defaults
+    """
+    engine = TrainerEngine(clock=clock, rng=rng)
+    engine.new_indices = list(parameters.new_indices)
+    engine.main_queue_length = parameters.main_queue_length
+    engine.time_to_guess_character = parameters.time_to_guess_character
+    engine.repetition_mode = parameters.repetition_mode
+
+    if parameters.adaptive_time_to_guess:
+        engine.adaptive_time_to_guess = True
+        stats.track(engine)
+
+    return engine
+
+
+def run_session(parameters: SessionParameters, seed: int) -> SessionResult:
+    """
+    Runs one session until every character is learned
+
+    :param parameters: Trainer and learner settings
+    :param seed: Seed for the trainer and learner random numbers
+    """
+    rng = random.Random(seed)
+    clock = VirtualClock()
+    engine = make_engine(parameters, clock, rng)
+    learner = LearnerModel(rng, **parameters.learner)
+
+    engine.generate_character_queue()
+
+    attempts = 0
+    correct = 0
+
+    while not engine.is_queue_empty() and attempts < parameters.max_attempts:
+        character = engine.get_next_char()
+
+        clock.advance(morse_length(character) * dit_length + dit_length)
+        stopped_playing_time = clock()
+
+        key, latency = learner.respond(character)
+        clock.advance(latency)
+
+        answer = engine.answer(key, clock() - stopped_playing_time)
+        attempts += 1
+
+        if answer.correct and not answer.too_slow:
+            correct += 1
+            clock.advance(correct_feedback_time)
+        else:
+            clock.advance(error_feedback_time + morse_length(character) * dit_length + dit_length)
+
+        learner.shown(character)
+
+    return SessionResult(seed, attempts, correct, clock(), engine.is_queue_empty())
+
+
+def run_sessions(parameters: SessionParameters, seeds: range) -> list[SessionResult]:
+    """
+    Runs a session for each seed. Used as the unit of work for each process
+    """
+    return [run_session(parameters, seed) for seed in seeds]
+
+
+def can_vectorise(parameters: SessionParameters) -> bool:
+    """
+    If run_sessions_vectorised can run sessions with these parameters
+    """
+    return parameters.repetition_mode == "fixed" and not parameters.adaptive_time_to_guess
+
+
+def run_sessions_vectorised(parameters: SessionParameters, seeds: range) -> list[SessionResult]:
+    """
+    Runs a session for each seed, all at once with numpy, one answer of
+    every session per step. Tens of times quicker than run_sessions, for the
+    fixed queue and the default LearnerModel only.
+
+    The queue works like FixedSlotQueue: each session's heap is a row of
+    sorted keys, packed from the due time, the order and the character, and
+    an answered character is put back where its key sorts. Results follow
+    the same distribution as run_session, but the random numbers come from
+    numpy, so not the same numbers for the same seed. The whole batch is
+    seeded from the seeds given
+
+    :raises ValueError: if the parameters can't be vectorised
+    """
+    if not can_vectorise(parameters):
+        raise ValueError("Only the fixed queue without adaptive_time_to_guess can be vectorised")
+
+    learner = LearnerModel(random.Random(), **parameters.learner)
+    rng = np.random.default_rng([seeds.start, len(seeds)])
+
+    alphabet = TrainerEngine.alphabet
+    characters = list(alphabet)
+    new_indices = np.array(parameters.new_indices, dtype=np.int64)
+    queue_length = parameters.main_queue_length
+
+    # Characters in the order generate_character_queue puts them, in groups
+    # that are each shuffled
+    groups: dict[tuple[bool, int], list[int]] = {}
+    for item, character in enumerate(characters):
+        if character.isalpha() or character.isdigit():
+            groups.setdefault((character.isdigit(), code_length(alphabet[character])), []).append(item)
+
+    sessions = len(seeds)
+    back = np.concatenate([np.array(items)[np.argsort(rng.random((sessions, len(items))), axis=1)]
+                           for _, items in sorted(groups.items())], axis=1)
+    back_length = np.full(sessions, back.shape[1])
+    back_columns = np.arange(back.shape[1])
+
+    play_times = np.array([morse_length(character) * dit_length + dit_length for character in characters])
+    error_times = error_feedback_time + play_times
+
+    # Keys sort by due time, then order. Empty slots are at the end
+    empty = np.iinfo(np.int64).max
+    keys = np.full((sessions, queue_length), empty)
+    queued = np.zeros(sessions, dtype=np.int64)
+    columns = np.arange(queue_length)
+
+    streaks = np.zeros((sessions, len(characters)), dtype=np.int64)
+    exposures = np.zeros((sessions, len(characters)), dtype=np.int64)
+    step = np.zeros(sessions, dtype=np.int64)
+    last_due = np.zeros(sessions, dtype=np.int64)
+    order = np.zeros(sessions, dtype=np.int64)
+
+    now = np.zeros(sessions)
+    attempts = np.zeros(sessions, dtype=np.int64)
+    correct = np.zeros(sessions, dtype=np.int64)
+    session_seeds = np.array(seeds)
+
+    results: list[SessionResult] = []
+
+    def pack(due, order, item):
+        return (due << 40) | ((order + 2 ** 31) << 8) | item
+
+    while session_seeds.size:
+        rows = np.arange(session_seeds.size)
+
+        # Fill the main queue from the first 3 of the back queue, like
+        # add_character_to_main_queue. New characters always go at the end
+        adding = rows[(queued < queue_length) & (back_length > 0)]
+        while adding.size:
+            pick = (rng.random(adding.size) * np.minimum(3, back_length[adding])).astype(np.int64)
+            item = back[adding, pick]
+
+            shifted = np.concatenate([back[adding, 1:], back[adding, -1:]], axis=1)
+            back[adding] = np.where(back_columns < pick[:, None], back[adding], shifted)
+            back_length[adding] -= 1
+
+            due = np.maximum(last_due[adding] + 1, step[adding] + 1)
+            last_due[adding] = due
+            keys[adding, queued[adding]] = pack(due, order[adding], item)
+            order[adding] += 1
+            queued[adding] += 1
+
+            adding = adding[(queued[adding] < queue_length) & (back_length[adding] > 0)]
+
+        # The learner answers the character at the front
+        item = keys[:, 0] & 0xFF
+        familiarity = 1 - np.exp(-learner.learning_rate * exposures[rows, item])
+        latency = ((learner.fastest_latency + (learner.slowest_latency - learner.fastest_latency) * (1 - familiarity))
+                   * np.exp(learner.latency_spread * rng.standard_normal(rows.size)))
+        right = ((rng.random(rows.size) < learner.best_accuracy * familiarity)
+                 & ~(parameters.time_to_guess_character < latency))
+
+        now += play_times[item] + latency + np.where(right, correct_feedback_time, error_times[item])
+        attempts += 1
+        correct += right
+        exposures[rows, item] += 1
+
+        # Take it off the front, and put it back in its slot unless learned
+        keys[:, :-1] = keys[:, 1:]
+        keys[:, -1] = empty
+        queued -= 1
+        step += 1
+
+        streak = np.where(right, streaks[rows, item] + 1, 0)
+        streaks[rows, item] = streak
+
+        again = rows[streak < new_indices.size]
+        if again.size:
+            due = step[again] + new_indices[streak[again]] + 1
+            last_due[again] = np.maximum(last_due[again], due)
+            key = pack(due, -order[again], item[again])
+            order[again] += 1
+
+            old = keys[again]
+            position = (old < key[:, None]).sum(axis=1)[:, None]
+            shifted = np.concatenate([old[:, :1], old[:, :-1]], axis=1)
+            keys[again] = np.where(columns < position, old, np.where(columns == position, key[:, None], shifted))
+            queued[again] += 1
+
+        # Put aside finished sessions
+        finished = (queued == 0) & (back_length == 0)
+        done = finished | (attempts >= parameters.max_attempts)
+
+        if done.any():
+            results.extend(SessionResult(int(seed), int(attempt_count), int(correct_count), float(duration), bool(end))
+                           for seed, attempt_count, correct_count, duration, end
+                           in zip(session_seeds[done], attempts[done], correct[done], now[done], finished[done]))
+
+            keep = ~done
+            back, back_length, keys, queued = back[keep], back_length[keep], keys[keep], queued[keep]
+            streaks, exposures, step, last_due, order = streaks[keep], exposures[keep], step[keep], last_due[keep], order[keep]
+            now, attempts, correct, session_seeds = now[keep], attempts[keep], correct[keep], session_seeds[keep]
+
+    results.sort(key=lambda result: result.seed)
+
+    return results
+
+
+def run_batch(parameters: SessionParameters,
+              sessions: int,
+              processes: int | None = None,
+              first_seed: int = 0,
+              chunk_size: int | None = None,
+              vectorised: bool = False) -> tuple[list[SessionResult], float]:
+    """
+    Runs many sessions across a pool of processes
+
+    :param parameters: Trainer and learner settings, the same for each session
+    :param sessions: Number of sessions to run
+    :param processes: Number of processes. Defaults to the number of CPUs.
+        1 runs everything in this process
+    :param first_seed: Seed of the first session. The others follow on
+    :param chunk_size: Sessions sent to a process at a time. Defaults to 250,
+        or 1000 vectorised, where bigger chunks run quicker
+    :param vectorised: Use run_sessions_vectorised. Each chunk is seeded as a
+        whole, so the results depend on the chunk size
+    :return: Results in seed order, and sessions per second
+    """
+    run = run_sessions_vectorised if vectorised else run_sessions
+    chunk_size = chunk_size or (1000 if vectorised else 250)
+
+    seeds = range(first_seed, first_seed + sessions)
+    chunks = [seeds[i:i + chunk_size] for i in range(0, sessions, chunk_size)]
+
+    start = time.perf_counter()
+
+    if processes == 1:
+        results = [result for chunk in chunks for result in run(parameters, chunk)]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = []
+            for chunk_results in pool.map(run, [parameters] * len(chunks), chunks):
+                results.extend(chunk_results)
+
+    elapsed = time.perf_counter() - start
+
+    return results, sessions / elapsed if elapsed else math.inf
+
+
+def summarise(results: list[SessionResult]) -> dict:
+    """
+    Averages a batch of results
+    """
+    finished = [result for result in results if result.finished]
+    count = len(finished) or 1
+
+    return {
+        "sessions": len(results),
+        "finished": len(finished),
+        "mean_attempts": sum(result.attempts for result in finished) / count,
+        "mean_accuracy": sum(result.correct / result.attempts for result in finished) / count,
+        "mean_duration_minutes": sum(result.duration for result in finished) / count / 60,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run training sessions with simulated learners")
+    parser.add_argument("--sessions", type=int, default=10_000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the first session")
+    parser.add_argument("--new-indices", type=int, nargs="+", default=TrainerEngine.new_indices)
+    parser.add_argument("--main-queue-length", type=int, default=TrainerEngine.main_queue_length)
+    parser.add_argument("--time-to-guess", type=float, default=TrainerEngine.time_to_guess_character)
+    parser.add_argument("--mode", choices=["fixed", *repetition.modes], default=TrainerEngine.repetition_mode,
+                        help="How characters are spaced out in the main queue")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Give each character its own time to guess, from how quickly it's answered")
+    parser.add_argument("--learning-rate", type=float, default=0.35)
+    parser.add_argument("--accuracy", type=float, default=0.97,
+                        help="Chance a learned character is answered right")
+    parser.add_argument("--vectorised", action="store_true",
+                        help="Run sessions together with numpy, much quicker. Fixed mode only, and not adaptive")
+    args = parser.parse_args()
+
+    parameters = SessionParameters(new_indices=args.new_indices,
+                                   main_queue_length=args.main_queue_length,
+                                   time_to_guess_character=args.time_to_guess,
+                                   repetition_mode=args.mode,
+                                   adaptive_time_to_guess=args.adaptive,
+                                   learner={"learning_rate": args.learning_rate,
+                                            "best_accuracy": args.accuracy})
+
+    if args.vectorised and not can_vectorise(parameters):
+        parser.error("--vectorised only works in fixed mode, without --adaptive")
+
+    results, sessions_per_second = run_batch(parameters, args.sessions, args.processes, args.seed,
+                                             vectorised=args.vectorised)
+
+    for name, value in summarise(results).items():
+        print(f"{name:>22}: {value:.3f}" if isinstance(value, float) else f"{name:>22}: {value}")
+
+    print(f"{'sessions_per_second':>22}: {sessions_per_second:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Per character statistics of the player's answers: how many were right,
+which keys were pressed instead, and how quickly they were pressed.
+
+Everything is kept in fixed size numpy arrays, so memory doesn't grow with
+the number of answers. Reaction time quantiles come from a histogram with
+logarithmically spaced bins, which gives every quantile to within a small
+relative error however many times have been added.
+
+Usage, to print the statistics of the saved progress:
+    python stats.py
+"""
+
+
+import argparse
+import math
+
+import numpy as np
+
+import progress
+
+from codec import morse
+from engine import Reaction, TrainerEngine
+
+
+class QuantileSketch:
+    """
+    Streaming quantiles for several rows of values at once, one row per
+    character. Each row is a histogram over logarithmically spaced bins, so
+    a value is stored in O(1) time and memory is fixed by the range and
+    accuracy.
+
+    With decay below 1, older values count for less each time a new value is
+    added to the same row, so the quantiles follow recent values
+    """
+
+    def __init__(self,
+                 rows: int,
+                 relative_error: float = 0.02,
+                 lowest: float = 0.01,
+                 highest: float = 30.0,
+                 decay: float = 1.0):
+        """
+        :param rows: Number of separate rows of values
+        :param relative_error: Most that a quantile can be out by, as a
+            fraction of its value
+        :param lowest: Values below this are counted as this
+        :param highest: Values above this are counted as this
+        :param decay: Weight kept by the older values in a row each time one
+            is added to it
+        """
+        self.lowest = lowest
+        self.decay = decay
+
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self.log_gamma = math.log(self.gamma)
+        self.bins = int(math.ceil(math.log(highest / lowest) / self.log_gamma)) + 1
+
+        # Upper edge of each bin. Quantiles are given as the middle of a bin
+        edges = lowest * self.gamma ** np.arange(1, self.bins + 1)
+        self.values = edges * 2 / (1 + self.gamma)
+
+        self.counts = np.zeros((rows, self.bins), dtype=np.float64)
+
+    def bin_of(self, values):
+        """
+        Gets the bin index of each value
+        """
+        values = np.maximum(np.asarray(values, dtype=np.float64), self.lowest)
+        bins = np.floor(np.log(values / self.lowest) / self.log_gamma)
+
+        return np.minimum(bins, self.bins - 1).astype(np.intp)
+
+    def add(self, row: int, value: float):
+        """
+        Adds one value to a row
+        """
+        if self.decay != 1:
+            self.counts[row] *= self.decay
+
+        # The same as bin_of, but much quicker for a single value
+        index = int(math.log(max(value, self.lowest) / self.lowest) / self.log_gamma)
+        self.counts[row, min(index, self.bins - 1)] += 1
+
+    def add_many(self, rows: np.ndarray, values: np.ndarray):
+        """
+        Adds many values at once, in the order given. Gives the same counts as
+        calling add for each
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        bins = self.bin_of(values)
+
+        if self.decay == 1:
+            np.add.at(self.counts, (rows, bins), 1)
+            return
+
+        # Each value is decayed once for every later value in the same row
+        per_row = np.bincount(rows, minlength=self.counts.shape[0])
+
+        order = np.argsort(rows, kind="stable")
+        group_starts = np.cumsum(per_row) - per_row
+        position = np.empty_like(rows)
+        position[order] = np.arange(rows.size) - group_starts[rows[order]]
+        later = per_row[rows] - position - 1
+
+        self.counts *= (self.decay ** per_row)[:, np.newaxis]
+        np.add.at(self.counts, (rows, bins), self.decay ** later)
+
+    def total(self, row: int | None = None) -> float:
+        """
+        Weight of the values in a row, or in every row if row is None
+        """
+        return float(self.counts.sum() if row is None else self.counts[row].sum())
+
+    def quantiles(self, row: int | None, qs) -> np.ndarray:
+        """
+        Gets quantiles of a row, or of every row together if row is None
+
+        :param qs: Quantiles wanted, between 0 and 1
+        :return: Value of each quantile, NaN if the row is empty
+        """
+        counts = self.counts.sum(axis=0) if row is None else self.counts[row]
+        cumulative = np.cumsum(counts)
+
+        qs = np.asarray(qs, dtype=np.float64)
+        if cumulative[-1] == 0:
+            return np.full(qs.shape, np.nan)
+
+        bins = np.searchsorted(cumulative, qs * cumulative[-1], side="left")
+        return self.values[np.minimum(bins, self.bins - 1)]
+
+
+class CharacterStatistics:
+    """
+    Counts, confusion matrix and reaction time quantiles for each character.
+    add() can be given to ReactionStream.listen
+    """
+
+    # Quantiles given by report()
+    report_quantiles = (0.5, 0.9, 0.99)
+
+    def __init__(self, characters: list[str], recent_decay: float = 0.9):
+        """
+        :param characters: Characters being asked
+        :param recent_decay: Decay of the recent reaction times used by
+            time_to_guess. 0.9 makes the last 10 or so right answers count most
+        """
+        self.characters = list(characters)
+        self.index = {character: i for i, character in enumerate(self.characters)}
+
+        count = len(self.characters)
+
+        self.attempts = np.zeros(count, dtype=np.int64)
+        self.correct = np.zeros(count, dtype=np.int64)
+        self.too_slow = np.zeros(count, dtype=np.int64)
+
+        # Rows are the character asked, columns the key pressed. The last
+        # column is any key that isn't one of the characters
+        self.confusion = np.zeros((count, count + 1), dtype=np.int64)
+        self.other_key = count
+
+        # Reaction times of every answer, and of recent right answers
+        self.latency = QuantileSketch(count)
+        self.recent_latency = QuantileSketch(count, decay=recent_decay)
+
+    @classmethod
+    def from_attempts(cls, attempts: list[tuple], characters: list[str] | None = None) -> "CharacterStatistics":
+        """
+        Builds statistics from an attempt log, like ProgressStore.attempts()
+        """
+        statistics = cls(characters if characters else list(morse))
+
+        if attempts:
+            _, asked, keys, seconds, correct, too_slow = zip(*attempts)
+            statistics.add_many(asked, keys, seconds, correct, too_slow)
+
+        return statistics
+
+    def key_index(self, key: str) -> int:
+        """
+        Gets the confusion matrix column of a key
+        """
+        return self.index.get(key.upper(), self.other_key)
+
+    def add(self, reaction: Reaction):
+        """
+        Adds one answer. Answers to characters that aren't being tracked are
+        ignored
+        """
+        row = self.index.get(reaction.character)
+        if row is None:
+            return
+
+        self.attempts[row] += 1
+        self.correct[row] += reaction.correct
+        self.too_slow[row] += reaction.correct and reaction.too_slow
+        self.confusion[row, self.key_index(reaction.key)] += 1
+
+        self.latency.add(row, reaction.seconds)
+        if reaction.correct:
+            self.recent_latency.add(row, reaction.seconds)
+
+    def add_many(self, characters, keys, seconds, correct, too_slow):
+        """
+        Adds many answers at once, in the order given. Each argument has one
+        item per answer, like the fields of Reaction
+        """
+        rows = np.array([self.index.get(character, -1) for character in characters], dtype=np.intp)
+        columns = np.array([self.key_index(key) for key in keys], dtype=np.intp)
+        seconds = np.asarray(seconds, dtype=np.float64)
+        correct = np.asarray(correct, dtype=bool)
+        too_slow = np.asarray(too_slow, dtype=bool)
+
+        known = rows >= 0
+        rows, columns, seconds, correct, too_slow = rows[known], columns[known], seconds[known], correct[known], too_slow[known]
+
+        count = len(self.characters)
+        self.attempts += np.bincount(rows, minlength=count)
+        self.correct += np.bincount(rows[correct], minlength=count)
+        self.too_slow += np.bincount(rows[correct & too_slow], minlength=count)
+        np.add.at(self.confusion, (rows, columns), 1)
+
+        self.latency.add_many(rows, seconds)
+        self.recent_latency.add_many(rows[correct], seconds[correct])
+
+    def row(self, character: str | None) -> int | None:
+        """
+        Gets the row of a character, or None for every character together
+
+        :raises KeyError: if the character isn't tracked
+        """
+        return None if character is None else self.index[character]
+
+    def accuracy(self, character: str | None = None) -> float:
+        """
+        Fraction of answers that were the right key and in time, NaN if
+        there aren't any
+        """
+        row = self.row(character)
+
+        attempts = self.attempts.sum() if row is None else self.attempts[row]
+        in_time = (self.correct - self.too_slow).sum() if row is None else self.correct[row] - self.too_slow[row]
+
+        return float(in_time / attempts) if attempts else math.nan
+
+    def quantiles(self, character: str | None = None, qs=report_quantiles) -> np.ndarray:
+        """
+        Reaction time quantiles in seconds, of every answer to a character
+        or to every character if None
+        """
+        return self.latency.quantiles(self.row(character), qs)
+
+    def confusions(self, character: str, count: int = 3) -> list[tuple[str, int]]:
+        """
+        Keys most often pressed by mistake for a character, as (key, times).
+        "?" stands for keys that aren't characters
+        """
+        row = self.confusion[self.index[character]].copy()
+        row[self.index[character]] = 0
+
+        keys = self.characters + ["?"]
+        most = np.argsort(row, kind="stable")[::-1][:count]
+
+        return [(keys[column], int(row[column])) for column in most if row[column]]
+
+    def time_to_guess(self,
+                      character: str,
+                      default: float,
+                      quantile: float = 0.9,
+                      margin: float = 1.2,
+                      minimum: float = 0.3,
+                      min_samples: int = 5) -> float:
+        """
+        Time limit for a character, from how quickly it has been answered
+        right recently. The limit shrinks as the player gets quicker, so they
+        keep being pushed to answer faster, but never goes above default
+
+        :param default: Limit when there aren't enough right answers yet
+        :param quantile: Recent reaction time quantile the limit is based on
+        :param margin: Limit as a multiple of that quantile
+        :param minimum: Shortest limit given
+        :param min_samples: Right answers needed before the limit adapts
+        """
+        row = self.index.get(character)
+        if row is None or self.correct[row] < min_samples:
+            return default
+
+        recent = float(self.recent_latency.quantiles(row, [quantile])[0])
+
+        return min(default, max(minimum, recent * margin))
+
+    def report(self) -> list[dict]:
+        """
+        Statistics for each character that has been asked, as a list of dicts
+        """
+        rows = []
+
+        for character in self.characters:
+            row = self.index[character]
+            if not self.attempts[row]:
+                continue
+
+            quantiles = self.quantiles(character)
+
+            rows.append({
+                "character": character,
+                "attempts": int(self.attempts[row]),
+                "accuracy": self.accuracy(character),
+                **{f"p{round(q * 100)}": float(value) for q, value in zip(self.report_quantiles, quantiles)},
+                "confused_with": self.confusions(character),
+            })
+
+        return rows
+
+
+def track(engine: TrainerEngine) -> CharacterStatistics:
+    """
+    Starts keeping statistics of an engine's answers, in engine.statistics
+    """
+    if engine.statistics is None:
+        engine.statistics = CharacterStatistics(list(morse))
+        engine.reaction_times.listen(engine.statistics.add)
+
+    return engine.statistics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print statistics of the saved progress")
+    parser.add_argument("--path", default=progress.default_path, help="Progress database")
+    args = parser.parse_args()
+
+    store = progress.ProgressStore(args.path)
+    statistics = CharacterStatistics.from_attempts(store.attempts())
+    store.close()
+
+    print(f"{'char':>4} {'tries':>6} {'acc':>6} {'p50':>6} {'p90':>6} {'p99':>6}  confused with")
+
+    for row in statistics.report():
+        confused = " ".join(f"{key}x{times}" for key, times in row["confused_with"])
+        print(f"{row['character']:>4} {row['attempts']:>6} {row['accuracy']:>6.1%} "
+              f"{row['p50']:>6.2f} {row['p90']:>6.2f} {row['p99']:>6.2f}  {confused}")
+
+    overall = statistics.quantiles()
+    print(f"{'all':>4} {int(statistics.attempts.sum()):>6} {statistics.accuracy():>6.1%} "
+          f"{overall[0]:>6.2f} {overall[1]:>6.2f} {overall[2]:>6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,742 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Runs the trainer in a terminal with curses, so it can be used over SSH and
+on machines without a display. The queues, scoring and progress are the
+same as main.py's, from TrainerEngine, and the box and the letters learned
+play the same timelines, from feedback.py, drawn as text.
+
+Pygame is never imported, so this starts in a fraction of the time main.py
+takes, and only needs numpy.
+
+Morse is rendered with audio.py and written as raw PCM to the standard input
+of a player, aplay by default. With no sound card, or with --wav, the
+session is written to a WAV file instead, with the gaps between the sounds
+kept, to listen to afterwards.
+
+Letters and numbers answer, Esc pauses, and q quits while paused.
+
+Usage:
+    python terminal.py
+    python terminal.py --wav session.wav
+    python terminal.py --player "pacat --raw --rate={rate} --channels=1 --format=s16le"
+"""
+
+
+import time
+
+# Start of the startup time
+import_start_time = time.perf_counter()
+
+import argparse
+import curses
+import glob
+import os
+import queue
+import random
+import select
+import shlex
+import shutil
+import subprocess
+import sys
+import threading
+import wave
+
+import numpy as np
+
+import audio
+import progress
+import stats
+
+from codec import morse
+from engine import TrainerEngine
+from feedback import BoxFeedback, BoxState, ScorecardFeedback
+from playback import Job, PlaybackScheduler, Timeline
+
+default_wav_path = "morse-session.wav"
+
+# Raw signed 16-bit mono from standard input, with a short buffer so the end
+# of the sound is close to when it was written
+aplay_command = "aplay -q -t raw -f S16_LE -c 1 -r {rate} --buffer-time=50000"
+aplay_latency = 0.05
+
+
+def has_sound_card() -> bool:
+    """
+    Returns if aplay is installed and there's an ALSA playback device, or a
+    PulseAudio server it can play through
+    """
+    if not shutil.which("aplay"):
+        return False
+
+    return bool(glob.glob("/dev/snd/pcmC*p")) or "PULSE_SERVER" in os.environ
+
+
+class Sound:
+    """
+    Rendered morse of one character, played through a sink
+    """
+
+    def __init__(self, samples: np.ndarray, sink, sample_rate: int):
+        self.samples = samples
+        self.sink = sink
+        self.length = len(samples) / sample_rate
+
+    def play(self):
+        self.sink.play(self.samples)
+
+    def stop(self):
+        self.sink.stop()
+
+
+class PipeSink:
+    """
+    Plays sounds by writing raw PCM to the standard input of a player.
+
+    Sounds are written on a thread of their own, a little at a time and only
+    a little ahead of when they play, so stop() cuts a sound short almost
+    straight away
+    """
+
+    # Seconds of sound written at a time
+    chunk_time = 0.02
+
+    # Most seconds of sound to have written ahead of it playing
+    lead_time = 0.1
+
+    def __init__(self, command: list[str], sample_rate: int, latency: float = 0.0):
+        """
+        :param command: Player to run. Reads signed 16-bit mono at sample_rate
+            from its standard input
+        :param latency: Seconds from writing a sample to it being heard
+        """
+        self.sample_rate = sample_rate
+        self.latency = latency
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+        # (number of stops when played, samples). Sounds played before the
+        # latest stop are dropped
+        self.sounds: queue.Queue[tuple[int, np.ndarray] | None] = queue.Queue()
+        self.stops = 0
+
+        self.thread = threading.Thread(target=self.write_sounds, name="player", daemon=True)
+        self.thread.start()
+
+    def describe(self) -> str:
+        return f"Playing with {self.process.args[0]}"
+
+    def play(self, samples: np.ndarray):
+        self.sounds.put((self.stops, samples))
+
+    def stop(self):
+        """
+        Stops the sound playing, and any waiting to play
+        """
+        self.stops += 1
+
+    def write_sounds(self):
+        """
+        Thread that writes each sound to the player as it comes
+        """
+        chunk_length = int(self.chunk_time * self.sample_rate)
+
+        # Time the sound written so far finishes playing
+        written_until = 0.0
+
+        while True:
+            item = self.sounds.get()
+            if item is None:
+                return
+
+            stops, samples = item
+            data = np.asarray(samples, dtype="<i2").tobytes()
+
+            for start in range(0, len(samples), chunk_length):
+                if stops != self.stops:
+                    break
+
+                now = time.perf_counter()
+                written_until = max(written_until, now)
+
+                if written_until - now > self.lead_time:
+                    time.sleep(written_until - now - self.lead_time)
+
+                chunk = data[start * 2:(start + chunk_length) * 2]
+
+                try:
+                    self.process.stdin.write(chunk)
+                    self.process.stdin.flush()
+                except (BrokenPipeError, OSError):
+                    # The player has gone, so carry on without sound
+                    return
+
+                written_until += len(chunk) / 2 / self.sample_rate
+
+    def close(self):
+        self.sounds.put(None)
+        self.thread.join(timeout=1)
+
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+        self.process.wait()
+
+
+class WavSink:
+    """
+    Writes sounds to a WAV file instead of playing them, with the time
+    between them as silence. Used when there's nothing to play sounds with
+    """
+
+    # Longest gap to keep, in seconds, so pausing doesn't fill the file with
+    # silence
+    max_gap = 3.0
+
+    latency = 0.0
+
+    def __init__(self, path: str, sample_rate: int):
+        self.path = path
+        self.sample_rate = sample_rate
+
+        self.wav_file = wave.open(path, "wb")
+        self.wav_file.setnchannels(1)
+        self.wav_file.setsampwidth(2)
+        self.wav_file.setframerate(sample_rate)
+
+        # Time the last sound written would have finished playing
+        self.end_time: float | None = None
+        self.lock = threading.Lock()
+
+    def describe(self) -> str:
+        return f"No sound card, writing the sound to {self.path}"
+
+    def play(self, samples: np.ndarray):
+        now = time.perf_counter()
+
+        with self.lock:
+            if self.end_time is not None:
+                gap = min(max(now - self.end_time, 0.0), self.max_gap)
+                self.wav_file.writeframes(bytes(int(gap * self.sample_rate) * 2))
+
+            self.wav_file.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+            self.end_time = now + len(samples) / self.sample_rate
+
+    def stop(self):
+        """
+        Does nothing, the sound is already written
+        """
+        pass
+
+    def close(self):
+        with self.lock:
+            self.wav_file.close()
+
+
+def open_sink(player: str | None, wav_path: str | None, sample_rate: int) -> PipeSink | WavSink:
+    """
+    Gets where to send the sound
+
+    :param player: Command to write raw PCM to, with {rate} for the sample
+        rate. aplay if not given and there's a sound card
+    :param wav_path: WAV file to write instead of playing the sound
+    """
+    if wav_path:
+        return WavSink(wav_path, sample_rate)
+
+    if player:
+        return PipeSink(shlex.split(player.format(rate=sample_rate)), sample_rate)
+
+    if has_sound_card():
+        return PipeSink(shlex.split(aplay_command.format(rate=sample_rate)), sample_rate, aplay_latency)
+
+    return WavSink(default_wav_path, sample_rate)
+
+
+class Screen:
+    """
+    Curses window, and the colour pairs used to draw on it. Colours are
+    given as RGB, like in main.py, and drawn as the nearest of the eight
+    terminal colours
+    """
+
+    def __init__(self, window: curses.window):
+        self.window = window
+        self.colours = curses.has_colors()
+        self.pairs: dict[tuple[int, int], int] = {}
+
+        if self.colours:
+            curses.start_color()
+            curses.use_default_colors()
+
+    @staticmethod
+    def terminal_colour(colour: tuple[int, int, int]) -> int:
+        """
+        Gets the nearest terminal colour. The curses colours are bits for red,
+        green and blue
+        """
+        red, green, blue = (component >= 128 for component in colour)
+        return curses.COLOR_RED * red | curses.COLOR_GREEN * green | curses.COLOR_BLUE * blue
+
+    def attribute(self, foreground: tuple[int, int, int], background: tuple[int, int, int] = (0, 0, 0)) -> int:
+        """
+        Gets the attribute to draw in, making a colour pair for it the first
+        time it's asked for
+        """
+        if not self.colours:
+            return curses.A_REVERSE if self.terminal_colour(background) else curses.A_NORMAL
+
+        key = (self.terminal_colour(foreground), self.terminal_colour(background))
+
+        pair = self.pairs.get(key)
+        if pair is None:
+            pair = len(self.pairs) + 1
+            curses.init_pair(pair, *key)
+            self.pairs[key] = pair
+
+        return curses.color_pair(pair)
+
+    def text(self, y: int, x: int, text: str, attribute: int = curses.A_NORMAL):
+        """
+        Draws text, cutting off anything outside the window
+        """
+        height, width = self.window.getmaxyx()
+
+        if not 0 <= y < height or x >= width:
+            return
+
+        if x < 0:
+            text = text[-x:]
+            x = 0
+
+        try:
+            self.window.addstr(y, x, text[:width - x], attribute)
+        except curses.error:
+            # Writing the bottom right cell moves the cursor off the window
+            pass
+
+    def centred(self, y: int, text: str, attribute: int = curses.A_NORMAL):
+        self.text(y, (self.window.getmaxyx()[1] - len(text)) // 2, text, attribute)
+
+
+class TextBox(BoxFeedback):
+    """
+    The box that flashes, drawn with text. The set functions can be called
+    from any thread, and only publish a new BoxState for the main thread to
+    draw
+    """
+
+    # In character cells, which are about twice as tall as they are wide
+    box_width = 22
+    box_height = 11
+    border_width = 2
+    border_height = 1
+
+    def __init__(self, sink: PipeSink | WavSink, sample_rate: int, changed):
+        """
+        :param changed: Called when there's something new to draw
+        """
+        self.sink = sink
+        self.sample_rate = sample_rate
+        self.changed = changed
+
+        # Flag to communicate when game is paused
+        self.paused = threading.Event()
+
+        # Time, by self.clock, that the last sound played finishes
+        self.sound_end_time: float | None = None
+
+        self.sounds = audio.LRUCache(256)
+
+        self.state_lock = threading.Lock()
+        self.state = BoxState(self.outer_colour_normal,
+                              self.inner_colour_normal,
+                              self.font_colour_normal,
+                              "")
+
+    def publish(self, **changes):
+        with self.state_lock:
+            self.state = self.state._replace(**changes)
+
+        self.changed()
+
+    def set_font(self, text):
+        self.publish(text=text)
+
+    def set_outer_colour(self, colour: tuple[int, int, int]):
+        self.publish(outer_colour=colour)
+
+    def set_inner_colour(self, colour: tuple[int, int, int]):
+        self.publish(inner_colour=colour)
+
+    def set_font_colour(self, colour: tuple[int, int, int]):
+        self.publish(font_colour=colour)
+
+    def get_sound(self, character: str) -> Sound:
+        """
+        Gets the sound of a character in morse at the current speed and tone
+
+        :raises KeyError: If character doesn't have morse code
+        """
+        wpm = audio.dit_length_to_wpm(self.dit_length)
+        key = (character, wpm, self.tone_frequency, self.sample_rate)
+
+        def render():
+            samples = audio.render_sequence(morse[character], wpm, self.tone_frequency, self.sample_rate)
+            return Sound(samples, self.sink, self.sample_rate)
+
+        return self.sounds.get(key, render)
+
+    def play_sound(self, sound: Sound):
+        """
+        Plays a sound, unless the game is paused. Records when the end of the
+        sound will be heard in sound_end_time
+        """
+        if not self.paused.is_set():
+            self.sound_end_time = self.clock() + self.sink.latency + sound.length
+            sound.play()
+
+    def reset_box(self):
+        self.publish(outer_colour=self.outer_colour_normal,
+                     inner_colour=self.inner_colour_normal,
+                     text="")
+
+    def draw(self, screen: Screen, top: int, left: int):
+        state = self.state
+
+        if self.paused.is_set():
+            state = BoxState(self.outer_colour_normal, self.inner_colour_normal, state.font_colour, "")
+
+        border = screen.attribute(state.outer_colour, state.outer_colour)
+        inner = screen.attribute(state.font_colour, state.inner_colour) | curses.A_BOLD
+        inner_width = self.box_width - self.border_width * 2
+
+        for row in range(self.box_height):
+            if row < self.border_height or row >= self.box_height - self.border_height:
+                screen.text(top + row, left, " " * self.box_width, border)
+            else:
+                screen.text(top + row, left, " " * self.border_width, border)
+                screen.text(top + row, left + self.border_width, " " * inner_width, inner)
+                screen.text(top + row, left + self.box_width - self.border_width, " " * self.border_width, border)
+
+        if state.text:
+            screen.text(top + self.box_height // 2, left + (self.box_width - len(state.text)) // 2, state.text, inner)
+
+
+class TextScorecard(ScorecardFeedback):
+    """
+    Letters learned at the top of the screen
+    """
+
+    def __init__(self, changed):
+        """
+        :param changed: Called when there's something new to draw
+        """
+        self.changed = changed
+
+        self.learned_letters: list[str] = []
+        self.count_colour = self.font_colour_normal
+
+    def update(self, new_learned_character: str = ""):
+        """
+        Adds a character to the letters learned, turning the count green
+        until set_count_colour is used to change it back
+
+        :raises ValueError: if letter already in learned letters list
+        """
+        if new_learned_character in self.learned_letters:
+            raise ValueError("Letter already in learned letters list")
+
+        if new_learned_character:
+            self.learned_letters.append(new_learned_character)
+            self.count_colour = self.font_colour_new_letter
+
+        self.changed()
+
+    def set_count_colour(self, colour: tuple[int, int, int]):
+        self.count_colour = colour
+        self.changed()
+
+    def draw(self, screen: Screen, top: int):
+        count, line_one, line_two = self.scorecard_lines()
+
+        screen.centred(top, count, screen.attribute(self.count_colour) | curses.A_BOLD)
+        screen.centred(top + 2, line_one, screen.attribute(self.font_colour_normal))
+        screen.centred(top + 3, line_two, screen.attribute(self.font_colour_normal))
+
+
+class TerminalTrainer(TrainerEngine):
+    """
+    The trainer, drawn in a terminal with curses
+    """
+
+    # Seconds of real time for each second of waiting, for playback
+    time_scale = 1.0
+
+    escape_key = "\x1b"
+
+    def __init__(self,
+                 sink: PipeSink | WavSink,
+                 progress_path: str | None = progress.default_path,
+                 seed: int | None = None):
+        """
+        :param sink: Where to send the sound
+        :param progress_path: Database to save progress in and resume from.
+            None to not save anything
+        :param seed: Seed for the order characters are asked in. Random if
+            not given
+        """
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+
+        super().__init__(clock=time.perf_counter, rng=random.Random(self.seed))
+
+        self.progress: progress.ProgressStore | None = None
+        if progress_path:
+            self.progress = progress.ProgressStore(progress_path)
+            self.reaction_times.listen(self.progress.record)
+
+        stats.track(self)
+
+        self.sink = sink
+
+        # Written to by other threads to wake the main loop when there's
+        # something to draw, like pygame.event.post in main.py
+        self.wake_read, self.wake_write = os.pipe()
+        os.set_blocking(self.wake_read, False)
+        os.set_blocking(self.wake_write, False)
+
+        self.box = TextBox(sink, sink.sample_rate, self.wake)
+        self.box_playing = threading.Event()
+        self.box_job: Job | None = None
+
+        self.scheduler = PlaybackScheduler(time_scale=self.time_scale)
+        self.letters_learned = TextScorecard(self.wake)
+
+        self.need_new_character = True
+        self.correct_char = ""
+        self.status = "Esc to pause"
+
+        self.screen: Screen | None = None
+
+        # Time, by self.clock, that wait_for_keys() last returned. Used as the
+        # time of the keys it gave
+        self.keys_time = 0.0
+
+    def wake(self):
+        """
+        Wakes the main loop so it redraws. Safe to call from any thread
+        """
+        try:
+            os.write(self.wake_write, b"\0")
+        except BlockingIOError:
+            # Already plenty of wake ups waiting
+            pass
+
+    def is_playing(self) -> bool:
+        return self.box_playing.is_set()
+
+    def play_on_box(self, timeline: Timeline):
+        """
+        Starts a timeline from one of the box's timeline functions.
+        is_playing is True until it ends or is cancelled
+        """
+        def finished():
+            self.box_playing.clear()
+            self.wake()
+
+        self.box_playing.set()
+        self.box_job = self.scheduler.submit(timeline, on_finished=finished)
+
+    def character_learned(self, character: str):
+        self.scheduler.submit(self.letters_learned.learned_timeline(character))
+
+    def resume(self) -> bool:
+        """
+        Puts the queues back to where they were when the last game was quit
+
+        :return: If there was a game to resume
+        """
+        snapshot = self.progress.load_snapshot() if self.progress else None
+        if not snapshot:
+            return False
+
+        self.restore(snapshot)
+        self.letters_learned.learned_letters = list(self.learned_characters)
+
+        return True
+
+    def save_progress(self):
+        if self.progress:
+            self.progress.save_snapshot(self.snapshot())
+
+    def draw(self):
+        """
+        Draws everything. Curses only sends the cells that changed
+        """
+        window = self.screen.window
+        height, width = window.getmaxyx()
+
+        window.erase()
+
+        self.letters_learned.draw(self.screen, 0)
+
+        box_top = max(5, (height - TextBox.box_height) // 2)
+        self.box.draw(self.screen, box_top, (width - TextBox.box_width) // 2)
+
+        self.screen.centred(height - 1, self.status)
+
+        window.refresh()
+
+    def wait_for_keys(self) -> list:
+        """
+        Waits until a key is pressed or something needs drawing, then gets
+        the keys pressed. Special keys are ints, like curses.KEY_RESIZE
+        """
+        select.select([sys.stdin, self.wake_read], [], [])
+        self.keys_time = self.clock()
+
+        try:
+            while os.read(self.wake_read, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        keys = []
+        while True:
+            try:
+                keys.append(self.screen.window.get_wch())
+            except curses.error:
+                return keys
+
+    def pause(self) -> bool:
+        """
+        Pauses the game until Esc is pressed again
+
+        :return: False if q was pressed to quit
+        """
+        self.need_new_character = True
+        self.box.paused.set()
+
+        if self.box_job:
+            self.scheduler.cancel(self.box_job)
+
+        self.box.reset_box()
+        self.status = "Paused - Esc to carry on, q to quit"
+
+        while True:
+            self.draw()
+
+            for key in self.wait_for_keys():
+                if key == self.escape_key:
+                    self.box.paused.clear()
+                    self.status = "Esc to pause"
+                    return True
+
+                if key in ("q", "Q"):
+                    return False
+
+    def run(self, window: curses.window) -> bool:
+        """
+        Main game loop, run inside curses.wrapper
+
+        :return: If every character was learned
+        """
+        self.screen = Screen(window)
+
+        curses.curs_set(0)
+        curses.set_escdelay(25)
+        window.nodelay(True)
+
+        if not self.resume():
+            self.generate_character_queue()
+
+        while True:
+            if self.need_new_character and not self.is_playing():
+                if self.is_queue_empty():
+                    # Finished, so the next game starts from the beginning
+                    if self.progress:
+                        self.progress.clear_snapshot()
+
+                    return True
+
+                self.correct_char = self.get_next_char()
+                self.play_on_box(self.box.morse_timeline(self.correct_char))
+                self.need_new_character = False
+
+            self.draw()
+
+            for key in self.wait_for_keys():
+                waiting_for_answer = not self.is_playing() and not self.need_new_character
+
+                if waiting_for_answer and isinstance(key, str) and key.isalnum():
+                    # From the end of the morse to when the key press woke
+                    # the loop
+                    answer = self.answer(key, self.keys_time - self.box.sound_end_time)
+                    self.save_progress()
+
+                    if not answer.correct:
+                        self.play_on_box(self.box.error_timeline(self.correct_char, False))
+                    elif answer.too_slow:
+                        self.play_on_box(self.box.error_timeline(self.correct_char, True))
+                    else:
+                        self.play_on_box(self.box.correct_timeline())
+
+                    self.need_new_character = True
+
+                elif key == self.escape_key:
+                    self.update_queue(correct=False)
+                    self.save_progress()
+
+                    if not self.pause():
+                        return False
+
+                    # A moment to get ready before the next character
+                    time.sleep(self.time_scale)
+
+    def quit_game(self):
+        """
+        Stops the threads and closes the sound and progress
+        """
+        self.scheduler.stop()
+        self.sink.close()
+
+        if self.progress:
+            self.progress.close()
+
+        os.close(self.wake_read)
+        os.close(self.wake_write)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Learn morse code in a terminal")
+    parser.add_argument("--seed", type=int, help="Seed for the order characters are asked in")
+    parser.add_argument("--player", help="Command to play raw signed 16-bit mono PCM from standard input, "
+                                         "with {rate} for the sample rate. Defaults to aplay")
+    parser.add_argument("--wav", metavar="PATH", help="Write the sound to a WAV file instead of playing it")
+    parser.add_argument("--sample-rate", type=int, default=audio.default_sample_rate)
+    args = parser.parse_args()
+
+    sink = open_sink(args.player, args.wav, args.sample_rate)
+    trainer = TerminalTrainer(sink, seed=args.seed)
+
+    start_time = time.perf_counter() - import_start_time
+
+    try:
+        finished = curses.wrapper(trainer.run)
+    except KeyboardInterrupt:
+        finished = False
+    finally:
+        trainer.quit_game()
+
+    print(f"Started in {start_time * 1000:.0f}ms. {sink.describe()}")
+    if finished:
+        print("All learned")
+
+
+if __name__ == "__main__":
+    main()
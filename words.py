@@ -0,0 +1,50 @@
+"""
+Author  : VoltRadar
+Date    : 2023
+Licence : MIT
+
+Sources of words to send: the words of a text, random groups of characters,
+and encoding them for audio.stream_words.
+
+Doesn't depend on pygame, so it can be used by the offline renderer's
+worker processes.
+"""
+
+
+import random
+
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from codec import Codec, default_codec
+
+
+def read_words(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Splits lines of text into words
+    """
+    for line in lines:
+        yield from line.split()
+
+
+def code_groups(rng: random.Random, characters: list[str], length: int = 5) -> Iterator[str]:
+    """
+    Endless groups of random characters, the usual way to practice copying
+    without guessing words from their first letters
+    """
+    while True:
+        yield "".join(rng.choices(characters, k=length))
+
+
+def encode_words(words: Iterable[str], codec: Codec = default_codec) -> Iterator[tuple[str, np.ndarray]]:
+    """
+    Encodes words for audio.stream_words. Characters with no morse are left
+    out, and words with none at all are skipped
+    """
+    for word in words:
+        word = word.upper()
+        elements = codec.encode_elements(word + " ", errors="ignore")
+
+        if (elements > 0).any():
+            yield word, elements